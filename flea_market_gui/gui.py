@@ -1,36 +1,76 @@
-import re
-from typing import Callable, Any
+import asyncio
+from itertools import chain, islice
+from pathlib import Path
+from dataclasses import replace
+from typing import Callable, Any, Iterable, Optional
 
 import PySimpleGUI as sg
 import requests
 from valid8 import ValidationError, validate
 
+from flea_market_tui.api import ApiClient, NotPaginated
+from flea_market_tui.async_api import AsyncApiClient
+from flea_market_tui.cache import CatalogCache
 from flea_market_tui.domain import Username, Password, Email, FleaMarket, Name, Description, Condition, Brand, Price, \
-    Category, Item
-
-api_address = 'http://localhost:8000/api/v1/'
+    Category, Item, Facets
+from flea_market_tui.importer import import_items
+from flea_market_tui.paged import PagedFleaMarket
+from flea_market_tui.rows import RowCache
+from flea_market_gui.table import TableRows, apply, selected
+from flea_market_gui.worker import Done, Failed, Progress, Worker
+from flea_market_tui.stats import euro
 
 class Gui:
 
     sg.theme('DarkRed')
 
-    __key = None
+    __api = ApiClient()
     __fleamarket = FleaMarket()
-    __id_dictionary = []
     __users_list = []
-
-    def progress_bar(self) -> None:
-        layout = [[sg.Text('Creating your account...')],
-                [sg.ProgressBar(1000, orientation='h', size=(20, 20), key='progbar')],
-                [sg.Cancel()]]
-
-        window = sg.Window('Working...', layout)
-        for i in range(1000):
-            event, values = window.read(timeout=1)
-            if event == 'Cancel' or event == sg.WIN_CLOSED:
-                break
-            window['progbar'].update_bar(i + 1)
-        window.close()
+    __etag = None
+    __synced = None
+
+    def __init__(self, paged: bool = False, window_size: int = 100, cache: Optional[CatalogCache] = None):
+        validate('window_size', window_size, min_value=1)
+        self.__paged = paged
+        self.__window = 0
+        self.__window_size = window_size
+        self.__facets = Facets()
+        self.__shown = []
+        self.__summary = ''
+        self.__row_cache = RowCache(self.__format_row)
+        self.__keys = []
+        self.__table = TableRows()
+        self.__worker = Worker()
+        self.__cache = cache
+        self.__offline = False
+        self.__username: Optional[str] = None
+        self.__revalidating: Optional[str] = None
+        self.__stale = False
+        self.__rest: Optional[Callable[[Callable], tuple]] = None
+
+    # Runs call(progress) on the worker while a progress window keeps the event loop going, and returns its result or
+    # raises its exception here. The bar follows the progress the call reports, e.g. the bytes of a download.
+    def __run(self, text: str, call: Callable[[Callable], Any]) -> Any:
+        layout = [[sg.Text(text, key='-text-', size=(30, 1))],
+                  [sg.ProgressBar(1, orientation='h', size=(20, 20), key='-progbar-')]]
+
+        window = sg.Window('Working...', layout, finalize=True, disable_close=True)
+        self.__worker.submit(window, '-worker-', call)
+        try:
+            while True:
+                event, values = window.read()
+                message = values[event]
+                if isinstance(message, Progress):
+                    if message.total:
+                        window['-progbar-'].update_bar(min(message.done, message.total), message.total)
+                    window['-text-'].update(f'{text} {message.done // 1024} KiB')
+                elif isinstance(message, Done):
+                    return message.result
+                else:
+                    raise message.error
+        finally:
+            window.close()
 
     def first_menu(self) -> None:
         layout = [[sg.Image(filename='../resources/logo.png')],
@@ -99,10 +139,8 @@ class Gui:
 
                         sg.Popup(err)
                     else:
-                        res = requests.post(url=f'{api_address}auth/registration',
-                                            data={'username': username, 'email': email,
-                                                  'password1': password, 'password2': password})
-                        self.progress_bar()
+                        res = self.__run('Creating your account...',
+                                         lambda progress: self.__api.register(username, email, password))
                         if res.status_code == 400:
                             err = ''
                             if res.json().get('username') is not None:
@@ -154,14 +192,30 @@ class Gui:
 
                         sg.Popup(err)
                     else:
-                        res = requests.post(url=f'{api_address}auth/login/', data={'username': username, 'password': password})
+                        try:
+                            res = self.__run('Signing in...', lambda progress: self.__api.login(username, password))
+                        except requests.ConnectionError:
+                            if self.__cache is None:
+                                raise
+                            if not self.__cache.recognizes(username.value, 'user', password.value):
+                                sg.Popup('Server not reachable: only users who signed in here before can browse '
+                                         'offline')
+                                continue
+                            sg.Popup('Server not reachable: the cached items are shown read-only')
+                            self.__signed_in(username, offline=True)
+                            window.close()
+                            self.user_home_menu()
+                            break
 
                         if res.status_code != 200:
                             sg.Popup('User does not exist :( Please retry!')
                             window.close()
                             self.user_login()
                         elif res.status_code == 200:
-                            self.__key = res.json()['key']
+                            self.__api.authorize(res.json()['key'])
+                            if self.__cache is not None:
+                                self.__cache.remember(username.value, 'user', password.value)
+                            self.__signed_in(username, offline=False)
                             window.close()
                             self.user_home_menu()
 
@@ -196,31 +250,49 @@ class Gui:
 
                         sg.Popup(err)
                     else:
-                        res = requests.post(url=f'{api_address}auth/login/', data={'username': username, 'password': password})
+                        try:
+                            res = self.__run('Signing in...', lambda progress: self.__api.login(username, password))
+                        except requests.ConnectionError:
+                            if self.__cache is None:
+                                raise
+                            if not self.__cache.recognizes(username.value, 'moderator', password.value):
+                                sg.Popup('Server not reachable: only users who signed in here before can browse '
+                                         'offline')
+                                continue
+                            sg.Popup('Server not reachable: the cached items are shown read-only')
+                            self.__signed_in(username, offline=True)
+                            window.close()
+                            self.admin_home_menu()
+                            break
 
                         if res.status_code != 200:
                             sg.Popup('User does not exist :( Please retry!')
                             window.close()
                             self.admin_login()
-
-                        self.__key = res.json()['key']
-                        window.close()
-                        self.admin_home_menu()
+                        else:
+                            self.__api.authorize(res.json()['key'])
+                            if self.__cache is not None:
+                                self.__cache.remember(username.value, 'moderator', password.value)
+                            self.__signed_in(username, offline=False)
+                            window.close()
+                            self.admin_home_menu()
 
     def user_home_menu(self) -> None:
 
-        try:
-            self.__fetch()
-        except ValueError as e:
-            sg.Popup('Error to retrive items!')
-        except RuntimeError:
-            sg.Popup('Connection failed!')
+        cached = self.__load_cached('item/')
+        if not cached and not self.__offline:
+            try:
+                self.__run('Loading items...', self.__fetch)
+            except ValueError as e:
+                sg.Popup('Error to retrive items!')
+            except RuntimeError:
+                sg.Popup('Connection failed!')
 
-        data = self.make_table()
+        rows = self.make_table()
 
         headings = ['   NAME    ', '    DESCRIPTION     ', '    CONDITION   ', '   BRAND  ', '    PRICE   ', '    CATEGORY    ']
 
-        layout = [[sg.Table(values=data[1:][:], headings=headings,
+        layout = [[sg.Table(values=rows, headings=headings,
                             alternating_row_color='PaleVioletRed4',
                             max_col_width=100,
                             auto_size_columns=True,
@@ -230,9 +302,12 @@ class Gui:
                             key='-TABLE-',
                             enable_events=True,
                             row_height=45)],
-                  [sg.Button('Add', button_color='green4'), sg.Button('Edit', button_color='blue4', key='-edit-', disabled=True), sg.Button('Remove', button_color='red3', key='-remove-', disabled=True), sg.Button('Logout'), sg.Text('Sort by:'), sg.Combo(['price', 'condition', 'brand'], enable_events=True, key='-sortby-')]]
+                  [sg.Button('Add', button_color='green4'), sg.Button('Import', button_color='green4'), sg.Button('Edit', button_color='blue4', key='-edit-', disabled=True), sg.Button('Remove', button_color='red3', key='-remove-', disabled=True), sg.Button('Statistics', button_color='blue4'), sg.Button('Logout'), sg.Text('Sort by:'), sg.Combo(['price', 'condition', 'brand'], enable_events=True, key='-sortby-'), sg.Button('<', key='-prev-'), sg.Button('>', key='-next-'), sg.Input(key='-query-', size=20), sg.Button('Search', key='-search-'), sg.Button('Filter', key='-filter-')],
+                  [sg.Text(self.__summary, key='-facets-', size=(150, 4))]]
 
-        window = sg.Window("FleaMarket", layout)
+        window = sg.Window("FleaMarket", layout, finalize=True)
+        self.__table.reset(self.__keys, self.__numbered(rows))
+        self.__revalidate(window, 'item/', cached)
 
         while True:
             event, values = window.read()
@@ -247,36 +322,43 @@ class Gui:
                 window['-remove-'].Update(disabled=True)
                 new_item = self.item_form()
                 if new_item is not None:
-                    self.__fleamarket.add_item(new_item)
-                    self.__store(new_item)
-                    data = self.make_table()
-                    window['-TABLE-'].Update(values=data[1:][:])
+                    self.__fleamarket.add_item(new_item, self.__store(new_item))
+                    self.__changed()
+                    self.__refresh(window)
                     sg.Popup('Item added successfully!')
 
+            ############################ IMPORT BUTTON ############################
+            if event == 'Import':
+                path = sg.popup_get_file('Items to import', file_types=(('CSV', '*.csv'), ('JSON Lines', '*.jsonl')))
+                if path:
+                    self.__import_items(Path(path))
+                    self.__refresh(window)
+
+            ############################ SYNC EVENT ############################
+            if event == '-sync-':
+                self.__revalidated(window, values[event])
+
             ############################ TABLE EVENT ############################
-            if event == '-TABLE-':
+            if event == '-TABLE-' and not self.__offline:
                 window['-remove-'].Update(disabled=False)
                 window['-edit-'].Update(disabled=False)
 
             ############################ EDIT BUTTON ############################
             if event == '-edit-':
-                selected_row = re.sub(r'^\[', '', str(values['-TABLE-']))
-                selected_row = re.sub(r'\]$', '', selected_row)
-                if (selected_row != ''):
-                    self.__edit_item(int(selected_row))
-                    data = self.make_table()
-                    window['-TABLE-'].Update(values=data[1:][:])
+                selected_row = selected(window['-TABLE-'].Widget)
+                if selected_row is not None:
+                    self.__edit_item(self.__shown[selected_row])
+                    self.__refresh(window)
 
             ############################ REMOVE BUTTON ############################
             if event == '-remove-':
-                selected_row = re.sub(r'^\[', '', str(values['-TABLE-']))
-                selected_row = re.sub(r'\]$', '', selected_row)
-                if(selected_row != ''):
-                    if(sg.popup_yes_no('Are you sure to delete the element in row ' + selected_row + ' ?') == 'Yes'):
-                        self.__delete(self.__fleamarket.item(int(selected_row)))
-                        self.__fleamarket.remove_item(int(selected_row))
-                        data = self.make_table()
-                        window['-TABLE-'].Update(values=data[1:][:])
+                selected_row = selected(window['-TABLE-'].Widget)
+                if selected_row is not None:
+                    if(sg.popup_yes_no(f'Are you sure to delete the element in row {selected_row} ?') == 'Yes'):
+                        self.__delete(self.__fleamarket.item_id(self.__shown[selected_row]))
+                        self.__fleamarket.remove_item(self.__shown[selected_row])
+                        self.__changed()
+                        self.__refresh(window)
                         sg.Popup('Item removed!')
 
             ############################ SORTBY EVENT ############################
@@ -287,24 +369,44 @@ class Gui:
                     self.__sort_by_condition()
                 elif values['-sortby-'] == 'brand':
                     self.__sort_by_brand()
-                data = self.make_table()
-                window['-TABLE-'].Update(values=data[1:][:])
+                self.__refresh(window)
+
+            ############################ PAGE BUTTONS ############################
+            if event == '-prev-' or event == '-next-':
+                self.__move_window(self.__window_size if event == '-next-' else -self.__window_size)
+                self.__refresh(window)
+
+            ############################ STATISTICS BUTTON ############################
+            if event == 'Statistics':
+                self.__show_stats()
+
+            ############################ SEARCH BUTTON ############################
+            if event == '-search-':
+                self.__search(values['-query-'])
+                self.__refresh(window)
+
+            ############################ FILTER BUTTON ############################
+            if event == '-filter-':
+                self.__filter()
+                self.__refresh(window)
 
         window.close()
 
     def admin_home_menu(self) -> None:
 
-        try:
-            self.__fetch_admin()
-        except ValueError as e:
-            sg.Popup('Error to retrive items!')
-        except RuntimeError:
-            sg.Popup('Connection failed!')
+        cached = self.__load_cached('item-moderator/')
+        if not cached and not self.__offline:
+            try:
+                self.__run('Loading items...', self.__fetch_admin)
+            except ValueError as e:
+                sg.Popup('Error to retrive items!')
+            except RuntimeError:
+                sg.Popup('Connection failed!')
 
-        data = self.make_table()
+        rows = self.make_table()
         headings = ['   NAME    ', '    DESCRIPTION     ', '    CONDITION   ', '   BRAND  ', '    PRICE   ', '    CATEGORY    ']
 
-        layout = [[sg.Table(values=data[1:][:], headings=headings,
+        layout = [[sg.Table(values=rows, headings=headings,
                             alternating_row_color='PaleVioletRed4',
                             max_col_width=100,
                             auto_size_columns=True,
@@ -314,9 +416,12 @@ class Gui:
                             key='-TABLE-',
                             enable_events=True,
                             row_height=45)],
-                  [sg.Button('Remove', button_color='red3', key='-remove-', disabled=True), sg.Button('Users list', button_color='blue4'), sg.Button('Logout'), sg.Text('Sort by:'), sg.Combo(['price', 'condition', 'brand'], enable_events=True, key='-sortby-')]]
+                  [sg.Button('Remove', button_color='red3', key='-remove-', disabled=True), sg.Button('Users list', button_color='blue4'), sg.Button('Logout'), sg.Text('Sort by:'), sg.Combo(['price', 'condition', 'brand'], enable_events=True, key='-sortby-'), sg.Button('<', key='-prev-'), sg.Button('>', key='-next-'), sg.Input(key='-query-', size=20), sg.Button('Search', key='-search-'), sg.Button('Filter', key='-filter-')],
+                  [sg.Text(self.__summary, key='-facets-', size=(150, 4))]]
 
-        window = sg.Window("FleaMarket", layout)
+        window = sg.Window("FleaMarket", layout, finalize=True)
+        self.__table.reset(self.__keys, self.__numbered(rows))
+        self.__revalidate(window, 'item-moderator/', cached)
 
         while True:
             event, values = window.read()
@@ -325,20 +430,23 @@ class Gui:
             if event == sg.WIN_CLOSED or event == 'Logout':
                 break
 
+            ############################ SYNC EVENT ############################
+            if event == '-sync-':
+                self.__revalidated(window, values[event])
+
             ############################ TABLE EVENT ############################
-            if event == '-TABLE-':
+            if event == '-TABLE-' and not self.__offline:
                 window['-remove-'].Update(disabled=False)
 
             ############################ REMOVE BUTTON ############################
             if event == '-remove-':
-                selected_row = re.sub(r'^\[', '', str(values['-TABLE-']))
-                selected_row = re.sub(r'\]$', '', selected_row)
-                if(selected_row != ''):
-                    if(sg.popup_yes_no('Are you sure to delete the element in row ' + selected_row + ' ?') == 'Yes'):
-                        self.__superdelete(self.__fleamarket.item(int(selected_row)))
-                        self.__fleamarket.remove_item(int(selected_row))
-                        data = self.make_table()
-                        window['-TABLE-'].Update(values=data[1:][:])
+                selected_row = selected(window['-TABLE-'].Widget)
+                if selected_row is not None:
+                    if(sg.popup_yes_no(f'Are you sure to delete the element in row {selected_row} ?') == 'Yes'):
+                        self.__superdelete(self.__fleamarket.item_id(self.__shown[selected_row]))
+                        self.__fleamarket.remove_item(self.__shown[selected_row])
+                        self.__changed()
+                        self.__refresh(window)
                         sg.Popup('Item removed!')
 
             ############################ USER LIST BUTTON ############################
@@ -353,15 +461,56 @@ class Gui:
                     self.__sort_by_condition()
                 elif values['-sortby-'] == 'brand':
                     self.__sort_by_brand()
-                data = self.make_table()
-                window['-TABLE-'].Update(values=data[1:][:])
+                self.__refresh(window)
+
+            ############################ PAGE BUTTONS ############################
+            if event == '-prev-' or event == '-next-':
+                self.__move_window(self.__window_size if event == '-next-' else -self.__window_size)
+                self.__refresh(window)
+
+            ############################ SEARCH BUTTON ############################
+            if event == '-search-':
+                self.__search(values['-query-'])
+                self.__refresh(window)
+
+            ############################ FILTER BUTTON ############################
+            if event == '-filter-':
+                self.__filter()
+                self.__refresh(window)
+
+        window.close()
+
+    def __show_stats(self) -> None:
+        if self.__paged:
+            sg.Popup('Statistics are not available in paged mode')
+            return
+
+        headings = ['   COUNT   ', '   MIN   ', '   MAX   ', '   MEAN   ', '   MEDIAN   ', '    HISTOGRAM    ']
+        tabs = []
+        for by in ('category', 'brand'):
+            data = [[str(key), stats.count, euro(stats.min), euro(stats.max), euro(stats.mean), euro(stats.median),
+                     ' '.join(str(count) for _, _, count in stats.histogram)]
+                    for key, stats in self.__fleamarket.price_stats(by, buckets=5).items()]
+            tabs.append(sg.Tab(by.capitalize(), [[sg.Table(values=data, headings=[f'   {by.upper()}   '] + headings,
+                                                           alternating_row_color='PaleVioletRed4',
+                                                           max_col_width=100,
+                                                           auto_size_columns=True,
+                                                           justification='center',
+                                                           num_rows=10)]]))
+
+        window = sg.Window("FleaMarket", [[sg.TabGroup([tabs])], [sg.Button('Close')]])
+
+        while True:
+            event, values = window.read()
+            if event == sg.WIN_CLOSED or event == 'Close':
+                break
 
         window.close()
 
     def __show_user_list(self) -> None:
 
         try:
-            self.__fetch_users_list()
+            self.__run('Loading users...', self.__fetch_users_list)
         except ValueError as e:
             sg.Popup('Error to retrive users!')
         except RuntimeError:
@@ -391,39 +540,92 @@ class Gui:
 
         window.close()
 
+    def __import_items(self, path: Path) -> None:
+        try:
+            report = self.__run('Importing items...',
+                                lambda progress: asyncio.run(import_items(path, AsyncApiClient(self.__api))))
+        except ValidationError:
+            sg.Popup('Only .csv and .jsonl files can be imported!')
+            return
+        except OSError as e:
+            sg.Popup(f'Cannot read {path}: {e.strerror or e}')
+            return
+
+        for item_id, item in report.imported:
+            self.__fleamarket.add_item(item, item_id)
+        self.__changed()
+        err = '\n'.join(str(error) for error in report.errors[:20])
+        sg.Popup(f'{len(report.imported)} items imported, {len(report.errors)} errors\n\n' + err)
+
     def __edit_item(self, index: int) -> None:
-        id_to_edit = self.__find_id(self.__fleamarket.item(index))
+        id_to_edit = self.__fleamarket.item_id(index)
         item = self.item_form()
         if item is not None:
-            self.__fleamarket.update_item(index, item)
-            self.__update(self.__fleamarket.item(index), id_to_edit)
+            self.__fleamarket.update_item(index, item)  # moves the item to its place in a sorted view
+            self.__update(item, id_to_edit)
+            self.__changed()
             sg.Popup('Updated successfully!')
 
     def __update(self, item: Any, id: int) -> None:
-            requests.patch(url=f'{api_address}item/edit/' + str(id)+ '/',
-                           headers={'Authorization': f'Token {self.__key}'},
-                           data={'name': item.name.value, 'description': item.description.value,
-                              'condition': item.condition.value, 'brand': item.brand.value,
-                              'price': item.price.value_in_cents, 'category': item.category})
-
-    def __find_id(self, item: Item) -> int:
-        for i in range(len(self.__id_dictionary)):
-            if (item.name.value, item.brand.value) == (self.__id_dictionary[i][1], self.__id_dictionary[i][2]):
-                return int(self.__id_dictionary[i][0])
-
-    def make_table(self) -> None:
-        data = [[j for j in range(6)] for i in range(self.__fleamarket.items()+1)]
-
-        for i in range(self.__fleamarket.items()):
-            item = self.__fleamarket.item(i)
-            if(item.condition.value == '0'):
-                data[i+1] = [item.name, item.description, 'As new', item.brand, item.price, item.category.value]
-            elif (item.condition.value == '1'):
-                data[i+1] = [item.name, item.description, 'Good condition', item.brand, item.price, item.category.value]
-            elif (item.condition.value == '2'):
-                data[i+1] = [item.name, item.description, 'Acceptable condition', item.brand, item.price, item.category.value]
+            self.__run('Saving the item...', lambda progress: self.__api.edit_item(id, item))
+
+    def __move_window(self, rows: int) -> None:
+        self.__window = max(0, self.__window + rows)
+
+    def __search(self, query: str) -> None:
+        if self.__paged:
+            sg.Popup('Search is not available in paged mode')
+            return
+        self.__facets = replace(self.__facets, text=query.strip() or None)
+        self.__window = 0
+
+    def __filter(self) -> None:
+        if self.__paged:
+            sg.Popup('Filter is not available in paged mode')
+            return
+        facets = self.filter_form()
+        if facets is not None:
+            self.__facets = facets
+            self.__window = 0
 
-        return data
+    @staticmethod
+    def __numbered(rows: list) -> list:
+        return [[position] + row for position, row in enumerate(rows)]
+
+    # Only the rows that changed are sent to the table; a sort or a page change rewrites most of them, so the table
+    # is then filled again in one go
+    def __refresh(self, window: sg.Window) -> None:
+        rows = self.make_table()
+        changes = self.__table.update(self.__keys, self.__numbered(rows))
+        if len(changes) > len(rows) // 2:
+            window['-TABLE-'].Update(values=rows)
+        elif changes:
+            apply(window['-TABLE-'].Widget, changes)
+        window['-facets-'].Update(self.__summary)
+
+    # Only the rows of the visible window are built, so a paged market only faults in the pages on screen.
+    # __shown maps the table rows back to market indexes, the table may only show the filtered items.
+    def make_table(self) -> list:
+        rows, counts = self.__fleamarket.filter(self.__facets) if self.__facets != Facets() \
+            else (range(self.__fleamarket.items()), None)
+        self.__summary = ''
+        if counts is not None:
+            lines = [f'{name.capitalize()}: ' + ', '.join(f'{value} ({count})' for value, count in values.items())
+                     for name, values in counts.items()]
+            self.__summary = '\n'.join([f'Filter: {self.__facets}'] + lines)
+        items = len(rows)
+        self.__window = max(0, min(self.__window, (items - 1) // self.__window_size * self.__window_size))
+        self.__shown = rows[self.__window:self.__window + self.__window_size]
+        self.__keys = self.__fleamarket.row_keys(self.__shown)
+        return self.__row_cache.rows(self.__keys, lambda i: self.__fleamarket.item(self.__shown[i]))
+
+    __conditions = {'0': 'As new', '1': 'Good condition', '2': 'Acceptable condition'}
+
+    # Rows are cached by row key, so only the rows changed since the last redraw are built again
+    @staticmethod
+    def __format_row(item: Item) -> list:
+        return [item.name, item.description, Gui.__conditions[item.condition.value], item.brand, item.price,
+                item.category.value]
 
     def make_users_table(self) -> None:
         data = [[j for j in range(6)] for i in range(len(self.__users_list)+1)]
@@ -496,99 +698,195 @@ class Gui:
 
         window.close()
 
-    def __sort_by_price(self) -> None:
-        self.__fleamarket.sort_by_price()
+    def filter_form(self) -> Optional[Facets]:
+        def joined(values) -> str:
+            return ', '.join(sorted(str(value) for value in values))
 
-    def __sort_by_condition(self) -> None:
-        self.__fleamarket.sort_by_condition()
+        layout = [[sg.Text("Filter items", size=(15, 1), font=40, justification='r')],
+                  [sg.Text("Categories (comma separated)")],
+                  [sg.InputText(joined(self.__facets.categories), key='-categories-')],
+                  [sg.Text("Brands (comma separated)")],
+                  [sg.InputText(joined(self.__facets.brands), key='-brands-')],
+                  [sg.Text("Condition")],
+                  [sg.Checkbox(label, default=Condition(value) in self.__facets.conditions, key=f'-condition{value}-')
+                   for value, label in (('0', 'As new'), ('1', 'Good condition'), ('2', 'Acceptable condition'))],
+                  [sg.Text("Price from")],
+                  [sg.InputText(str(self.__facets.min_price or ''), key='-min-')],
+                  [sg.Text("Price to")],
+                  [sg.InputText(str(self.__facets.max_price or ''), key='-max-')],
+                  [sg.Button('Confirm', button_color='green4'), sg.Button('Clear'), sg.Button('Cancel', button_color='red3')]]
 
-    def __sort_by_brand(self) -> None:
-        self.__fleamarket.sort_by_brand()
+        window = sg.Window('FleaMarket', layout)
 
-    def __store(self, new_item: Any) -> None:
-        req = requests.post(url=f'{api_address}item/add/',
-                            headers={'Authorization': f'Token {self.__key}'},
-                            data={'name': new_item.name.value, 'description': new_item.description.value,
-                                  'condition': new_item.condition.value, 'brand': new_item.brand.value,
-                                  'price': new_item.price.value_in_cents, 'category': new_item.category})
-
-        self.__id_dictionary.append([req.json()['id'], new_item.name.value, new_item.brand.value])
-
-    def __delete(self, item: Any) -> None:
-        index = None
-        for i in range(len(self.__id_dictionary)):
-            if (item.name.value, item.brand.value) == (self.__id_dictionary[i][1], self.__id_dictionary[i][2]):
-                requests.delete(url=f'{api_address}item/edit/{self.__id_dictionary[i][0]}',
-                                headers={'Authorization': f'Token {self.__key}'})
-                index = i
-                break
+        def values_of(line: str, builder: Callable) -> frozenset:
+            return frozenset(builder(value.strip()) for value in line.split(',') if value.strip())
 
-        self.__id_dictionary.pop(index)
+        while True:
+            event, values = window.read()
 
-    def __superdelete(self, item: Any) -> None:
-        index = None
-        for i in range(len(self.__id_dictionary)):
-            if (item.name.value, item.brand.value) == (self.__id_dictionary[i][1], self.__id_dictionary[i][2]):
-                requests.delete(url=f'{api_address}item-moderator/edit/{self.__id_dictionary[i][0]}',
-                                headers={'Authorization': f'Token {self.__key}'})
-                index = i
+            if event == 'Cancel' or event == sg.WIN_CLOSED:
                 break
+            if event == 'Clear':
+                window.close()
+                return Facets(text=self.__facets.text)
+            if event == 'Confirm':
+                facets = self.__build_input('', lambda _: Facets(
+                    values_of(values['-categories-'], Category), values_of(values['-brands-'], Brand),
+                    frozenset(Condition(value) for value in '012' if values[f'-condition{value}-']),
+                    Price.parse(values['-min-'].strip()) if values['-min-'].strip() else None,
+                    Price.parse(values['-max-'].strip()) if values['-max-'].strip() else None,
+                    self.__facets.text))
+                if type(facets) is str:
+                    sg.Popup('Filter not valid:\n' + facets)
+                else:
+                    window.close()
+                    return facets
 
-        self.__id_dictionary.pop(index)
-
-    def __fetch(self) -> None:
-        self.__fleamarket.clear()
-        self.__id_dictionary.clear()
-        res = requests.get(url=f'{api_address}item/', headers={'Authorization': f'Token {self.__key}'})
-
-        if res.status_code != 200:
-            raise RuntimeError()
-
-        items = res.json()
-
-        for item in items:
-            validate('row length', item, length=7)
-
-            item_id = int(item['id'])
-            name = Name(str(item['name']))
-            description = Description(str(item['description']))
-            condition = Condition(str(item['condition']))
-            brand = Brand(str(item['brand']))
-            price = Price.create(int(int(item['price']) / 100), int(item['price']) % 100)
-            category = Category(str(item['category']))
-
-            self.__id_dictionary.append([item_id, name.value, brand.value])
-
-            self.__fleamarket.add_item(Item(name, description, condition, brand, price, category))
-
-    def __fetch_admin(self) -> None:
-        self.__fleamarket.clear()
-        self.__id_dictionary.clear()
-        res = requests.get(url=f'{api_address}item-moderator/', headers={'Authorization': f'Token {self.__key}'})
-
-        if res.status_code != 200:
-            raise RuntimeError()
-
-        items = res.json()
+        window.close()
 
-        for item in items:
-            validate('row length', item, length=7)
+    def __sort_by_price(self) -> None:
+        self.__fleamarket.sort_by_price()
 
-            item_id = int(item['id'])
-            name = Name(str(item['name']))
-            description = Description(str(item['description']))
-            condition = Condition(str(item['condition']))
-            brand = Brand(str(item['brand']))
-            price = Price.create(int(int(item['price']) / 100), int(item['price']) % 100)
-            category = Category(str(item['category']))
+    def __sort_by_condition(self) -> None:
+        self.__fleamarket.sort_by_condition()
 
-            self.__id_dictionary.append([item_id, name.value, brand.value])
+    def __sort_by_brand(self) -> None:
+        self.__fleamarket.sort_by_brand()
 
-            self.__fleamarket.add_item(Item(name, description, condition, brand, price, category))
+    def __store(self, new_item: Any) -> int:
+        req = self.__run('Saving the item...', lambda progress: self.__api.add_item(new_item))
+
+        return int(req.json()['id'])
+
+    def __delete(self, item_id: int) -> None:
+        self.__run('Removing the item...', lambda progress: self.__api.delete_item(item_id))
+
+    def __superdelete(self, item_id: int) -> None:
+        self.__run('Removing the item...', lambda progress: self.__api.delete_item(item_id, 'item-moderator/'))
+
+    # The fetches run on the worker, see __run(); the event loop does not touch the market until they are done
+    def __fetch(self, progress: Callable) -> None:
+        self.__fetch_from('item/', progress)
+
+    def __fetch_admin(self, progress: Callable) -> None:
+        self.__fetch_from('item-moderator/', progress)
+
+    def __fetch_from(self, endpoint: str, progress: Callable) -> None:
+        self.__window = 0
+        if self.__paged:
+            self.__fleamarket = PagedFleaMarket(lambda offset, limit, ordering: self.__api.items_page(offset, limit, ordering,
+                                                                                                     endpoint))
+            try:
+                self.__fleamarket.items()  # load the first page only
+                return
+            except NotPaginated:  # then every page would download the whole listing: load it once instead
+                self.__paged = False
+                self.__fleamarket = FleaMarket()
+        self.__sync(endpoint, progress)
+
+    # An empty market is shown as soon as the rows of its first window are in: the rest of the download is left to
+    # __revalidate(), which goes on with it in the background once the window is open. The progress window is closed
+    # by then, so the rest reports to the progress of its own call, and it is read to the end on the worker.
+    def __sync(self, endpoint: str, progress: Callable) -> None:
+        username = self.__username
+        report = [progress]
+        etag, rows = self.__api.items_if_changed(self.__etag if endpoint == self.__synced else None, endpoint,
+                                                 progress=lambda done, total: report[0](done, total))
+        self.__synced = endpoint
+        if rows is None:
+            return
+        rows = iter(rows)
+        first = list(islice(rows, self.__window_size + 1))
+        if len(first) > self.__window_size and self.__fleamarket.items() == 0:
+            self.__fleamarket.sync(first[:self.__window_size])
+            self.__etag = None
+
+            def rest(progress: Callable) -> tuple:
+                report[0] = progress
+                return etag, self.__saved(username, endpoint, etag, list(chain(first, rows)))
+            self.__rest = rest
+            return
+        self.__fleamarket.sync(self.__saved(username, endpoint, etag, chain(first, rows)))
+        self.__etag = etag
+
+    def __download(self, endpoint: str, etag: Optional[str], progress: Optional[Callable] = None) -> tuple:
+        username = self.__username
+        etag, rows = self.__api.items_if_changed(etag, endpoint, progress=progress)
+        return etag, self.__saved(username, endpoint, etag, rows)
+
+    # Every download is also written to the cache of the user who asked for it, if there is one
+    def __saved(self, username: str, endpoint: str, etag: Optional[str], rows: Optional[Iterable]) -> Optional[Iterable]:
+        if rows is not None and self.__cache is not None:
+            rows = list(rows)
+            self.__cache.save(username, f'{self.__api.address}{endpoint}', etag, rows)
+        return rows
+
+    # The catalog of another user is not the one on screen, nor the one its ETag stands for
+    def __signed_in(self, username: Username, offline: bool) -> None:
+        if username.value != self.__username:
+            self.__fleamarket.clear()
+            self.__etag, self.__synced = None, None
+        self.__username = username.value
+        self.__offline = offline
+
+    # The first time an endpoint is opened its cached items are shown right away, if there are any; the server is
+    # asked for changes once the window is open, see __revalidate()
+    def __load_cached(self, endpoint: str) -> bool:
+        if self.__cache is None or self.__paged or endpoint == self.__synced:
+            return False
+        etag, rows = self.__cache.load(self.__username, f'{self.__api.address}{endpoint}')
+        if rows is None:
+            return False
+        self.__window = 0
+        self.__fleamarket.sync(rows)
+        self.__etag, self.__synced = etag, endpoint
+        return True
+
+    def __revalidate(self, window: sg.Window, endpoint: str, cached: bool) -> None:
+        self.__revalidating, self.__stale = None, False
+        rest, self.__rest = self.__rest, None
+        if self.__offline:
+            self.__disable_changes(window)
+        elif rest is not None:
+            self.__revalidating = endpoint
+            self.__worker.submit(window, '-sync-', rest)
+        elif cached:
+            self.__revalidating = endpoint
+            etag = self.__etag
+            self.__worker.submit(window, '-sync-', lambda progress: self.__download(endpoint, etag))
+
+    # A revalidation under way may have been read before a local change, which applying it would revert
+    def __changed(self) -> None:
+        self.__stale = self.__revalidating is not None
+
+    # The answer of the server to __revalidate(): the rows are applied here, on the event loop, unless the items were
+    # changed meanwhile: then the server is asked again
+    def __revalidated(self, window: sg.Window, message: Any) -> None:
+        if isinstance(message, Done) and self.__stale:
+            self.__revalidate(window, self.__revalidating, True)
+        elif isinstance(message, Done):
+            self.__revalidating = None
+            etag, rows = message.result
+            if rows is not None:
+                self.__fleamarket.sync(rows)
+                self.__refresh(window)
+            self.__etag = etag
+        elif isinstance(message, Failed):
+            self.__revalidating = None
+            self.__offline = True
+            self.__disable_changes(window)
+            sg.Popup('Server not reachable: the cached items are shown read-only')
+
+    # Changes need the server; offline only the cached items can be browsed
+    @staticmethod
+    def __disable_changes(window: sg.Window) -> None:
+        for key in ('Add', 'Import', '-edit-', '-remove-'):
+            if key in window.key_dict:
+                window[key].Update(disabled=True)
 
-    def __fetch_users_list(self) -> None:
+    def __fetch_users_list(self, progress: Callable) -> None:
         self.__users_list.clear()
-        res = requests.get(url=f'{api_address}users/', headers={'Authorization': f'Token {self.__key}'})
+        res = self.__api.users()
 
         if res.status_code != 200:
             raise RuntimeError()
@@ -612,7 +910,7 @@ class Gui:
 #  _____________MAIN_____________
 def main(name: str):
     if name == '__main__':
-        Gui().first_menu()
+        Gui(cache=CatalogCache()).first_menu()
 
 
 main(__name__)
\ No newline at end of file
@@ -0,0 +1,113 @@
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Hashable, List, Optional, Sequence, Tuple
+
+from typeguard import typechecked
+from valid8 import validate
+
+
+# One change to the rows on screen: 'replace' the row at position, 'delete' it, 'insert' row at position,
+# or 'move' the row at position to target
+@typechecked
+@dataclass(frozen=True)
+class RowChange:
+    kind: str
+    position: int
+    row: Optional[List[Any]] = None
+    target: Optional[int] = None
+
+    def __post_init__(self):
+        validate('kind', self.kind, is_in={'replace', 'delete', 'insert', 'move'})
+
+
+# The same key twice, e.g. two equal items that are their own keys, is told apart by the number of its occurrence
+def _occurrences(keys: Sequence[Hashable]) -> List[Tuple[Hashable, int]]:
+    seen = Counter()
+    res = []
+    for key in keys:
+        res.append((key, seen[key]))
+        seen[key] += 1
+    return res
+
+
+# Keys and values of the rows on screen. update() returns the changes that, applied in order, turn them into the
+# next rendering of the visible window: an edited row is one replace, a removed one is one delete, and so on.
+# Rows whose key stays but whose values change, e.g. because their number shifted, are replaced as well.
+@typechecked
+@dataclass()
+class TableRows:
+    __keys: List[Hashable] = field(default_factory=list, init=False)
+    __rows: List[List[Any]] = field(default_factory=list, init=False)
+
+    def reset(self, keys: Sequence[Hashable], rows: Sequence[List[Any]]) -> None:
+        validate('rows', rows, length=len(keys))
+        self.__keys, self.__rows = list(keys), list(rows)
+
+    def update(self, keys: Sequence[Hashable], rows: Sequence[List[Any]]) -> List[RowChange]:
+        validate('rows', rows, length=len(keys))
+        unique_keys = _occurrences(keys)
+        current_keys, current_rows = _occurrences(self.__keys), self.__rows
+        old, new = set(current_keys), set(unique_keys)
+        changes = []
+
+        for position in range(min(len(current_keys), len(unique_keys))):
+            if current_keys[position] not in new and unique_keys[position] not in old:
+                current_keys[position], current_rows[position] = unique_keys[position], rows[position]
+                changes.append(RowChange('replace', position, rows[position]))
+
+        for position in reversed(range(len(current_keys))):
+            if current_keys[position] not in new:
+                del current_keys[position], current_rows[position]
+                changes.append(RowChange('delete', position))
+
+        present = set(current_keys)
+        for position, key in enumerate(unique_keys):
+            if position < len(current_keys) and current_keys[position] == key:
+                continue
+            if key in present:
+                source = current_keys.index(key, position)
+                current_keys.insert(position, current_keys.pop(source))
+                current_rows.insert(position, current_rows.pop(source))
+                changes.append(RowChange('move', source, target=position))
+            else:
+                current_keys.insert(position, key)
+                current_rows.insert(position, rows[position])
+                changes.append(RowChange('insert', position, rows[position]))
+
+        for position, row in enumerate(rows):
+            if current_rows[position] != row:
+                current_rows[position] = row
+                changes.append(RowChange('replace', position, row))
+
+        self.reset(keys, rows)
+        return changes
+
+
+# Apply changes to a ttk.Treeview, the widget of a PySimpleGUI Table. New item ids are numeric like the ones
+# PySimpleGUI gives, since it reads them back with int() on selection; the row tags, which PySimpleGUI uses for the
+# alternating colors, follow the positions again after rows were inserted, deleted or moved.
+def apply(tree: Any, changes: Sequence[RowChange]) -> None:
+    iids = list(tree.get_children())
+    next_iid = max((int(iid) for iid in iids), default=0) + 1
+    moved = False
+    for change in changes:
+        if change.kind == 'replace':
+            tree.item(iids[change.position], values=change.row)
+        elif change.kind == 'delete':
+            tree.delete(iids.pop(change.position))
+        elif change.kind == 'insert':
+            iids.insert(change.position, tree.insert('', change.position, iid=str(next_iid), values=change.row))
+            next_iid += 1
+        else:
+            iids.insert(change.target, iids.pop(change.position))
+            tree.move(iids[change.target], '', change.target)
+        moved = moved or change.kind != 'replace'
+    if moved:
+        for position, iid in enumerate(iids):
+            tree.item(iid, tags=(position,))
+
+
+# Position of the selected row, read from the widget since the item ids do not follow the positions after apply()
+def selected(tree: Any) -> Optional[int]:
+    selection = tree.selection()
+    return tree.index(selection[0]) if selection else None
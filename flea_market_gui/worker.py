@@ -0,0 +1,51 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+from typeguard import typechecked
+
+
+# Messages posted by the worker under the key of a call: any number of Progress, then one Done or Failed
+@typechecked
+@dataclass(frozen=True)
+class Progress:
+    done: int
+    total: Optional[int] = None
+
+
+@typechecked
+@dataclass(frozen=True)
+class Done:
+    result: Any
+
+
+@typechecked
+@dataclass(frozen=True)
+class Failed:
+    error: BaseException
+
+
+# Runs blocking calls, i.e. the API requests, on a pool of threads, so the event loop keeps reading the windows while
+# they are in flight. Results come back as events of the window, through write_event_value(), the one window method
+# that may be called from another thread.
+class Worker:
+    def __init__(self, threads: int = 4):
+        self.__pool = ThreadPoolExecutor(threads, thread_name_prefix='worker')
+
+    # call(progress) runs on the pool; progress(done, total) may be called from it as often as it likes
+    def submit(self, window: Any, key: str, call: Callable[[Callable[[int, Optional[int]], None]], Any]) -> Future:
+        def progress(done: int, total: Optional[int] = None) -> None:
+            window.write_event_value(key, Progress(done, total))
+
+        def run() -> None:
+            try:
+                result = call(progress)
+            except Exception as e:
+                window.write_event_value(key, Failed(e))
+            else:
+                window.write_event_value(key, Done(result))
+
+        return self.__pool.submit(run)
+
+    def shutdown(self) -> None:
+        self.__pool.shutdown()
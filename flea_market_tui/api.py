@@ -0,0 +1,209 @@
+import codecs
+import json
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from valid8 import validate
+
+from flea_market_tui.domain import Item, Name, Description, Condition, Brand, Price, Category
+from validation.batch import validate_rows
+
+api_address = 'http://localhost:8000/api/v1/'
+
+Timeout = Union[float, Tuple[float, float]]
+
+# Called with the bytes received so far and the Content-Length, if the server sent one
+Progress = Callable[[int, Optional[int]], None]
+
+
+def _trusted_item(row: Dict[str, Any]) -> Tuple[int, Item]:
+    return row['id'], Item.from_trusted_row(row['name'], row['description'], str(row['condition']), row['brand'],
+                                            row['price'], row['category'])
+
+
+def _validated_item(row: Dict[str, Any]) -> Tuple[int, Item]:
+    validate('row length', row, length=7)
+
+    item_id = int(row['id'])
+    name = Name(str(row['name']))
+    description = Description(str(row['description']))
+    condition = Condition.of(str(row['condition']))
+    brand = Brand.of(str(row['brand']))
+    price = Price.create(int(int(row['price']) / 100), int(row['price']) % 100)
+    category = Category.of(str(row['category']))
+
+    return item_id, Item(name, description, condition, brand, price, category)
+
+
+# Validate the rows as one batch, column by column, and build the clean ones without checking them again.
+# A rejected row goes through the full per-field checks, which convert what they can and raise the detailed error.
+def parse_rows(rows: Sequence[Any]) -> Iterator[Tuple[int, Item]]:
+    rejected = validate_rows(rows).rejected()
+    for number, row in enumerate(rows):
+        yield _validated_item(row) if number in rejected else _trusted_item(row)
+
+
+# Yield the elements of a top-level JSON array as soon as each one is complete, without holding the whole document
+def iter_json_array(chunks: Iterable[str]) -> Iterator[Any]:
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = False
+    for chunk in chunks:
+        buffer += chunk
+        pos = 0
+        while True:
+            while pos < len(buffer) and (buffer[pos].isspace() or (started and buffer[pos] == ',')):
+                pos += 1
+            if pos == len(buffer):
+                break
+            if not started:
+                if buffer[pos] != '[':
+                    raise ValueError('Expected a JSON array')
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == ']':
+                return
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                break
+            if end == len(buffer) and not isinstance(value, (dict, list)):
+                break  # a number or literal may continue in the next chunk
+            yield value
+            pos = end
+        buffer = buffer[pos:]
+    raise ValueError('Truncated JSON array')
+
+
+# The endpoint answered a page request with the whole listing, so paging it would download everything every time
+class NotPaginated(Exception):
+    pass
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    def __init__(self, timeout: Timeout, *args, **kwargs):
+        self.__timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.__timeout
+        return super().send(request, **kwargs)
+
+
+# One keep-alive session shared by every call, with the auth token set once after login
+class ApiClient:
+    def __init__(self, address: str = api_address, pool_size: int = 10, timeout: Timeout = (3.05, 30)):
+        self.__address = address
+        self.__session = requests.Session()
+        adapter = TimeoutHTTPAdapter(timeout, pool_connections=pool_size, pool_maxsize=pool_size)
+        self.__session.mount('http://', adapter)
+        self.__session.mount('https://', adapter)
+
+    @property
+    def address(self) -> str:
+        return self.__address
+
+    @property
+    def session(self) -> requests.Session:
+        return self.__session
+
+    def authorize(self, key: Optional[str]) -> None:
+        if key is None:
+            self.__session.headers.pop('Authorization', None)
+        else:
+            self.__session.headers['Authorization'] = f'Token {key}'
+
+    def login(self, username: Any, password: Any) -> requests.Response:
+        return self.__session.post(url=f'{self.__address}auth/login/',
+                                   data={'username': username, 'password': password})
+
+    def register(self, username: Any, email: Any, password: Any) -> requests.Response:
+        return self.__session.post(url=f'{self.__address}auth/registration',
+                                   data={'username': username, 'email': email,
+                                         'password1': password, 'password2': password})
+
+    def items(self, endpoint: str = 'item/') -> requests.Response:
+        return self.__session.get(url=f'{self.__address}{endpoint}')
+
+    def stream_items(self, endpoint: str = 'item/', chunk_size: int = 64 * 1024, batch_size: int = 1024,
+                     progress: Optional[Progress] = None) -> Iterator[Tuple[int, Item]]:
+        res = self.__session.get(url=f'{self.__address}{endpoint}', stream=True)
+        if res.status_code != 200:
+            res.close()
+            raise RuntimeError()
+        yield from self.__parse_stream(res, chunk_size, batch_size, progress)
+
+    # Conditional GET: returns the new ETag and the streamed rows, or the given ETag and None if nothing changed
+    def items_if_changed(self, etag: Optional[str] = None, endpoint: str = 'item/', chunk_size: int = 64 * 1024,
+                         batch_size: int = 1024, progress: Optional[Progress] = None) \
+            -> Tuple[Optional[str], Optional[Iterator[Tuple[int, Item]]]]:
+        headers = {'If-None-Match': etag} if etag is not None else {}
+        res = self.__session.get(url=f'{self.__address}{endpoint}', headers=headers, stream=True)
+        if res.status_code == 304:
+            res.close()
+            return etag, None
+        if res.status_code != 200:
+            res.close()
+            raise RuntimeError()
+        return res.headers.get('ETag'), self.__parse_stream(res, chunk_size, batch_size, progress)
+
+    # The rows are parsed while the body is read, so the bytes received are also how far the parsing got.
+    # They are counted on the wire, like the Content-Length, also when the body is compressed.
+    @staticmethod
+    def __parse_stream(res: requests.Response, chunk_size: int, batch_size: int,
+                       progress: Optional[Progress] = None) -> Iterator[Tuple[int, Item]]:
+        try:
+            decoder = codecs.getincrementaldecoder('utf-8')()
+            chunks = (decoder.decode(chunk) for chunk in res.iter_content(chunk_size=chunk_size))
+            if progress is not None:
+                chunks = ApiClient.__reported(chunks, res, progress)
+            rows = iter_json_array(chunks)
+            for batch in iter(lambda: list(islice(rows, batch_size)), []):
+                yield from parse_rows(batch)
+        finally:
+            res.close()
+
+    @staticmethod
+    def __reported(chunks: Iterator[str], res: requests.Response, progress: Progress) -> Iterator[str]:
+        length = res.headers.get('Content-Length')
+        total = int(length) if length is not None else None
+        for chunk in chunks:
+            progress(res.raw.tell(), total)
+            yield chunk
+
+    def items_page(self, offset: int, limit: int, ordering: Optional[str] = None,
+                   endpoint: str = 'item/') -> Tuple[int, List[Tuple[int, Item]]]:
+        params = {'limit': limit, 'offset': offset}
+        if ordering is not None:
+            params['ordering'] = ordering
+        res = self.__session.get(url=f'{self.__address}{endpoint}', params=params)
+
+        if res.status_code != 200:
+            raise RuntimeError()
+
+        body = res.json()
+        if isinstance(body, list):
+            raise NotPaginated(f'{endpoint} does not paginate its items')
+        return int(body['count']), list(parse_rows(body['results']))
+
+    def users(self) -> requests.Response:
+        return self.__session.get(url=f'{self.__address}users/')
+
+    def add_item(self, item: Any) -> requests.Response:
+        return self.__session.post(url=f'{self.__address}item/add/', data=self.__item_data(item))
+
+    def edit_item(self, item_id: int, item: Any) -> requests.Response:
+        return self.__session.patch(url=f'{self.__address}item/edit/{item_id}/', data=self.__item_data(item))
+
+    def delete_item(self, item_id: int, endpoint: str = 'item/') -> requests.Response:
+        return self.__session.delete(url=f'{self.__address}{endpoint}edit/{item_id}')
+
+    @staticmethod
+    def __item_data(item: Any) -> dict:
+        return {'name': item.name.value, 'description': item.description.value,
+                'condition': item.condition.value, 'brand': item.brand.value,
+                'price': item.price.value_in_cents, 'category': item.category.value}
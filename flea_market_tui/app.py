@@ -1,24 +1,48 @@
+import asyncio
+import dataclasses
 import sys
-from typing import Any, Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import chain, islice
+from pathlib import Path
+from typing import Any, Callable, Iterable, Optional, Tuple
 
-import requests as requests
+import requests
 from valid8 import validate, ValidationError
 
+from flea_market_tui.api import ApiClient, NotPaginated
+from flea_market_tui.async_api import AsyncApiClient
+from flea_market_tui.cache import CatalogCache
 from flea_market_tui.domain import FleaMarket, Username, Password, Email, Item, Name, Description, Price, Brand, \
-    Condition, Category
+    Condition, Category, Facets
+from flea_market_tui.importer import import_items
 from flea_market_tui.menu import Menu, MenuDescription, Entry
-
-api_address = 'http://localhost:8000/api/v1/'
+from flea_market_tui.paged import PagedFleaMarket
+from flea_market_tui.rows import RowCache
+from flea_market_tui.stats import euro
 
 class App:
     __logged = False
-    __key = None
-    __id_dictionary = []
 
-    def __init__(self):
+    def __init__(self, api: Optional[ApiClient] = None, paged: bool = False, window_size: int = 20,
+                 cache: Optional[CatalogCache] = None):
+        validate('window_size', window_size, min_value=1)
+        self.__api = api if api is not None else ApiClient()
         self.__login_menu = self.init_login_menu()
         self.__home_menu = self.__init_home_menu()
-        self.__fleamarket = FleaMarket()
+        self.__paged = paged
+        self.__fleamarket = PagedFleaMarket(lambda offset, limit, ordering: self.__api.items_page(offset, limit, ordering)) \
+            if paged else FleaMarket()
+        self.__window = 0
+        self.__window_size = window_size
+        self.__etag = None
+        self.__facets = Facets()
+        self.__row_cache = RowCache(self.__format_row)
+        self.__cache = cache
+        self.__offline = False
+        self.__username: Optional[str] = None
+        self.__revalidations = ThreadPoolExecutor(1)
+        self.__revalidation: Optional[Future] = None
+        self.__stale = False
 
     def init_login_menu(self) -> Menu:
         return Menu.Builder(MenuDescription('SIGN-IN'), auto_select=lambda: print('Welcome!')) \
@@ -35,6 +59,14 @@ class App:
             .with_entry(Entry.create('4', 'Sort by Condition', on_selected=lambda: self.__sort_by_condition())) \
             .with_entry(Entry.create('5', 'Sort by Brand', on_selected=lambda: self.__sort_by_brand())) \
             .with_entry(Entry.create('6', 'Edit Item', on_selected=lambda: self.__edit_item())) \
+            .with_entry(Entry.create('7', 'Next page', on_selected=lambda: self.__move_window(self.__window_size))) \
+            .with_entry(Entry.create('8', 'Previous page', on_selected=lambda: self.__move_window(-self.__window_size))) \
+            .with_entry(Entry.create('9', 'Import Items', on_selected=lambda: self.__import_items())) \
+            .with_entry(Entry.create('10', 'Search', on_selected=lambda: self.__search())) \
+            .with_entry(Entry.create('11', 'Filter', on_selected=lambda: self.__filter())) \
+            .with_entry(Entry.create('12', 'Statistics', on_selected=lambda: self.__print_stats())) \
+            .with_entry(Entry.create('13', 'Go to page', on_selected=lambda: self.__go_to_page())) \
+            .with_entry(Entry.create('14', 'Rows per page', on_selected=lambda: self.__set_page_size())) \
             .with_entry(Entry.create('0', 'Exit', on_selected=lambda: print('Exited!'), is_exit=True)) \
             .build()
 
@@ -42,23 +74,43 @@ class App:
         username = self.__read_input("Username", Username)
         password = self.__read_input("Password", Password)
 
-        res = requests.post(url=f'{api_address}auth/login/', data={'username': username, 'password': password})
+        try:
+            res = self.__api.login(username, password)
+        except requests.ConnectionError:
+            if self.__cache is None:
+                raise
+            if not self.__cache.recognizes(username.value, 'user', password.value):
+                print('Server not reachable: only users who signed in here before can browse offline')
+                return False
+            print('Server not reachable: the cached items are shown read-only')
+            self.__signed_in(username, offline=True)
+            return True
 
         if res.status_code != 200:
             print('User does not exist :( Please retry!')
             return False
         print("login successfully")
-        self.__key = res.json()['key']
+        self.__api.authorize(res.json()['key'])
+        if self.__cache is not None:
+            self.__cache.remember(username.value, 'user', password.value)
+        self.__signed_in(username, offline=False)
         return True
 
+    # The catalog of another user is not the one on screen, nor the one its ETag stands for
+    def __signed_in(self, username: Username, offline: bool) -> None:
+        if username.value != self.__username:
+            self.__fleamarket.clear()
+            self.__etag = None
+            self.__revalidation, self.__stale = None, False
+        self.__username = username.value
+        self.__offline = offline
+
     def __register(self) -> None:
         username = self.__read_input("Username", Username)
         email = self.__read_input("Email", Email)
         password = self.__read_input("Password", Password)
 
-        res = requests.post(url=f'{api_address}auth/registration',
-                            data={'username': username, 'email': email,
-                                  'password1': password, 'password2': password})
+        res = self.__api.register(username, email, password)
 
         if res.status_code == 400:
             print('Not Valid new Users!')
@@ -76,34 +128,84 @@ class App:
         else:
             print('Registration completed!')
 
+    __conditions = {'0': 'AS NEW', '1': 'GOOD CONDITION', '2': 'ACCEPTABLE CONDITION'}
+
+    # Everything of a row but its number, which depends on the position
+    @staticmethod
+    def __format_row(item: Item) -> str:
+        return '%-30s %-30s %-30s %-30s %-30s %-50s' % (item.name, item.description,
+                                                        App.__conditions[item.condition.value], item.brand, item.price,
+                                                        item.category)
+
+    # The page is built as one string and written with a single print; only the rows on the page are read, and only
+    # the ones that changed since the last time they were shown are formatted again
     def __print_items(self) -> None:
-        print_separator = lambda: print('-' * 200)
+        self.__apply_revalidation()
+        separator = '-' * 200
+        lines = [separator, '%-3s %-30s %-30s %-30s %-30s %-30s %-50s' % ('#', 'NAME', 'DESCRIPTION', 'CONDITION',
+                                                                          'BRAND', 'PRICE', 'CATEGORY'), separator]
+
+        rows, counts = self.__fleamarket.filter(self.__facets) if self.__facets != Facets() \
+            else (range(self.__fleamarket.items()), None)
+        items = len(rows)
+        self.__window = max(0, min(self.__window, (items - 1) // self.__window_size * self.__window_size))
+        last = min(self.__window + self.__window_size, items)
+        page = rows[self.__window:last]
+        formatted = self.__row_cache.rows(self.__fleamarket.row_keys(page), lambda i: self.__fleamarket.item(page[i]))
+        lines.extend('%-3s %s' % (index + 1, row) for index, row in zip(page, formatted))
+
+        lines.append(separator)
+        if counts is not None:
+            lines.append(f'Filter: {self.__facets}')
+            lines.extend(f'{name.capitalize()}: ' + ', '.join(f'{value} ({count})' for value, count in values.items())
+                         for name, values in counts.items())
+        lines.append(f'Rows {min(self.__window + 1, last)}-{last} of {items}')
+        lines.append(f'Page {self.__window // self.__window_size + 1} of {self.__pages(items)}')
+        print('\n'.join(lines))
+
+    def __pages(self, items: int) -> int:
+        return max(1, -(-items // self.__window_size))
+
+    def __move_window(self, rows: int) -> None:
+        self.__window = max(0, self.__window + rows)
+
+    def __go_to_page(self) -> None:
+        items = len(self.__fleamarket.filter(self.__facets)[0]) if self.__facets != Facets() \
+            else self.__fleamarket.items()
 
-        print_separator()
+        def builder(value: str) -> int:
+            validate('value', int(value), min_value=1, max_value=self.__pages(items))
+            return int(value)
 
-        fmt = '%-3s %-30s %-30s %-30s %-30s %-30s %-50s'
-        print(fmt % ('#', 'NAME', 'DESCRIPTION', 'CONDITION', 'BRAND', 'PRICE', 'CATEGORY'))
+        self.__window = (self.__read_input(f'Page (1-{self.__pages(items)})', builder) - 1) * self.__window_size
 
-        print_separator()
+    def __set_page_size(self) -> None:
+        def builder(value: str) -> int:
+            validate('value', int(value), min_value=1, max_value=1000)
+            return int(value)
 
-        for index in range(self.__fleamarket.items()):
-            item = self.__fleamarket.item(index)
-            if str(item.condition) == '0':
-                print(fmt % (index + 1, item.name, item.description, 'AS NEW', item.brand, item.price, item.category))
-            elif str(item.condition) == '1':
-                print(fmt % (index + 1, item.name, item.description, 'GOOD CONDITION', item.brand, item.price, item.category))
-            elif str(item.condition) == '2':
-                print(fmt % (index + 1, item.name, item.description, 'ACCEPTABLE CONDITION', item.brand, item.price, item.category))
+        first = self.__window
+        self.__window_size = self.__read_input('Rows per page (1-1000)', builder)
+        self.__window = first // self.__window_size * self.__window_size
 
-        print_separator()
+    # Changes need the server; offline only the cached items can be browsed
+    def __read_only(self) -> bool:
+        if self.__offline:
+            print('Not available offline')
+        return self.__offline
 
     def __add_item(self) -> None:
+        if self.__read_only():
+            return
         item = self.__read_item()
-        self.__fleamarket.add_item(item)
-        self.__save(item)
+        self.__fleamarket.add_item(item, self.__save(item))
+        self.__changed()
         print('Item added!')
 
     def __remove_item(self) -> None:
+        if self.__read_only():
+            return
+
         def builder(value: str) -> int:
             validate('value', int(value), min_value=0, max_value=self.__fleamarket.items())
             return int(value)
@@ -113,10 +215,78 @@ class App:
             print('Cancelled!')
             return
 
-        self.__delete(self.__fleamarket.item(index - 1))
+        self.__delete(self.__fleamarket.item_id(index - 1))
         self.__fleamarket.remove_item(index - 1)
+        self.__changed()
         print('Item removed!')
 
+    def __import_items(self) -> None:
+        if self.__read_only():
+            return
+
+        def builder(value: str) -> Path:
+            path = Path(value)
+            if value != '0':
+                validate('suffix', path.suffix.lower(), is_in={'.csv', '.jsonl'})
+                validate('path', path, custom=lambda p: p.is_file())
+            return path
+
+        path = self.__read_input('CSV or JSONL file (0 to cancel)', builder)
+        if str(path) == '0':
+            print('Cancelled!')
+            return
+
+        try:
+            report = asyncio.run(import_items(path, AsyncApiClient(self.__api)))
+        except OSError as e:
+            print(f'Cannot read {path}: {e.strerror or e}')
+            return
+        for item_id, item in report.imported:
+            self.__fleamarket.add_item(item, item_id)
+        self.__changed()
+        for error in report.errors:
+            print(error)
+        print(f'{len(report.imported)} items imported, {len(report.errors)} errors')
+
+    def __search(self) -> None:
+        if self.__paged:
+            print('Search is not available in paged mode')
+            return
+
+        text = self.__read_input('Search, e.g. red nike OR adidas (empty to show all items)', str) or None
+        self.__facets = dataclasses.replace(self.__facets, text=text)
+        self.__window = 0
+
+    def __filter(self) -> None:
+        if self.__paged:
+            print('Filter is not available in paged mode')
+            return
+
+        def values(builder: Callable) -> Callable[[str], frozenset]:
+            return lambda line: frozenset(builder(value.strip()) for value in line.split(',') if value.strip())
+
+        categories = self.__read_input('Categories, comma separated (empty for any)', values(Category))
+        brands = self.__read_input('Brands, comma separated (empty for any)', values(Brand))
+        conditions = self.__read_input('Conditions 0, 1, 2, comma separated (empty for any)', values(Condition))
+        min_price = self.__read_input('Min price (empty for none)', lambda v: Price.parse(v) if v else None)
+        self.__facets = self.__read_input('Max price (empty for none)', lambda v: Facets(
+            categories, brands, conditions, min_price, Price.parse(v) if v else None, self.__facets.text))
+        self.__window = 0
+
+    def __print_stats(self) -> None:
+        if self.__paged:
+            print('Statistics are not available in paged mode')
+            return
+
+        fmt = '%-30s %8s %15s %15s %15s %15s'
+        for by in ('category', 'brand'):
+            print('-' * 200)
+            print(fmt % (by.upper(), 'COUNT', 'MIN', 'MAX', 'MEAN', 'MEDIAN'))
+            print('-' * 200)
+            for key, stats in self.__fleamarket.price_stats(by, buckets=5).items():
+                print(fmt % (key, stats.count, euro(stats.min), euro(stats.max), euro(stats.mean), euro(stats.median)))
+                print(' ' * 31 + '  '.join(f'{euro(low)}-{euro(high)}: {count}' for low, high, count in stats.histogram))
+
     def __sort_by_price(self) -> None:
         self.__fleamarket.sort_by_price()
 
@@ -146,39 +316,98 @@ class App:
             print('Panic error!', file=sys.stderr)
 
     def __fetch(self) -> None:
-        self.__fleamarket.clear()
-        self.__id_dictionary.clear()
-        res = requests.get(url=f'{api_address}item/', headers={'Authorization': f'Token {self.__key}'})
-
-        if res.status_code != 200:
-            raise RuntimeError()
-
-        items = res.json()
-        for item in items:
-            validate('row length', item, length=7)
-
-            item_id = int(item['id'])
-            name = Name(str(item['name']))
-            description = Description(str(item['description']))
-            condition = Condition(str(item['condition']))
-            brand = Brand(str(item['brand']))
-            price = Price.create(int(int(item['price']) / 100), int(item['price']) % 100)
-            category = Category(str(item['category']))
-
-            self.__id_dictionary.append([item_id, name.value, brand.value])
+        self.__window = 0
+        if self.__paged:
+            self.__fleamarket.clear()
+            try:
+                self.__fleamarket.items()  # load the first page only
+                return
+            except NotPaginated:
+                print('The server does not paginate the items: all of them are loaded')
+                self.__paged = False
+                self.__fleamarket = FleaMarket()
+
+        if self.__cache is not None and self.__etag is None:
+            etag, rows = self.__cache.load(self.__username, self.__catalog_url())
+            if rows is not None:
+                self.__fleamarket.sync(rows)
+                self.__etag = etag
+                print(f'{len(rows)} items loaded from the cache')
+                if not self.__offline:
+                    self.__revalidation = self.__revalidations.submit(self.__download, etag, self.__username)
+                return
+            if self.__offline:
+                raise RuntimeError()
+        if self.__offline:
+            return
 
-            self.__fleamarket.add_item(Item(name, description, condition, brand, price, category))
+        self.__sync(self.__download(self.__etag, self.__username, self.__fleamarket.items() == 0))
+
+    def __catalog_url(self) -> str:
+        return f'{self.__api.address}item/'
+
+    # Runs on a thread of its own when the cached items are on screen already, so it only reads from the server
+    # and writes the cache; the rows are applied to the market by __sync() on the main thread. With show_first, on
+    # the main thread, the first window is shown as soon as its rows are in, see __show_first().
+    def __download(self, etag: Optional[str], username: str, show_first: bool = False) \
+            -> Tuple[Optional[str], Optional[Iterable]]:
+        etag, rows = self.__api.items_if_changed(etag)
+        if rows is not None and show_first:
+            rows = self.__show_first(rows)
+        if rows is not None and self.__cache is not None:
+            rows = list(rows)
+            self.__cache.save(username, self.__catalog_url(), etag, rows)
+        return etag, rows
+
+    # Sync and print the first window of an empty market before the rest of the rows are downloaded, which are then
+    # synced together with it; a catalog that fits in one window is just synced once
+    def __show_first(self, rows: Iterable) -> Iterable:
+        rows = iter(rows)
+        first = list(islice(rows, self.__window_size + 1))
+        if len(first) > self.__window_size:
+            self.__fleamarket.sync(first[:self.__window_size])
+            self.__print_items()
+            print('Loading the other items...')
+        return chain(first, rows)
+
+    def __sync(self, download: Tuple[Optional[str], Optional[Iterable]]) -> None:
+        etag, rows = download
+        if rows is None:
+            print('Items are up to date')
+            return
+        inserted, updated, deleted = self.__fleamarket.sync(rows)
+        self.__etag = etag
+        print(f'Items synced: {inserted} added, {updated} updated, {deleted} removed')
+
+    # A revalidation under way may have been read before a local change, which applying it would revert
+    def __changed(self) -> None:
+        self.__stale = self.__revalidation is not None
+
+    # The cached items are shown until the server answers; its answer is applied before the next page is printed,
+    # unless the items were changed meanwhile: then the server is asked again
+    def __apply_revalidation(self) -> None:
+        if self.__revalidation is None or not self.__revalidation.done():
+            return
+        revalidation, self.__revalidation = self.__revalidation, None
+        if self.__stale:
+            self.__stale = False
+            self.__revalidation = self.__revalidations.submit(self.__download, self.__etag, self.__username)
+            return
+        try:
+            self.__sync(revalidation.result())
+        except (RuntimeError, ValueError, requests.RequestException):
+            print('Server not reachable: the cached items are shown read-only')
+            self.__offline = True
 
-    def __save(self, item: Any) -> None:
-        req = requests.post(url=f'{api_address}item/add/',
-                            headers={'Authorization': f'Token {self.__key}'},
-                            data={'name': item.name.value, 'description': item.description.value,
-                                  'condition': item.condition.value, 'brand': item.brand.value,
-                                  'price': item.price.value_in_cents, 'category': item.category})
+    def __save(self, item: Any) -> int:
+        req = self.__api.add_item(item)
 
-        self.__id_dictionary.append([req.json()['id'], item.name.value, item.brand.value])
+        return int(req.json()['id'])
 
     def __edit_item(self) -> None:
+        if self.__read_only():
+            return
+
         def builder(value: str) -> int:
             validate('value', int(value), min_value=0, max_value=self.__fleamarket.items())
             return int(value)
@@ -188,34 +417,19 @@ class App:
             print('Cancelled!')
             return
 
-        id_to_edit = self.__find_id(self.__fleamarket.item(index - 1))
+        id_to_edit = self.__fleamarket.item_id(index - 1)
         item = self.__read_item()
-        self.__fleamarket.update_item(index - 1, item)
-        self.__update(self.__fleamarket.item(index - 1), id_to_edit)
+        self.__fleamarket.update_item(index - 1, item)  # moves the item to its place in a sorted view
+        self.__update(item, id_to_edit)
+        self.__changed()
 
     def __update(self, item: Any, id: int) -> None:
-            requests.patch(url=f'{api_address}item/edit/' + str(id)+ '/',
-                           headers={'Authorization': f'Token {self.__key}'},
-                           data={'name': item.name.value, 'description': item.description.value,
-                              'condition': item.condition.value, 'brand': item.brand.value,
-                              'price': item.price.value_in_cents, 'category': item.category})
+            self.__api.edit_item(id, item)
 
             print('Updated successfully!')
 
-    def __find_id(self, item: Item) -> int:
-        for i in range(len(self.__id_dictionary)):
-            if (item.name.value, item.brand.value) == (self.__id_dictionary[i][1], self.__id_dictionary[i][2]):
-                return int(self.__id_dictionary[i][0])
-
-    def __delete(self, item: Any) -> None:
-        index = None
-        for i in range(len(self.__id_dictionary)):
-            if (item.name.value, item.brand.value) == (self.__id_dictionary[i][1], self.__id_dictionary[i][2]):
-                requests.delete(url=f'{api_address}item/edit/{self.__id_dictionary[i][0]}',
-                                headers={'Authorization': f'Token {self.__key}'})
-                index = i
-                break
-        self.__id_dictionary.pop(index)
+    def __delete(self, item_id: int) -> None:
+        self.__api.delete_item(item_id)
 
     def __read_item(self) -> Item:
         name = self.__read_input('Name', Name)
@@ -242,7 +456,7 @@ class App:
 #  _____________MAIN_____________
 def main(name: str):
     if name == '__main__':
-        App().run()
+        App(cache=CatalogCache()).run()
 
 
 main(__name__)
@@ -0,0 +1,58 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List, Optional, Tuple, Union
+
+import requests
+from valid8 import validate
+
+from flea_market_tui.api import ApiClient
+from flea_market_tui.domain import Item
+
+
+# Bulk versions of the ApiClient calls: at most `concurrency` requests are in flight at the same time.
+# Each request runs on one of `concurrency` worker threads over the pooled session of the wrapped client,
+# so connections and the auth token are shared.
+class AsyncApiClient:
+    def __init__(self, api: Optional[ApiClient] = None, concurrency: int = 8):
+        validate('concurrency', concurrency, min_value=1)
+        self.__api = api if api is not None else ApiClient(pool_size=concurrency)
+        self.__concurrency = concurrency
+
+    @property
+    def api(self) -> ApiClient:
+        return self.__api
+
+    # Every result, in order, or the exception its request failed with: a failed request does not stop the others
+    async def __gather(self, call: Callable[..., Any], batch: Iterable[Tuple]) -> List[Any]:
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(max_workers=self.__concurrency) as executor:
+            return list(await asyncio.gather(*(loop.run_in_executor(executor, call, *args) for args in batch),
+                                             return_exceptions=True))
+
+    @staticmethod
+    def __checked(res: Any, action: str) -> Union[requests.Response, Exception]:
+        if isinstance(res, Exception) or 200 <= res.status_code < 300:
+            return res
+        return RuntimeError(f'{action} failed with status {res.status_code}')
+
+    @staticmethod
+    def __saved_id(res: Union[requests.Response, Exception]) -> Union[int, Exception]:
+        if isinstance(res, Exception):
+            return res
+        try:
+            return int(res.json()['id'])
+        except (TypeError, ValueError, KeyError) as e:
+            return RuntimeError(f'upload answered without an id: {e!r}')
+
+    async def save_all(self, items: Iterable[Item]) -> List[Union[int, Exception]]:
+        responses = await self.__gather(self.__api.add_item, ((item,) for item in items))
+        return [self.__saved_id(self.__checked(res, 'upload')) for res in responses]
+
+    async def update_all(self, changes: Iterable[Tuple[int, Item]]) -> List[Union[requests.Response, Exception]]:
+        responses = await self.__gather(self.__api.edit_item, changes)
+        return [self.__checked(res, 'update') for res in responses]
+
+    async def delete_all(self, item_ids: Iterable[int], endpoint: str = 'item/') \
+            -> List[Union[requests.Response, Exception]]:
+        responses = await self.__gather(self.__api.delete_item, ((item_id, endpoint) for item_id in item_ids))
+        return [self.__checked(res, 'delete') for res in responses]
@@ -0,0 +1,101 @@
+import hashlib
+import hmac
+import os
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+from flea_market_tui.domain import Item
+
+# Bumped whenever the tables change; a cache written with another version is dropped and filled again
+schema_version = 2
+
+schema = '''
+CREATE TABLE IF NOT EXISTS login (username TEXT NOT NULL, role TEXT NOT NULL, salt BLOB NOT NULL, digest BLOB NOT NULL,
+                                  PRIMARY KEY (username, role));
+CREATE TABLE IF NOT EXISTS catalog (username TEXT NOT NULL, url TEXT NOT NULL, etag TEXT, PRIMARY KEY (username, url));
+CREATE TABLE IF NOT EXISTS item (username TEXT NOT NULL, url TEXT NOT NULL, position INTEGER NOT NULL,
+                                 id INTEGER NOT NULL, name TEXT NOT NULL, description TEXT NOT NULL,
+                                 condition TEXT NOT NULL, brand TEXT NOT NULL, price INTEGER NOT NULL,
+                                 category TEXT NOT NULL, PRIMARY KEY (username, url, position));
+'''
+
+
+def default_path() -> Path:
+    return Path(os.environ.get('FLEA_MARKET_CACHE', Path.home() / '.flea_market' / 'catalog.sqlite3'))
+
+
+def _digest(password: str, salt: bytes) -> bytes:
+    return hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, 100000)
+
+
+# The last catalog every user downloaded from every url, together with the ETag it was served with, so that a client
+# can show it before the server answers, or without a server at all. Offline, only a user who signed in with the same
+# password and role before is let in (see remember()), and only to the catalogs that user downloaded. The rows were
+# validated when they were downloaded and are rebuilt without checking them again. A cache that cannot be read or
+# written is treated as an empty one: it only ever saves a download.
+class CatalogCache:
+    def __init__(self, path: Optional[Path] = None):
+        self.__path = path if path is not None else default_path()
+
+    @property
+    def path(self) -> Path:
+        return self.__path
+
+    def __connect(self) -> sqlite3.Connection:
+        self.__path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.__path)
+        if connection.execute('PRAGMA user_version').fetchone()[0] != schema_version:
+            connection.executescript('DROP TABLE IF EXISTS login; DROP TABLE IF EXISTS catalog; '
+                                     'DROP TABLE IF EXISTS item;')
+            connection.execute(f'PRAGMA user_version = {schema_version}')
+        connection.executescript(schema)
+        return connection
+
+    # Called after the server accepted a sign in; only a salted hash of the password is kept
+    def remember(self, username: str, role: str, password: str) -> None:
+        salt = os.urandom(16)
+        try:
+            with closing(self.__connect()) as connection, connection:
+                connection.execute('INSERT OR REPLACE INTO login VALUES (?, ?, ?, ?)',
+                                   (username, role, salt, _digest(password, salt)))
+        except (OSError, sqlite3.Error):
+            pass
+
+    # Whether username signed in with this password and role before, i.e. may browse the cached catalogs offline
+    def recognizes(self, username: str, role: str, password: str) -> bool:
+        try:
+            with closing(self.__connect()) as connection:
+                login = connection.execute('SELECT salt, digest FROM login WHERE username = ? AND role = ?',
+                                           (username, role)).fetchone()
+        except (OSError, sqlite3.Error):
+            return False
+        return login is not None and hmac.compare_digest(_digest(password, login[0]), login[1])
+
+    # The ETag and the rows cached for username and url, or (None, None) if there are none
+    def load(self, username: str, url: str) -> Tuple[Optional[str], Optional[List[Tuple[int, Item]]]]:
+        try:
+            with closing(self.__connect()) as connection:
+                catalog = connection.execute('SELECT etag FROM catalog WHERE username = ? AND url = ?',
+                                             (username, url)).fetchone()
+                if catalog is None:
+                    return None, None
+                rows = connection.execute('SELECT id, name, description, condition, brand, price, category FROM item '
+                                          'WHERE username = ? AND url = ? ORDER BY position', (username, url))
+                return catalog[0], [(row[0], Item.from_trusted_row(*row[1:])) for row in rows]
+        except (OSError, sqlite3.Error):
+            return None, None
+
+    # Replace what is cached for username and url, in one transaction
+    def save(self, username: str, url: str, etag: Optional[str], rows: Iterable[Tuple[int, Item]]) -> None:
+        try:
+            with closing(self.__connect()) as connection, connection:
+                connection.execute('DELETE FROM item WHERE username = ? AND url = ?', (username, url))
+                connection.executemany('INSERT INTO item VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                       ((username, url, position, item_id, item.name.value, item.description.value,
+                                         item.condition.value, item.brand.value, item.price.value_in_cents,
+                                         item.category.value) for position, (item_id, item) in enumerate(rows)))
+                connection.execute('INSERT OR REPLACE INTO catalog VALUES (?, ?, ?)', (username, url, etag))
+        except (OSError, sqlite3.Error):
+            pass
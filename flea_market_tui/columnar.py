@@ -0,0 +1,194 @@
+from array import array
+from dataclasses import dataclass, field
+from itertools import count
+from typing import Dict, Iterable, Iterator, List, Callable, Any, Optional, Sequence, Set, Tuple
+
+from typeguard import typechecked
+from valid8 import validate
+
+from flea_market_tui.domain import Item
+from flea_market_tui.market import Market, check_indexes, no_id
+
+
+# Codes of the values of a column, counted by use: the code of a value no longer used goes to the next new one
+@typechecked
+@dataclass(frozen=True)
+class Dictionary:
+    __codes: Dict[str, int] = field(default_factory=dict, init=False)
+    __values: List[Optional[str]] = field(default_factory=list, init=False)
+    __uses: List[int] = field(default_factory=list, init=False)
+    __free: List[int] = field(default_factory=list, init=False)
+
+    def __len__(self) -> int:
+        return len(self.__codes)
+
+    def encode(self, value: str) -> int:
+        code = self.__codes.get(value)
+        if code is None:
+            if self.__free:
+                code = self.__free.pop()
+            else:
+                code = len(self.__values)
+                self.__values.append(None)
+                self.__uses.append(0)
+            self.__codes[value] = code
+            self.__values[code] = value
+        self.__uses[code] += 1
+        return code
+
+    def release(self, code: int) -> None:
+        self.__uses[code] -= 1
+        if not self.__uses[code]:
+            del self.__codes[self.__values[code]]
+            self.__values[code] = None
+            self.__free.append(code)
+
+    def decode(self, code: int) -> str:
+        return self.__values[code]
+
+    def clear(self) -> None:
+        self.__codes.clear()
+        self.__values.clear()
+        self.__uses.clear()
+        self.__free.clear()
+
+
+# Items kept column by column and rebuilt on item(index); sorting reorders the columns
+@typechecked
+@dataclass(frozen=True)
+class ColumnarFleaMarket(Market):
+    __ids: array = field(default_factory=lambda: array('q'), init=False)
+    __versions: array = field(default_factory=lambda: array('q'), init=False)
+    __names: array = field(default_factory=lambda: array('l'), init=False)
+    __descriptions: List[str] = field(default_factory=list, init=False)
+    __conditions: array = field(default_factory=lambda: array('b'), init=False)
+    __brands: array = field(default_factory=lambda: array('l'), init=False)
+    __prices: array = field(default_factory=lambda: array('q'), init=False)
+    __categories: array = field(default_factory=lambda: array('l'), init=False)
+    __name_dictionary: Dictionary = field(default_factory=Dictionary, init=False)
+    __brand_dictionary: Dictionary = field(default_factory=Dictionary, init=False)
+    __category_dictionary: Dictionary = field(default_factory=Dictionary, init=False)
+    __known_ids: Set[int] = field(default_factory=set, init=False)
+    __next_version: Iterator[int] = field(default_factory=count, init=False)
+
+    def __columns(self) -> List[Any]:
+        return [self.__ids, self.__versions, self.__names, self.__descriptions, self.__conditions, self.__brands,
+                self.__prices, self.__categories]
+
+    def items(self) -> int:
+        return len(self.__prices)
+
+    def __item(self, index: int) -> Item:
+        return Item.from_trusted_row(self.__name_dictionary.decode(self.__names[index]), self.__descriptions[index],
+                                     str(self.__conditions[index]),
+                                     self.__brand_dictionary.decode(self.__brands[index]), self.__prices[index],
+                                     self.__category_dictionary.decode(self.__categories[index]))
+
+    def item(self, index: int) -> Item:
+        validate('index', index, min_value=0, max_value=self.items() - 1)
+        return self.__item(index)
+
+    def items_at(self, indexes: Sequence[int]) -> List[Item]:
+        check_indexes(indexes, self.items())
+        return [self.__item(index) for index in indexes]
+
+    def row_keys(self, indexes: Sequence[int]) -> List[int]:
+        check_indexes(indexes, self.items())
+        return [self.__versions[index] for index in indexes]
+
+    def item_id(self, index: int) -> Optional[int]:
+        validate('index', index, min_value=0, max_value=self.items() - 1)
+        item_id = self.__ids[index]
+        return None if item_id == no_id else item_id
+
+    def add_item(self, item: Item, item_id: Optional[int] = None) -> None:
+        if item_id is not None:
+            validate('item_id', item_id, custom=lambda v: v not in self.__known_ids)
+            self.__known_ids.add(item_id)
+        self.__ids.append(no_id if item_id is None else item_id)
+        self.__versions.append(next(self.__next_version))
+        self.__names.append(self.__name_dictionary.encode(item.name.value))
+        self.__descriptions.append(item.description.value)
+        self.__conditions.append(int(item.condition.value))
+        self.__brands.append(self.__brand_dictionary.encode(item.brand.value))
+        self.__prices.append(item.price.value_in_cents)
+        self.__categories.append(self.__category_dictionary.encode(item.category.value))
+
+    def __release(self, index: int) -> None:
+        self.__known_ids.discard(self.__ids[index])
+        self.__name_dictionary.release(self.__names[index])
+        self.__brand_dictionary.release(self.__brands[index])
+        self.__category_dictionary.release(self.__categories[index])
+
+    def remove_item(self, index: int) -> None:
+        validate('index', index, min_value=0, max_value=self.items() - 1)
+        self.__release(index)
+        for column in self.__columns():
+            del column[index]
+
+    def __select(self, order: Sequence[int]) -> None:
+        for column in self.__columns():
+            selected = [column[i] for i in order]
+            column[:] = array(column.typecode, selected) if isinstance(column, array) else selected
+
+    def __sort(self, key: Callable[[int], Any]) -> None:
+        self.__select(sorted(range(self.items()), key=key))
+
+    def sort_by_price(self) -> None:
+        self.__sort(self.__prices.__getitem__)
+
+    def sort_by_condition(self) -> None:
+        self.__sort(self.__conditions.__getitem__)
+
+    def sort_by_brand(self) -> None:
+        self.__sort(lambda i: self.__brand_dictionary.decode(self.__brands[i]))
+
+    def clear(self) -> None:
+        for column in self.__columns():
+            del column[:]
+        self.__name_dictionary.clear()
+        self.__brand_dictionary.clear()
+        self.__category_dictionary.clear()
+        self.__known_ids.clear()
+
+    def update_item(self, index: int, item: Item) -> None:
+        validate('index', index, min_value=0, max_value=self.items() - 1)
+        names, brands, categories = self.__names[index], self.__brands[index], self.__categories[index]
+        self.__versions[index] = next(self.__next_version)
+        self.__names[index] = self.__name_dictionary.encode(item.name.value)
+        self.__descriptions[index] = item.description.value
+        self.__conditions[index] = int(item.condition.value)
+        self.__brands[index] = self.__brand_dictionary.encode(item.brand.value)
+        self.__prices[index] = item.price.value_in_cents
+        self.__categories[index] = self.__category_dictionary.encode(item.category.value)
+        self.__name_dictionary.release(names)
+        self.__brand_dictionary.release(brands)
+        self.__category_dictionary.release(categories)
+
+    # Like FleaMarket.sync()
+    def sync(self, rows: Iterable[Tuple[int, Item]]) -> Tuple[int, int, int]:
+        positions = {item_id: index for index, item_id in enumerate(self.__ids) if item_id != no_id}
+        updated, new, seen = {}, {}, set()
+        for item_id, item in rows:
+            if item_id is None:
+                validate('item_id', item_id)
+            seen.add(item_id)
+            index = positions.get(item_id)
+            if index is None:
+                new[item_id] = item
+            elif self.__item(index) != item:
+                updated[index] = item
+            else:
+                updated.pop(index, None)
+
+        for index, item in updated.items():
+            self.update_item(index, item)
+        kept = [index for index, item_id in enumerate(self.__ids) if item_id == no_id or item_id in seen]
+        deleted = self.items() - len(kept)
+        if deleted:
+            for index in set(range(self.items())).difference(kept):
+                self.__release(index)
+            self.__select(kept)
+        for item_id, item in new.items():
+            self.add_item(item, item_id)
+        return len(new), len(updated), deleted
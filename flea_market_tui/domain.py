@@ -1,70 +1,129 @@
+import heapq
 import re
-from dataclasses import dataclass, InitVar, field
+from dataclasses import dataclass, InitVar, field, fields
+from functools import lru_cache
+from itertools import count
 
-from typing import Any, List
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
 
 from typeguard import typechecked
 
 from valid8 import validate
 
+from flea_market_tui.indexes import FacetIndex, IndexedItems, SortIndex
+from flea_market_tui.market import Market, check_indexes
+from flea_market_tui.search import SearchIndex
+from flea_market_tui.stats import PriceAggregates, PriceStats
 from validation.dataclasses import validate_dataclass
-from validation.regex import pattern
+from validation.registry import registry
+
+
+# The generated __hash__ is computed once into the _hash slot, which copy and pickle leave out
+def _cached_hash(cls: type) -> type:
+    compute = cls.__hash__
+
+    def __hash__(self):
+        try:
+            return self._hash
+        except AttributeError:
+            object.__setattr__(self, '_hash', compute(self))
+            return self._hash
+
+    def __getstate__(self):
+        return tuple(getattr(self, f.name) for f in fields(self))
+
+    def __setstate__(self, state):
+        for f, value in zip(fields(self), state):
+            object.__setattr__(self, f.name, value)
+
+    cls.__hash__ = __hash__
+    cls.__getstate__ = __getstate__
+    cls.__setstate__ = __setstate__
+    return cls
+
+
+# Shared, already validated instances of the low-cardinality value objects; the least recently used ones are evicted
+@lru_cache(maxsize=4096)
+def _interned(cls: type, value: str) -> Any:
+    return cls(value)
 
 
 @typechecked
+@_cached_hash
 @dataclass(frozen=True, order=True)
 class Name:
+    __slots__ = ('value', '_hash')
     value: str
+    __rule = registry.rule('Name.value', r'^[A-Za-z0-9 ]+$', min_len=1, max_len=30)
 
     def __post_init__(self):
         validate_dataclass(self)
-        validate('value', self.value, min_len=1, max_len=30, custom=pattern(r'^[A-Za-z0-9 ]+$'))
+        self.__rule(self.value)
 
     def __str__(self):
         return self.value
 
 @typechecked
+@_cached_hash
 @dataclass(frozen=True, order=True)
 class Description:
+    __slots__ = ('value', '_hash')
     value: str
+    __rule = registry.rule('Description.value', r'^[A-Za-z0-9\(\)\!\,\è\:\;\'\"\. ]*$', max_len=200)
 
     def __post_init__(self):
         validate_dataclass(self)
-        validate('value', self.value, max_len=200, custom=pattern(r'^[A-Za-z0-9\(\)\!\,\è\:\;\'\"\. ]*$'))
+        self.__rule(self.value)
 
     def __str__(self):
         return str(self.value)
 
 
 @typechecked
+@_cached_hash
 @dataclass(frozen=True, order=True)
 class Condition:
+    __slots__ = ('value', '_hash')
     value: str
+    __rule = registry.rule('Condition.value', allowed={'0', '1', '2'})
 
     def __post_init__(self):
         validate_dataclass(self)
-        validate('value', self.value, is_in={'0', '1', '2'})
+        self.__rule(self.value)
 
     def __str__(self):
         return self.value
 
+    @staticmethod
+    def of(value: str) -> 'Condition':
+        return _interned(Condition, value)
+
 
 @typechecked
+@_cached_hash
 @dataclass(frozen=True, order=True)
 class Brand:
+    __slots__ = ('value', '_hash')
     value: str
+    __rule = registry.rule('Brand.value', r'^[A-Za-z\_\-\(\)]+$', min_len=1, max_len=20)
 
     def __post_init__(self):
         validate_dataclass(self)
-        validate('value', self.value, min_len=1, max_len=20, custom=pattern(r'^[A-Za-z\_\-\(\)]+$'))
+        self.__rule(self.value)
 
     def __str__(self):
         return self.value
 
+    @staticmethod
+    def of(value: str) -> 'Brand':
+        return _interned(Brand, value)
+
 
 @typechecked
+@_cached_hash
 @dataclass(frozen=True, order=True)
 class Price:
+    __slots__ = ('value_in_cents', '_hash')
     value_in_cents: int
     create_key: InitVar[Any] = field(default=None)
 
@@ -107,27 +166,35 @@ class Price:
 
 
 @typechecked
+@_cached_hash
 @dataclass(frozen=True, order=True)
 class Category:
+    __slots__ = ('value', '_hash')
     value: str
+    __rule = registry.rule('Category.value', r'^[A-Za-z\_\-\(\) ]+$', min_len=1, max_len=30)
 
     def __post_init__(self):
         validate_dataclass(self)
-        validate('value', self.value, min_len=1, max_len=30, custom=pattern(r'^[A-Za-z\_\-\(\) ]+$'))
+        self.__rule(self.value)
 
     def __str__(self):
         return self.value
 
+    @staticmethod
+    def of(value: str) -> 'Category':
+        return _interned(Category, value)
+
 
 #AUTH DATACLASSES
 @typechecked
 @dataclass(frozen=True, order=True)
 class Email:
     value: str
+    __rule = registry.rule('Email.value', r'[A-Za-z0-9]+[\.]*[A-Za-z]*@[A-Za-z]+\.[a-z]+', min_len=8, max_len=25)
 
     def __post_init__(self):
         validate_dataclass(self)
-        validate('value', self.value, min_len=8, max_len=25, custom=pattern(r'[A-Za-z0-9]+[\.]*[A-Za-z]*@[A-Za-z]+\.[a-z]+'))
+        self.__rule(self.value)
 
     def __str__(self):
         return str(self.value)
@@ -137,10 +204,11 @@ class Email:
 @dataclass(frozen=True, order=True)
 class Username:
     value: str
+    __rule = registry.rule('Username.value', r'[A-Za-z0-9\-\_\@\!\?\.]+', min_len=1, max_len=30)
 
     def __post_init__(self):
         validate_dataclass(self)
-        validate('value', self.value, min_len=1, max_len=30, custom=pattern(r'[A-Za-z0-9\-\_\@\!\?\.]+'))
+        self.__rule(self.value)
 
     def __str__(self):
         return str(self.value)
@@ -150,19 +218,41 @@ class Username:
 @dataclass(frozen=True, order=True)
 class Password:
     value: str
+    __rule = registry.rule('Password.value', r'[A-Za-z0-9\-\_\@\!\?\.]+', min_len=8, max_len=25)
 
     def __post_init__(self):
         validate_dataclass(self)
-        validate('value', self.value, min_len=8, max_len=25, custom=pattern(r'[A-Za-z0-9\-\_\@\!\?\.]+'))
+        self.__rule(self.value)
 
     def __str__(self):
         return str(self.value)
 
 
+# Instance of a frozen dataclass with its fields set directly, bypassing __init__ and __post_init__
+def _trusted(cls: type, **values: Any) -> Any:
+    res = object.__new__(cls)
+    for name, value in values.items():
+        object.__setattr__(res, name, value)
+    return res
+
+
+# Defined outside Item so that @typechecked does not wrap it: this is the hot path of every catalog load
+def _trusted_item(name: str, description: str, condition: str, brand: str, price_in_cents: int,
+                  category: str) -> 'Item':
+    return _trusted(Item, name=_trusted(Name, value=name),
+                    description=_trusted(Description, value=description),
+                    condition=_interned(Condition, condition),
+                    brand=_interned(Brand, brand),
+                    price=_trusted(Price, value_in_cents=price_in_cents),
+                    category=_interned(Category, category))
+
+
 # ITEM AND FLEAMARKET DEFINITION
 @typechecked
+@_cached_hash
 @dataclass(frozen=True, order=True)
 class Item:
+    __slots__ = ('name', 'description', 'condition', 'brand', 'price', 'category', '_hash')
     name: Name
     description: Description
     condition: Condition
@@ -170,39 +260,225 @@ class Item:
     price: Price
     category: Category
 
+    # Builds the value objects without validating them: only for rows that already passed a schema check
+    from_trusted_row = staticmethod(_trusted_item)
+
+
+# What a shopper narrows the catalog down to: any of the given categories, brands and conditions (empty means any),
+# a price range with inclusive bounds and a search query (see SearchIndex)
 @typechecked
 @dataclass(frozen=True)
-class FleaMarket:
-    __items: List[Item] = field(default_factory=list, init=False)
+class Facets:
+    categories: FrozenSet[Category] = frozenset()
+    brands: FrozenSet[Brand] = frozenset()
+    conditions: FrozenSet[Condition] = frozenset()
+    min_price: Optional[Price] = None
+    max_price: Optional[Price] = None
+    text: Optional[str] = None
+
+    def __post_init__(self):
+        if self.min_price is not None and self.max_price is not None:
+            validate('max_price', self.max_price, min_value=self.min_price)
+
+    def __str__(self):
+        res = [f'{name}: {", ".join(sorted(str(v) for v in values))}'
+               for name, values in (('category', self.categories), ('brand', self.brands),
+                                    ('condition', self.conditions)) if values]
+        if self.min_price is not None or self.max_price is not None:
+            res.append(f'price: {self.min_price or "0.00"}-{self.max_price or ""}')
+        if self.text:
+            res.append(f'text: {self.text}')
+        return ', '.join(res)
+
+
+# Items live in slots that never move; item(index) goes through the sort index of the current view,
+# so switching the sort order is O(1) and every mutation keeps all the indexes sorted with bisect.
+@typechecked
+@dataclass()
+class FleaMarket(Market):
+    __items: Dict[int, Item] = field(default_factory=dict, init=False)
+    __next_slot: Iterator[int] = field(default_factory=count, init=False)
+    __indexes: Dict[str, SortIndex] = field(default_factory=lambda: {
+        'insertion': SortIndex(lambda x: 0),
+        'price': SortIndex(lambda x: x.price.value_in_cents),
+        'condition': SortIndex(lambda x: x.condition.value),
+        'brand': SortIndex(lambda x: x.brand.value),
+    }, init=False)
+    __view: str = field(default='insertion', init=False)
+    __ids: Dict[int, int] = field(default_factory=dict, init=False)
+    __slot_ids: Dict[int, int] = field(default_factory=dict, init=False)
+    __versions: Dict[int, int] = field(default_factory=dict, init=False)
+    __search: SearchIndex = field(default_factory=SearchIndex, init=False)
+    __facets: Dict[str, FacetIndex] = field(default_factory=lambda: {
+        'category': FacetIndex(lambda x: x.category),
+        'brand': FacetIndex(lambda x: x.brand),
+        'condition': FacetIndex(lambda x: x.condition),
+    }, init=False)
+    __aggregates: Dict[str, PriceAggregates] = field(default_factory=lambda: {
+        'category': PriceAggregates(lambda x: x.category),
+        'brand': PriceAggregates(lambda x: x.brand),
+    }, init=False)
+    __indexed: IndexedItems = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.__indexed = IndexedItems(self.__items, self.__versions, [
+            *self.__indexes.values(), *self.__facets.values(), *self.__aggregates.values(), self.__search])
+
+    def __slot(self, index: int) -> int:
+        return self.__indexes[self.__view].slot(index)
 
     def items(self) -> int:
         return len(self.__items)
 
     def item(self, index: int) -> Item:
         validate('index', index, min_value=0, max_value=self.items() - 1)
-        return self.__items[index]
+        return self.__items[self.__slot(index)]
+
+    def __slots_at(self, indexes: Sequence[int]) -> List[int]:
+        check_indexes(indexes, self.items())
+        index = self.__indexes[self.__view]
+        return [index.slot(position) for position in indexes]
+
+    def items_at(self, indexes: Sequence[int]) -> List[Item]:
+        return [self.__items[slot] for slot in self.__slots_at(indexes)]
+
+    def row_keys(self, indexes: Sequence[int]) -> List[int]:
+        return [self.__versions[slot] for slot in self.__slots_at(indexes)]
+
+    def add_item(self, item: Item, item_id: Optional[int] = None) -> None:
+        slot = next(self.__next_slot)
+        if item_id is not None:
+            if item_id in self.__ids:  # validate() with a custom function is costly, so only on the failing path
+                validate('item_id', item_id, custom=lambda v: v not in self.__ids)
+            self.__ids[item_id] = slot
+            self.__slot_ids[slot] = item_id
+        self.__indexed.insert(slot, item)
+
+    def item_id(self, index: int) -> Optional[int]:
+        validate('index', index, min_value=0, max_value=self.items() - 1)
+        return self.__slot_ids.get(self.__slot(index))
 
-    def add_item(self, item: Item) -> None:
-        self.__items.append(item)
+    def index_of(self, item_id: int) -> int:
+        validate('item_id', item_id, custom=lambda v: v in self.__ids)
+        slot = self.__ids[item_id]
+        return self.__indexes[self.__view].position(slot, self.__items[slot])
 
     def remove_item(self, index: int) -> None:
         validate('index', index, min_value=0, max_value=self.items() - 1)
-        del self.__items[index]
+        slot = self.__slot(index)
+        item_id = self.__slot_ids.pop(slot, None)
+        if item_id is not None:
+            del self.__ids[item_id]
+        self.__indexed.discard(slot)
+
+    def remove_item_by_id(self, item_id: int) -> None:
+        validate('item_id', item_id, custom=lambda v: v in self.__ids)
+        slot = self.__ids.pop(item_id)
+        del self.__slot_ids[slot]
+        self.__indexed.discard(slot)
 
     def sort_by_price(self) -> None:
-        self.__items.sort(key=lambda x: x.price)
+        self.__view = 'price'
 
     def sort_by_condition(self) -> None:
-        self.__items.sort(key=lambda x: x.condition)
+        self.__view = 'condition'
 
     def sort_by_brand(self) -> None:
-        self.__items.sort(key=lambda x: x.brand)
+        self.__view = 'brand'
 
     def clear(self) -> None:
-        self.__items.clear()
+        self.__indexed.clear()
+        self.__ids.clear()
+        self.__slot_ids.clear()
+
+    # Indexes, in the current sort order, of the items whose name or description match the query (see SearchIndex)
+    def search(self, query: str) -> List[int]:
+        index = self.__indexes[self.__view]
+        return sorted(index.position(slot, self.__items[slot]) for slot in self.__search.search(query))
+
+    def __intersect(self, constraints: Iterable[Set[int]]) -> Set[int]:
+        constraints = sorted(constraints, key=len)
+        return constraints[0].intersection(*constraints[1:]) if constraints else set(self.__items)
+
+    # Indexes of the items matching every facet, and the counts per value each facet would have if left out
+    def filter(self, facets: Facets) -> Tuple[List[int], Dict[str, Dict[Any, int]]]:
+        constraints = {name: self.__facets[name].slots(values) for name, values in
+                       (('category', facets.categories), ('brand', facets.brands), ('condition', facets.conditions))
+                       if values}
+        if facets.min_price is not None or facets.max_price is not None:
+            price = self.__indexes['price']
+            low = facets.min_price.value_in_cents if facets.min_price is not None else 0
+            high = facets.max_price.value_in_cents if facets.max_price is not None else float('inf')
+            constraints['price'] = set(price.slots(*price.between(low, high)))
+        if facets.text:
+            constraints['text'] = self.__search.search(facets.text)
+
+        matches = self.__intersect(constraints.values())
+        counts = {name: facet.counts(self.__intersect(s for other, s in constraints.items() if other != name)
+                                     if name in constraints else matches)
+                  for name, facet in self.__facets.items()}
+        view = self.__indexes[self.__view]
+        return sorted(view.position(slot, self.__items[slot]) for slot in matches), counts
+
+    # Price queries read the price index, or pick the top n of a category with a heap; the current view is untouched
+    def __by_price(self, n: int, category: Optional[Category], largest: bool) -> List[Item]:
+        validate('n', n, min_value=0)
+        if category is None:
+            price = self.__indexes['price']
+            slots = price.slots(max(0, len(price) - n), len(price))[::-1] if largest else price.slots(0, n)
+        else:
+            pick = heapq.nlargest if largest else heapq.nsmallest
+            slots = pick(n, self.__facets['category'].slots([category]),
+                         key=lambda slot: (self.__items[slot].price.value_in_cents, slot))
+        return [self.__items[slot] for slot in slots]
+
+    def cheapest(self, n: int, category: Optional[Category] = None) -> List[Item]:
+        return self.__by_price(n, category, largest=False)
+
+    def most_expensive(self, n: int, category: Optional[Category] = None) -> List[Item]:
+        return self.__by_price(n, category, largest=True)
+
+    # Price statistics per category or per brand, from aggregates kept up to date by every mutation
+    def price_stats(self, by: str, buckets: int = 10) -> Dict[Any, PriceStats]:
+        validate('by', by, is_in=set(self.__aggregates))
+        return self.__aggregates[by].stats(buckets)
+
+    # Items with low <= price <= high, cheapest first
+    def priced_between(self, low: Price, high: Price) -> List[Item]:
+        price = self.__indexes['price']
+        return [self.__items[slot] for slot in price.slots(*price.between(low.value_in_cents, high.value_in_cents))]
+
+    # Apply a full listing by server id, so every row needs one; returns (inserted, updated, deleted)
+    def sync(self, rows: Iterable[Tuple[int, Item]]) -> Tuple[int, int, int]:
+        updated, new, seen = {}, {}, set()
+        for item_id, item in rows:
+            if item_id is None:
+                validate('item_id', item_id)
+            seen.add(item_id)
+            slot = self.__ids.get(item_id)
+            if slot is None:
+                new[item_id] = item  # the same id twice in the listing: the last row wins
+            elif self.__items[slot] != item:
+                updated[slot] = item
+            else:
+                updated.pop(slot, None)
+
+        deleted = [slot for item_id, slot in self.__ids.items() if item_id not in seen]
+        for slot in deleted:
+            del self.__ids[self.__slot_ids.pop(slot)]
+        inserted = []
+        for item_id, item in new.items():
+            slot = next(self.__next_slot)
+            self.__ids[item_id] = slot
+            self.__slot_ids[slot] = item_id
+            inserted.append((slot, item))
+        self.__indexed.discard_all(list(updated) + deleted)
+        self.__indexed.insert_all(inserted + list(updated.items()))
+        return len(inserted), len(updated), len(deleted)
 
     def update_item(self, index: int, item: Item):
         validate('index', index, min_value=0, max_value=self.items() - 1)
-        self.remove_item(index)
+        slot = self.__slot(index)
+        self.__indexed.discard(slot)
 
-        self.__items.insert(index, Item(item.name, item.description, item.condition, item.brand, item.price, item.category))
\ No newline at end of file
+        self.__indexed.insert(slot, Item(item.name, item.description, item.condition, item.brand, item.price, item.category))
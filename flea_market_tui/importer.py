@@ -0,0 +1,105 @@
+import csv
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from typeguard import typechecked
+from valid8 import validate, ValidationError
+
+from flea_market_tui.async_api import AsyncApiClient
+from flea_market_tui.domain import Item, Name, Description, Condition, Brand, Price, Category
+
+columns: List[Tuple[str, Callable[[str], Any]]] = [
+    ('name', Name), ('description', Description), ('condition', Condition.of),
+    ('brand', Brand.of), ('price', Price.parse), ('category', Category.of),
+]
+
+
+@typechecked
+@dataclass(frozen=True)
+class RowError:
+    row: int
+    field: str
+    message: str
+
+    def __str__(self):
+        return f'row {self.row}, {self.field}: {self.message}'
+
+
+@typechecked
+@dataclass(frozen=True)
+class ImportReport:
+    imported: List[Tuple[int, Item]] = field(default_factory=list)
+    errors: List[RowError] = field(default_factory=list)
+
+
+def _parse_json_line(line: str) -> Optional[Dict[str, Any]]:
+    try:
+        row = json.loads(line)
+    except ValueError:
+        return None
+    return row if isinstance(row, dict) else None
+
+
+# Rows of a .csv file (with a header line) or of a .jsonl file (one object per line), read lazily.
+# A JSON line that is not an object is yielded as None; bytes that are not UTF-8 are kept as lone surrogates, so
+# that only the values they are in are rejected, see build_item().
+def read_rows(path: Path) -> Iterator[Optional[Dict[str, Any]]]:
+    validate('path.suffix', path.suffix.lower(), is_in={'.csv', '.jsonl'})
+    with path.open(newline='', encoding='utf-8', errors='surrogateescape') as file:
+        rows = csv.DictReader(file) if path.suffix.lower() == '.csv' \
+            else (_parse_json_line(line) for line in file if line.strip())
+        for row in rows:
+            yield {str(k).strip().lower(): v for k, v in row.items()} if row is not None else None
+
+
+# The message does not repeat the value: its lone surrogates could not be printed
+def _utf8(text: str) -> str:
+    try:
+        text.encode('utf-8')
+    except UnicodeEncodeError:
+        raise ValueError('not valid UTF-8') from None
+    return text
+
+
+def build_item(number: int, row: Dict[str, Any]) -> Tuple[Optional[Item], List[RowError]]:
+    values, errors = [], []
+    for name, builder in columns:
+        try:
+            validate(name, row.get(name))
+            values.append(builder(_utf8(str(row[name]).strip())))
+        except (TypeError, ValueError, ValidationError) as e:
+            errors.append(RowError(number, name, str(e)))
+    return (Item(*values) if not errors else None), errors
+
+
+# Validate every row without stopping at the first bad one, and upload the valid ones batch by batch; a failed upload
+# is reported as an error of its row, the other uploads go on
+async def import_items(path: Path, client: AsyncApiClient, batch_size: int = 100) -> ImportReport:
+    validate('batch_size', batch_size, min_value=1)
+    report = ImportReport()
+    batch = []
+
+    async def flush() -> None:
+        results = await client.save_all([item for _, item in batch])
+        for (number, item), result in zip(batch, results):
+            if isinstance(result, Exception):
+                report.errors.append(RowError(number, 'upload', str(result) or type(result).__name__))
+            else:
+                report.imported.append((result, item))
+        batch.clear()
+
+    for number, row in enumerate(read_rows(path), start=1):
+        if row is None:
+            item, errors = None, [RowError(number, 'row', 'not a JSON object')]
+        else:
+            item, errors = build_item(number, row)
+        report.errors.extend(errors)
+        if item is not None:
+            batch.append((number, item))
+            if len(batch) == batch_size:
+                await flush()
+    if batch:
+        await flush()
+    return report
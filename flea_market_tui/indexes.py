@@ -0,0 +1,122 @@
+from bisect import bisect_left, bisect_right, insort
+from dataclasses import dataclass, field
+from itertools import count
+from typing import Any, Callable, Collection, Dict, Iterable, Iterator, List, Set, Tuple
+
+
+# The indexes here, SearchIndex and PriceAggregates are on the path of every insert, so they are not @typechecked
+
+# Permutation of item slots ordered by key(item); ties are broken by slot, i.e. by insertion order
+@dataclass(frozen=True)
+class SortIndex:
+    key: Callable[[Any], Any]
+    __entries: List[Tuple[Any, int]] = field(default_factory=list, init=False, repr=False)
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def slot(self, position: int) -> int:
+        return self.__entries[position][1]
+
+    def position(self, slot: int, item: Any) -> int:
+        return bisect_left(self.__entries, (self.key(item), slot))
+
+    def add(self, slot: int, item: Any) -> None:
+        insort(self.__entries, (self.key(item), slot))
+
+    def discard(self, slot: int, item: Any) -> None:
+        del self.__entries[self.position(slot, item)]
+
+    def add_all(self, items: Collection[Tuple[int, Any]]) -> None:
+        self.__entries.extend((self.key(item), slot) for slot, item in items)
+        self.__entries.sort()
+
+    def discard_all(self, items: Collection[Tuple[int, Any]]) -> None:
+        slots = {slot for slot, _ in items}
+        self.__entries[:] = [entry for entry in self.__entries if entry[1] not in slots]
+
+    # Positions [start, stop) of the entries with low <= key <= high
+    def between(self, low: Any, high: Any) -> Tuple[int, int]:
+        return bisect_left(self.__entries, (low,)), bisect_right(self.__entries, (high, float('inf')))
+
+    def slots(self, start: int, stop: int) -> List[int]:
+        return [slot for _, slot in self.__entries[start:stop]]
+
+    def clear(self) -> None:
+        self.__entries.clear()
+
+
+# Posting lists: for every value of key(item), the slots of the items with that value
+@dataclass(frozen=True)
+class FacetIndex:
+    key: Callable[[Any], Any]
+    __postings: Dict[Any, Set[int]] = field(default_factory=dict, init=False, repr=False)
+
+    def add(self, slot: int, item: Any) -> None:
+        self.__postings.setdefault(self.key(item), set()).add(slot)
+
+    def discard(self, slot: int, item: Any) -> None:
+        key = self.key(item)
+        self.__postings[key].discard(slot)
+        if not self.__postings[key]:
+            del self.__postings[key]
+
+    def add_all(self, items: Collection[Tuple[int, Any]]) -> None:
+        for slot, item in items:
+            self.add(slot, item)
+
+    def discard_all(self, items: Collection[Tuple[int, Any]]) -> None:
+        for slot, item in items:
+            self.discard(slot, item)
+
+    def slots(self, values: Iterable[Any]) -> Set[int]:
+        return set().union(*(self.__postings.get(value, ()) for value in values))
+
+    # Number of the given slots for every value, without the values that have none
+    def counts(self, slots: Set[int]) -> Dict[Any, int]:
+        counts = ((value, len(postings & slots)) for value, postings in sorted(self.__postings.items()))
+        return {value: count for value, count in counts if count}
+
+    def clear(self) -> None:
+        self.__postings.clear()
+
+
+# The items of a market by slot, their versions and the indexes over them, updated together
+@dataclass(frozen=True)
+class IndexedItems:
+    items: Dict[int, Any]
+    versions: Dict[int, int]
+    indexes: List[Any]
+    __next_version: Iterator[int] = field(default_factory=count, init=False, repr=False)
+
+    def insert(self, slot: int, item: Any) -> None:
+        self.items[slot] = item
+        self.versions[slot] = next(self.__next_version)
+        for index in self.indexes:
+            index.add(slot, item)
+
+    def discard(self, slot: int) -> None:
+        item = self.items.pop(slot)
+        del self.versions[slot]
+        for index in self.indexes:
+            index.discard(slot, item)
+
+    def insert_all(self, items: Collection[Tuple[int, Any]]) -> None:
+        for slot, item in items:
+            self.items[slot] = item
+            self.versions[slot] = next(self.__next_version)
+        for index in self.indexes:
+            index.add_all(items)
+
+    def discard_all(self, slots: Collection[int]) -> None:
+        items = [(slot, self.items.pop(slot)) for slot in slots]
+        for slot in slots:
+            del self.versions[slot]
+        for index in self.indexes:
+            index.discard_all(items)
+
+    def clear(self) -> None:
+        self.items.clear()
+        self.versions.clear()
+        for index in self.indexes:
+            index.clear()
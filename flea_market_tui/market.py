@@ -0,0 +1,46 @@
+from typing import TYPE_CHECKING, Hashable, List, Optional, Protocol, Sequence
+
+from valid8 import validate
+
+if TYPE_CHECKING:
+    from flea_market_tui.domain import Item
+
+no_id = -1  # the id of the items that have none, where ids are stored as int64
+
+
+# The items of a catalog by index. row_keys() gives every index a key that changes whenever its item does (see
+# RowCache); items_at() and row_keys() read the rows of a page at once.
+class ItemRows(Protocol):
+    def items(self) -> int: ...
+
+    def item(self, index: int) -> 'Item': ...
+
+    def items_at(self, indexes: Sequence[int]) -> List['Item']: ...
+
+    def row_keys(self, indexes: Sequence[int]) -> List[Hashable]: ...
+
+    def item_id(self, index: int) -> Optional[int]: ...
+
+
+# The interface of FleaMarket that the other engines implement as well
+class Market(ItemRows, Protocol):
+    def add_item(self, item: 'Item', item_id: Optional[int] = None) -> None: ...
+
+    def remove_item(self, index: int) -> None: ...
+
+    def update_item(self, index: int, item: 'Item') -> None: ...
+
+    def sort_by_price(self) -> None: ...
+
+    def sort_by_condition(self) -> None: ...
+
+    def sort_by_brand(self) -> None: ...
+
+    def clear(self) -> None: ...
+
+
+# One bounds check for all the indexes of a page
+def check_indexes(indexes: Sequence[int], count: int) -> None:
+    if indexes:
+        validate('index', min(indexes), min_value=0)
+        validate('index', max(indexes), max_value=count - 1)
@@ -5,17 +5,18 @@ from typeguard import typechecked
 from valid8 import validate
 
 from validation.dataclasses import validate_dataclass
-from validation.regex import pattern
+from validation.registry import registry
 
 
 @typechecked
 @dataclass(order=True, frozen=True)
 class MenuDescription:
     value: str
+    __rule = registry.rule('MenuDescription.value', r'[0-9A-Za-z ;.,_-]*', min_len=1, max_len=1000)
 
     def __post_init__(self):
         validate_dataclass(self)
-        validate('MenuDescription.value', self.value, min_len=1, max_len=1000, custom=pattern(r'[0-9A-Za-z ;.,_-]*'))
+        self.__rule(self.value)
 
     def __str__(self):
         return self.value
@@ -24,10 +25,11 @@ class MenuDescription:
 @dataclass(order=True, frozen=True)
 class Key:
     value: str
+    __rule = registry.rule('Key.value', r'[0-9A-Za-z_-]*', min_len=1, max_len=10)
 
     def __post_init__(self):
         validate_dataclass(self)
-        validate('Key.value', self.value, min_len=1, max_len=10, custom=pattern(r'[0-9A-Za-z_-]*'))
+        self.__rule(self.value)
 
     def __str__(self):
         return self.value
@@ -0,0 +1,96 @@
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from typeguard import typechecked
+from valid8 import validate
+
+from flea_market_tui.domain import Item
+from flea_market_tui.market import Market
+
+Page = List[Tuple[int, Item]]
+
+
+# Rows fetched a page at a time: fetch_page(offset, limit, ordering) returns the total number of items and the
+# (id, item) pairs of the page. Mutations are done on the server, so here they only drop the pages.
+@typechecked
+@dataclass()
+class PagedFleaMarket(Market):
+    fetch_page: Callable[[int, int, Optional[str]], Tuple[int, Page]]
+    page_size: int = 50
+    cached_pages: int = 8
+    __pages: Dict[int, Page] = field(default_factory=OrderedDict, init=False, repr=False)
+    __count: Optional[int] = field(default=None, init=False)
+    __ordering: Optional[str] = field(default=None, init=False)
+
+    def __post_init__(self):
+        validate('page_size', self.page_size, min_value=1)
+        validate('cached_pages', self.cached_pages, min_value=1)
+
+    def __page(self, number: int) -> Page:
+        page = self.__pages.get(number)
+        if page is not None:
+            self.__pages.move_to_end(number)
+            return page
+        self.__count, page = self.fetch_page(number * self.page_size, self.page_size, self.__ordering)
+        self.__pages[number] = page
+        while len(self.__pages) > self.cached_pages:
+            self.__pages.popitem(last=False)
+        return page
+
+    def __row(self, index: int) -> Tuple[int, Item]:
+        if self.__count is None and index >= 0:
+            self.__page(index // self.page_size)
+        validate('index', index, min_value=0, max_value=self.items() - 1)
+        return self.__page(index // self.page_size)[index % self.page_size]
+
+    def __sort(self, ordering: str) -> None:
+        self.__ordering = ordering
+        self.clear()
+
+    def items(self) -> int:
+        if self.__count is None:
+            self.__page(0)
+        return self.__count
+
+    def item(self, index: int) -> Item:
+        return self.__row(index)[1]
+
+    def items_at(self, indexes: Sequence[int]) -> List[Item]:
+        return [self.__row(index)[1] for index in indexes]
+
+    def row_keys(self, indexes: Sequence[int]) -> List[Tuple[int, Item]]:
+        return [self.__row(index) for index in indexes]
+
+    def item_id(self, index: int) -> Optional[int]:
+        return self.__row(index)[0]
+
+    def index_of(self, item_id: int) -> int:
+        positions = {row[0]: number * self.page_size + offset
+                     for number, page in self.__pages.items() for offset, row in enumerate(page)}
+        validate('item_id', item_id, custom=lambda v: v in positions)
+        return positions[item_id]
+
+    def add_item(self, item: Item, item_id: Optional[int] = None) -> None:
+        self.clear()
+
+    def remove_item(self, index: int) -> None:
+        validate('index', index, min_value=0, max_value=self.items() - 1)
+        self.clear()
+
+    def update_item(self, index: int, item: Item) -> None:
+        item_id, _ = self.__row(index)
+        self.__page(index // self.page_size)[index % self.page_size] = (item_id, item)
+
+    def sort_by_price(self) -> None:
+        self.__sort('price')
+
+    def sort_by_condition(self) -> None:
+        self.__sort('condition')
+
+    def sort_by_brand(self) -> None:
+        self.__sort('brand')
+
+    def clear(self) -> None:
+        self.__pages.clear()
+        self.__count = None
@@ -0,0 +1,40 @@
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, List, Sequence
+
+from typeguard import typechecked
+from valid8 import validate
+
+
+# Display rows formatted once per row key. A market gives a new key to an item whenever it is added or changed
+# (see FleaMarket.row_keys), so a mutation only costs the formatting of the rows it touched; keys that are not
+# used anymore fall out of the least recently used end.
+@typechecked
+@dataclass(frozen=True)
+class RowCache:
+    format: Callable[[Any], Any]
+    size: int = 4096
+    __rows: Dict[Hashable, Any] = field(default_factory=OrderedDict, init=False, repr=False)
+
+    def __post_init__(self):
+        validate('size', self.size, min_value=1)
+
+    def __len__(self) -> int:
+        return len(self.__rows)
+
+    # Formatted rows for the given keys; item(position) is only called for the rows that are not cached
+    def rows(self, keys: Sequence[Hashable], item: Callable[[int], Any]) -> List[Any]:
+        res = []
+        for position, key in enumerate(keys):
+            row = self.__rows.get(key)
+            if row is None:
+                row = self.__rows[key] = self.format(item(position))
+                if len(self.__rows) > self.size:
+                    self.__rows.popitem(last=False)
+            else:
+                self.__rows.move_to_end(key)
+            res.append(row)
+        return res
+
+    def clear(self) -> None:
+        self.__rows.clear()
@@ -0,0 +1,88 @@
+import re
+from bisect import bisect_left, insort
+from dataclasses import dataclass, field
+from typing import Any, Collection, Dict, Iterator, List, Set, Tuple
+
+_word = re.compile(r'\w+')
+
+
+def words(text: str) -> List[str]:
+    return _word.findall(text.lower())
+
+
+# The words of every alternative of a query; OR and AND are operators in any case
+def _terms(query: str) -> List[List[str]]:
+    terms = [[]]
+    for word in words(query):
+        if word == 'or':
+            terms.append([])
+        elif word != 'and':
+            terms[-1].append(word)
+    return terms
+
+
+# Inverted index from the words of name and description to slots, with a sorted vocabulary for prefix matches:
+# 'red nik OR adidas' finds 'Red Nike shoes' and 'Adidas'
+@dataclass(frozen=True)
+class SearchIndex:
+    __postings: Dict[str, Set[int]] = field(default_factory=dict, init=False, repr=False)
+    __vocabulary: List[str] = field(default_factory=list, init=False, repr=False)
+
+    @staticmethod
+    def __words(item: Any) -> Set[str]:
+        return set(words(item.name.value)) | set(words(item.description.value))
+
+    def add(self, slot: int, item: Any) -> None:
+        for word in self.__words(item):
+            slots = self.__postings.get(word)
+            if slots is None:
+                slots = self.__postings[word] = set()
+                insort(self.__vocabulary, word)
+            slots.add(slot)
+
+    def discard(self, slot: int, item: Any) -> None:
+        for word in self.__words(item):
+            slots = self.__postings[word]
+            slots.discard(slot)
+            if not slots:
+                del self.__postings[word]
+                del self.__vocabulary[bisect_left(self.__vocabulary, word)]
+
+    # A batch adds or drops its words first and sorts the vocabulary again once
+    def add_all(self, items: Collection[Tuple[int, Any]]) -> None:
+        for slot, item in items:
+            for word in self.__words(item):
+                self.__postings.setdefault(word, set()).add(slot)
+        self.__vocabulary[:] = sorted(self.__postings)
+
+    def discard_all(self, items: Collection[Tuple[int, Any]]) -> None:
+        for slot, item in items:
+            for word in self.__words(item):
+                slots = self.__postings[word]
+                slots.discard(slot)
+                if not slots:
+                    del self.__postings[word]
+        self.__vocabulary[:] = sorted(self.__postings)
+
+    def clear(self) -> None:
+        self.__postings.clear()
+        self.__vocabulary.clear()
+
+    def __completions(self, prefix: str) -> Iterator[str]:
+        for position in range(bisect_left(self.__vocabulary, prefix), len(self.__vocabulary)):
+            word = self.__vocabulary[position]
+            if not word.startswith(prefix):
+                return
+            yield word
+
+    def lookup(self, prefix: str) -> Set[int]:
+        completions = [self.__postings[word] for word in self.__completions(prefix)]
+        return set().union(*completions) if len(completions) != 1 else set(completions[0])
+
+    def search(self, query: str) -> Set[int]:
+        res = set()
+        for term in _terms(query):
+            matches = sorted((self.lookup(prefix) for prefix in term), key=len)
+            if matches:
+                res |= matches[0].intersection(*matches[1:])
+        return res
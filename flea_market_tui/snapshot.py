@@ -0,0 +1,127 @@
+import mmap
+import os
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from valid8 import ValidationError, validate
+
+from flea_market_tui.domain import Item
+from flea_market_tui.market import ItemRows, check_indexes, no_id
+
+# A snapshot is, all little endian: the header; the ids and the prices in cents as int64 columns; the conditions
+# as one byte each, padded to 8 bytes; 4 * count + 1 uint64 offsets into the heap, where the name, description,
+# brand and category of every item follow each other in UTF-8, so item i spans offsets[4 * i:4 * i + 5].
+magic = b'FLEASNAP'
+version = 1
+header = struct.Struct('<8sQQ')  # magic, version, number of items
+
+_int64 = struct.Struct('<q')
+_bounds = struct.Struct('<5Q')
+
+
+# Start of the ids, prices, conditions, offsets and heap of a snapshot of count items
+def _layout(count: int) -> Tuple[int, int, int, int, int]:
+    ids = header.size
+    prices = ids + 8 * count
+    conditions = prices + 8 * count
+    offsets = conditions + -(-count // 8) * 8
+    return ids, prices, conditions, offsets, offsets + 8 * (4 * count + 1)
+
+
+def _little_endian(column: array) -> bytes:
+    if sys.byteorder == 'big':
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column.tobytes()
+
+
+# Write the (id, item) rows as a snapshot, replacing the file in one step; returns the number of items
+def write_snapshot(path: Path, rows: Iterable[Tuple[Optional[int], Item]]) -> int:
+    ids, prices, conditions, offsets, heap = array('q'), array('q'), bytearray(), array('Q', [0]), []
+    size = 0
+    for item_id, item in rows:
+        ids.append(no_id if item_id is None else item_id)
+        prices.append(item.price.value_in_cents)
+        conditions.append(int(item.condition.value))
+        for text in (item.name.value, item.description.value, item.brand.value, item.category.value):
+            encoded = text.encode('utf-8')
+            heap.append(encoded)
+            size += len(encoded)
+            offsets.append(size)
+    count = len(ids)
+    conditions.extend(bytes(-count % 8))
+
+    temporary = path.with_name(path.name + '.tmp')
+    with open(temporary, 'wb') as file:
+        file.write(header.pack(magic, version, count))
+        file.write(_little_endian(ids))
+        file.write(_little_endian(prices))
+        file.write(conditions)
+        file.write(_little_endian(offsets))
+        file.writelines(heap)
+    os.replace(temporary, path)
+    return count
+
+
+# A snapshot mapped in memory and read in place: opening it only checks the header, and item(index) decodes that
+# item alone
+class Snapshot(ItemRows):
+    def __init__(self, path: Path):
+        validate('size', path.stat().st_size, min_value=header.size)
+        with open(path, 'rb') as file:
+            self.__map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            found_magic, found_version, self.__count = header.unpack_from(self.__map)
+            validate('magic', found_magic, equals=magic)
+            validate('version', found_version, equals=version)
+            self.__ids, self.__prices, self.__conditions, self.__offsets, self.__heap = _layout(self.__count)
+            validate('size', len(self.__map), min_value=self.__heap)
+            heap_size, = struct.unpack_from('<Q', self.__map, self.__heap - 8)
+            validate('size', len(self.__map), equals=self.__heap + heap_size)
+        except ValidationError:
+            self.__map.close()
+            raise
+
+    def __enter__(self) -> 'Snapshot':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.__map.close()
+
+    def items(self) -> int:
+        return self.__count
+
+    def __item(self, index: int) -> Item:
+        start, *ends = _bounds.unpack_from(self.__map, self.__offsets + 8 * 4 * index)
+        name, description, brand, category = (str(self.__map[self.__heap + begin:self.__heap + end], 'utf-8')
+                                              for begin, end in zip([start] + ends, ends))
+        price, = _int64.unpack_from(self.__map, self.__prices + 8 * index)
+        return Item.from_trusted_row(name, description, str(self.__map[self.__conditions + index]), brand, price,
+                                     category)
+
+    def item(self, index: int) -> Item:
+        validate('index', index, min_value=0, max_value=self.items() - 1)
+        return self.__item(index)
+
+    def items_at(self, indexes: Sequence[int]) -> List[Item]:
+        check_indexes(indexes, self.items())
+        return [self.__item(index) for index in indexes]
+
+    def row_keys(self, indexes: Sequence[int]) -> List[Tuple[Optional[int], Item]]:
+        return [(self.item_id(index), item) for index, item in zip(indexes, self.items_at(indexes))]
+
+    def item_id(self, index: int) -> Optional[int]:
+        validate('index', index, min_value=0, max_value=self.items() - 1)
+        item_id, = _int64.unpack_from(self.__map, self.__ids + 8 * index)
+        return None if item_id == no_id else item_id
+
+    # All the (id, item) rows; FleaMarket.sync() takes only those with an id
+    def rows(self) -> Iterator[Tuple[Optional[int], Item]]:
+        for index in range(self.__count):
+            yield self.item_id(index), self.__item(index)
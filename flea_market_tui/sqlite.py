@@ -0,0 +1,197 @@
+import sqlite3
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from typeguard import typechecked
+from valid8 import validate
+
+from flea_market_tui.domain import Category, Item, Price
+from flea_market_tui.market import Market, check_indexes
+
+schema = '''
+CREATE TABLE IF NOT EXISTS item (slot INTEGER PRIMARY KEY, id INTEGER UNIQUE, version INTEGER NOT NULL,
+                                 name TEXT NOT NULL, description TEXT NOT NULL, condition TEXT NOT NULL,
+                                 brand TEXT NOT NULL, price INTEGER NOT NULL, category TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS item_price ON item (price, slot);
+CREATE INDEX IF NOT EXISTS item_condition ON item (condition, slot);
+CREATE INDEX IF NOT EXISTS item_brand ON item (brand, slot);
+CREATE INDEX IF NOT EXISTS item_category ON item (category, price, slot);
+'''
+
+columns = 'name, description, condition, brand, price, category'
+
+# The key of every view, with the slot, i.e. the insertion order, breaking ties as in FleaMarket
+views = {'insertion': (), 'price': ('price',), 'condition': ('condition',), 'brand': ('brand',)}
+
+
+def _values(item: Item) -> Tuple[str, str, str, str, int, str]:
+    return (item.name.value, item.description.value, item.condition.value, item.brand.value,
+            item.price.value_in_cents, item.category.value)
+
+
+# Items in an SQLite database, in a file unless path is ':memory:'; every view is an ORDER BY over an index
+@typechecked
+@dataclass()
+class SqliteFleaMarket(Market):
+    path: str = ':memory:'
+    __connection: sqlite3.Connection = field(init=False, repr=False)
+    __view: str = field(default='insertion', init=False)
+    __count: int = field(default=0, init=False)
+    __next_version: int = field(default=0, init=False)
+
+    def __post_init__(self):
+        self.__connection = sqlite3.connect(self.path)
+        self.__connection.executescript(schema)
+        self.__count, version = self.__connection.execute('SELECT COUNT(*), MAX(version) FROM item').fetchone()
+        self.__next_version = version + 1 if version is not None else 0
+
+    def __order(self) -> str:
+        return ', '.join(views[self.__view] + ('slot',))
+
+    # If a mutation is rolled back, the count is read again
+    @contextmanager
+    def __transaction(self) -> Iterator[None]:
+        try:
+            with self.__connection:
+                yield
+        except BaseException:
+            self.__count = self.__connection.execute('SELECT COUNT(*) FROM item').fetchone()[0]
+            raise
+
+    def __version(self) -> int:
+        version, self.__next_version = self.__next_version, self.__next_version + 1
+        return version
+
+    def __rows(self, start: int, count: int, select: str) -> List[tuple]:
+        return self.__connection.execute(f'SELECT {select} FROM item ORDER BY {self.__order()} LIMIT ? OFFSET ?',
+                                         (count, start)).fetchall()
+
+    def __row(self, index: int, select: str) -> tuple:
+        validate('index', index, min_value=0, max_value=self.items() - 1)
+        return self.__rows(index, 1, select)[0]
+
+    def __rows_at(self, indexes: Sequence[int], select: str) -> List[tuple]:
+        check_indexes(indexes, self.items())
+        if not indexes:
+            return []
+        low, high = min(indexes), max(indexes)
+        rows = self.__rows(low, high - low + 1, select)
+        return [rows[index - low] for index in indexes]
+
+    def items(self) -> int:
+        return self.__count
+
+    def item(self, index: int) -> Item:
+        return Item.from_trusted_row(*self.__row(index, columns))
+
+    def items_at(self, indexes: Sequence[int]) -> List[Item]:
+        return [Item.from_trusted_row(*row) for row in self.__rows_at(indexes, columns)]
+
+    def row_keys(self, indexes: Sequence[int]) -> List[int]:
+        return [version for version, in self.__rows_at(indexes, 'version')]
+
+    def add_item(self, item: Item, item_id: Optional[int] = None) -> None:
+        if item_id is not None:
+            validate('item_id', item_id, custom=lambda v: self.__key_of(v) is None)
+        with self.__transaction():
+            self.__insert(item, item_id)
+
+    def __insert(self, item: Item, item_id: Optional[int]) -> None:
+        self.__connection.execute(f'INSERT INTO item (id, version, {columns}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                                  (item_id, self.__version()) + _values(item))
+        self.__count += 1
+
+    def item_id(self, index: int) -> Optional[int]:
+        return self.__row(index, 'id')[0]
+
+    # The sort key of the item in the current view, or None if there is no such item
+    def __key_of(self, item_id: int) -> Optional[tuple]:
+        return self.__connection.execute(f'SELECT {self.__order()} FROM item WHERE id = ?', (item_id,)).fetchone()
+
+    def index_of(self, item_id: int) -> int:
+        validate('item_id', item_id, custom=lambda v: self.__key_of(v) is not None)
+        key = self.__key_of(item_id)
+        return self.__connection.execute(f'SELECT COUNT(*) FROM item WHERE ({self.__order()}) < '
+                                         f'({", ".join("?" * len(key))})', key).fetchone()[0]
+
+    def __delete(self, slot: int) -> None:
+        self.__connection.execute('DELETE FROM item WHERE slot = ?', (slot,))
+        self.__count -= 1
+
+    def remove_item(self, index: int) -> None:
+        slot, = self.__row(index, 'slot')
+        with self.__transaction():
+            self.__delete(slot)
+
+    def remove_item_by_id(self, item_id: int) -> None:
+        validate('item_id', item_id, custom=lambda v: self.__key_of(v) is not None)
+        with self.__transaction():
+            self.__delete(self.__key_of(item_id)[-1])
+
+    def __update(self, slot: int, item: Item) -> None:
+        self.__connection.execute(f'UPDATE item SET version = ?, ({columns}) = (?, ?, ?, ?, ?, ?) WHERE slot = ?',
+                                  (self.__version(),) + _values(item) + (slot,))
+
+    def update_item(self, index: int, item: Item) -> None:
+        slot, = self.__row(index, 'slot')
+        with self.__transaction():
+            self.__update(slot, item)
+
+    def sort_by_price(self) -> None:
+        self.__view = 'price'
+
+    def sort_by_condition(self) -> None:
+        self.__view = 'condition'
+
+    def sort_by_brand(self) -> None:
+        self.__view = 'brand'
+
+    def clear(self) -> None:
+        with self.__transaction():
+            self.__connection.execute('DELETE FROM item')
+        self.__count = 0
+
+    def __by_price(self, n: int, category: Optional[Category], largest: bool) -> List[Item]:
+        validate('n', n, min_value=0)
+        order = 'price DESC, slot DESC' if largest else 'price, slot'
+        where, args = ('WHERE category = ?', (category.value,)) if category is not None else ('', ())
+        rows = self.__connection.execute(f'SELECT {columns} FROM item {where} ORDER BY {order} LIMIT ?', args + (n,))
+        return [Item.from_trusted_row(*row) for row in rows]
+
+    def cheapest(self, n: int, category: Optional[Category] = None) -> List[Item]:
+        return self.__by_price(n, category, largest=False)
+
+    def most_expensive(self, n: int, category: Optional[Category] = None) -> List[Item]:
+        return self.__by_price(n, category, largest=True)
+
+    def priced_between(self, low: Price, high: Price) -> List[Item]:
+        rows = self.__connection.execute(f'SELECT {columns} FROM item WHERE price BETWEEN ? AND ? ORDER BY price, slot',
+                                         (low.value_in_cents, high.value_in_cents))
+        return [Item.from_trusted_row(*row) for row in rows]
+
+    # Like FleaMarket.sync(), in one transaction
+    def sync(self, rows: Iterable[Tuple[int, Item]]) -> Tuple[int, int, int]:
+        inserted, updated, seen = 0, 0, set()
+        with self.__transaction():
+            for item_id, item in rows:
+                if item_id is None:
+                    validate('item_id', item_id)
+                seen.add(item_id)
+                row = self.__connection.execute(f'SELECT slot, {columns} FROM item WHERE id = ?',
+                                                (item_id,)).fetchone()
+                if row is None:
+                    self.__insert(item, item_id)
+                    inserted += 1
+                elif row[1:] != _values(item):
+                    self.__update(row[0], item)
+                    updated += 1
+
+            deleted = [(item_id,) for item_id, in self.__connection.execute('SELECT id FROM item WHERE id IS NOT NULL')
+                       if item_id not in seen]
+            self.__connection.executemany('DELETE FROM item WHERE id = ?', deleted)
+            self.__count -= len(deleted)
+        return inserted, updated, len(deleted)
+
+    def close(self) -> None:
+        self.__connection.close()
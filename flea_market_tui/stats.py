@@ -0,0 +1,102 @@
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Callable, Collection, Dict, List, Tuple
+
+from typeguard import typechecked
+from valid8 import validate
+
+
+def euro(cents: float) -> str:
+    return f'{cents / 100:.2f}'
+
+
+# Price statistics of a group of items, in cents; histogram holds (low, high, count) of equal-width buckets,
+# only one if all the prices are the same
+@typechecked
+@dataclass(frozen=True)
+class PriceStats:
+    count: int
+    min: int
+    max: int
+    mean: float
+    median: float
+    histogram: List[Tuple[int, int, int]]
+
+
+# Sorted prices and their sum per value of key(item), kept up to date on every add and discard
+@dataclass(frozen=True)
+class PriceAggregates:
+    key: Callable[[Any], Any]
+    __prices: Dict[Any, List[int]] = field(default_factory=dict, init=False, repr=False)
+    __sums: Dict[Any, int] = field(default_factory=dict, init=False, repr=False)
+
+    def add(self, slot: int, item: Any) -> None:
+        key = self.key(item)
+        insort(self.__prices.setdefault(key, []), item.price.value_in_cents)
+        self.__sums[key] = self.__sums.get(key, 0) + item.price.value_in_cents
+
+    def discard(self, slot: int, item: Any) -> None:
+        key = self.key(item)
+        prices = self.__prices[key]
+        del prices[bisect_left(prices, item.price.value_in_cents)]
+        self.__sums[key] -= item.price.value_in_cents
+        if not prices:
+            del self.__prices[key]
+            del self.__sums[key]
+
+    def add_all(self, items: Collection[Tuple[int, Any]]) -> None:
+        touched = set()
+        for slot, item in items:
+            key = self.key(item)
+            self.__prices.setdefault(key, []).append(item.price.value_in_cents)
+            self.__sums[key] = self.__sums.get(key, 0) + item.price.value_in_cents
+            touched.add(key)
+        for key in touched:
+            self.__prices[key].sort()
+
+    def discard_all(self, items: Collection[Tuple[int, Any]]) -> None:
+        removed = {}
+        for slot, item in items:
+            key = self.key(item)
+            removed.setdefault(key, Counter())[item.price.value_in_cents] += 1
+            self.__sums[key] -= item.price.value_in_cents
+        for key, counts in removed.items():
+            prices = []
+            for price in self.__prices[key]:
+                if counts[price]:
+                    counts[price] -= 1
+                else:
+                    prices.append(price)
+            if prices:
+                self.__prices[key] = prices
+            else:
+                del self.__prices[key]
+                del self.__sums[key]
+
+    def clear(self) -> None:
+        self.__prices.clear()
+        self.__sums.clear()
+
+    @staticmethod
+    def __histogram(prices: List[int], buckets: int) -> List[Tuple[int, int, int]]:
+        low, high = prices[0], prices[-1]
+        if low == high:
+            return [(low, high, len(prices))]
+        edges = [low + (high - low) * i // buckets for i in range(buckets)] + [high]
+        res = []
+        for i in range(buckets):
+            start = bisect_left(prices, edges[i])
+            stop = bisect_right(prices, edges[i + 1]) if i == buckets - 1 else bisect_left(prices, edges[i + 1])
+            res.append((edges[i], edges[i + 1], stop - start))
+        return res
+
+    def stats(self, buckets: int = 10) -> Dict[Any, PriceStats]:
+        validate('buckets', buckets, min_value=1)
+        res = {}
+        for key, prices in sorted(self.__prices.items()):
+            count, middle = len(prices), len(prices) // 2
+            median = prices[middle] if count % 2 else (prices[middle - 1] + prices[middle]) / 2
+            res[key] = PriceStats(count, prices[0], prices[-1], self.__sums[key] / count, median,
+                                  self.__histogram(prices, buckets))
+        return res
@@ -0,0 +1,23 @@
+import pytest
+
+from flea_market_tui.domain import Name, Description, Condition, Brand, Price, Category, Item
+
+
+# The catalog cache of every test is a file of its own, never the one of the user
+@pytest.fixture(autouse=True)
+def catalog_cache(tmp_path, monkeypatch):
+    path = tmp_path / 'catalog.sqlite3'
+    monkeypatch.setenv('FLEA_MARKET_CACHE', str(path))
+    return path
+
+
+# The items of the market tests; test_domain keeps a set of its own
+@pytest.fixture
+def items():
+    return [
+        Item(Name('Airforce'), Description(""), Condition('2'), Brand('Nike'), Price.create(111), Category('Scarpe')),
+        Item(Name('ChronoTrigger'), Description(""), Condition('1'), Brand('SquareSoft'), Price.create(6666), Category('Videogiochi')),
+        Item(Name('Snes'), Description("Prodotto vintage"), Condition('2'), Brand('Nintendo'), Price.create(3333), Category('Console')),
+        Item(Name('Scopa'), Description(""), Condition('0'), Brand('Mastrolindo'), Price.create(363636, 99), Category('Casa e Pulizia')),
+        Item(Name('Jordan'), Description("stolen from the Defcon"), Condition('0'), Brand('Nike'), Price.create(12), Category('Scarpe')),
+    ]
@@ -0,0 +1,61 @@
+import pytest
+
+pytest.importorskip('PySimpleGUI')
+
+from flea_market_gui.gui import Gui
+from flea_market_gui.worker import Progress
+from flea_market_tui.api import NotPaginated
+from flea_market_tui.domain import FleaMarket
+
+
+# The part of ApiClient used by the fetches: every row is reported as it is read
+class Api:
+    address = 'http://localhost/'
+
+    def __init__(self, items):
+        self.items = items
+
+    def items_if_changed(self, etag, endpoint, progress=None):
+        def rows():
+            for item_id, item in enumerate(self.items):
+                progress(item_id, len(self.items))
+                yield item_id, item
+        return '"v1"', rows()
+
+    def items_page(self, offset, limit, ordering=None, endpoint='item/'):
+        raise NotPaginated(endpoint)
+
+
+# A window as PySimpleGUI leaves it after close(): posting events to it fails
+class Window:
+    def __init__(self):
+        self.closed = False
+        self.events = []
+
+    def write_event_value(self, key, value):
+        if self.closed:
+            raise AttributeError("'NoneType' object has no attribute 'after'")
+        self.events.append((key, value))
+
+
+def test_gui_rest_of_the_first_window_reports_to_its_own_window(items):
+    gui = Gui(window_size=2)
+    gui._Gui__api, gui._Gui__fleamarket = Api(items), FleaMarket()
+    loading = Window()
+    gui._Gui__fetch(lambda done, total: loading.write_event_value('-worker-', Progress(done, total)))
+    loading.closed = True
+    assert gui._Gui__fleamarket.items() == 2
+
+    reported = []
+    etag, rows = gui._Gui__rest(lambda done, total: reported.append(done))
+    assert etag == '"v1"'
+    assert rows == list(enumerate(items))
+    assert reported == list(range(3, len(items)))
+
+
+def test_gui_paged_loads_everything_once_if_the_server_does_not_paginate(items):
+    gui = Gui(paged=True, window_size=10)
+    gui._Gui__api, gui._Gui__fleamarket = Api(items), FleaMarket()
+    gui._Gui__fetch(lambda done, total: None)
+    assert isinstance(gui._Gui__fleamarket, FleaMarket)
+    assert [gui._Gui__fleamarket.item(i) for i in range(len(items))] == items
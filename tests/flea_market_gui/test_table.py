@@ -0,0 +1,117 @@
+import pytest
+from valid8 import ValidationError
+
+from flea_market_gui.table import RowChange, TableRows, apply, selected
+
+
+# The parts of ttk.Treeview used by apply() and selected()
+class Tree:
+    def __init__(self, rows):
+        self.iids = [str(i + 1) for i in range(len(rows))]
+        self.values = {iid: row for iid, row in zip(self.iids, rows)}
+        self.tags = {}
+        self.calls = 0
+        self.selected = ()
+
+    def get_children(self):
+        return tuple(self.iids)
+
+    def item(self, iid, values=None, tags=None):
+        self.calls += 1
+        if values is not None:
+            self.values[iid] = values
+        if tags is not None:
+            self.tags[iid] = tags
+
+    def delete(self, iid):
+        self.calls += 1
+        self.iids.remove(iid)
+        del self.values[iid]
+
+    def insert(self, parent, index, iid, values):
+        self.calls += 1
+        self.iids.insert(index, iid)
+        self.values[iid] = values
+        return iid
+
+    def move(self, iid, parent, index):
+        self.calls += 1
+        self.iids.remove(iid)
+        self.iids.insert(index, iid)
+
+    def selection(self):
+        return self.selected
+
+    def index(self, iid):
+        return self.iids.index(iid)
+
+    def rows(self):
+        return [self.values[iid] for iid in self.iids]
+
+
+def rendering(*names):
+    return list(names), [[position, name] for position, name in enumerate(names)]
+
+
+def check(old, new):
+    table, tree = TableRows(), Tree(old[1])
+    table.reset(*old)
+    changes = table.update(*new)
+    apply(tree, changes)
+    assert tree.rows() == new[1]
+    return changes
+
+
+def test_edit_is_one_replace():
+    assert check(rendering('a', 'b', 'c'), rendering('a', 'x', 'c')) == [RowChange('replace', 1, [1, 'x'])]
+
+
+def test_unchanged_rows_give_no_changes():
+    assert check(rendering('a', 'b'), rendering('a', 'b')) == []
+
+
+def test_delete_insert_and_renumber():
+    changes = check(rendering('a', 'b', 'c'), rendering('a', 'c'))
+    assert changes == [RowChange('delete', 1), RowChange('replace', 1, [1, 'c'])]
+    changes = check(rendering('a', 'c'), rendering('a', 'c', 'd'))
+    assert changes == [RowChange('insert', 2, [2, 'd'])]
+
+
+def test_reorder():
+    changes = check(rendering('a', 'b', 'c'), rendering('c', 'a', 'b'))
+    assert changes[0] == RowChange('move', 2, target=0)
+
+
+def test_duplicate_keys():
+    changes = check((['A'], [['a']]), (['A', 'A'], [['a'], ['a']]))
+    assert changes == [RowChange('insert', 1, ['a'])]
+    check((['A', 'B', 'A'], [['a'], ['b'], ['a']]), (['A', 'A', 'A'], [['a'], ['a'], ['a']]))
+    check((['A', 'A', 'B'], [['a'], ['a'], ['b']]), (['B', 'A'], [['b'], ['a']]))
+
+
+def test_apply_keeps_numeric_ids_and_tags():
+    table, tree = TableRows(), Tree(rendering('a', 'b')[1])
+    table.reset(*rendering('a', 'b'))
+    apply(tree, table.update(*rendering('z', 'a', 'b')))
+    assert all(iid.isdigit() for iid in tree.iids) and len(set(tree.iids)) == 3
+    assert [tree.tags[iid] for iid in tree.iids] == [(0,), (1,), (2,)]
+    tree.selected = (tree.iids[2],)
+    assert selected(tree) == 2
+    tree.selected = ()
+    assert selected(tree) is None
+
+
+def test_one_edit_costs_one_widget_call_on_a_large_window():
+    names = [f'row {i}' for i in range(500)]
+    table, tree = TableRows(), Tree(rendering(*names)[1])
+    table.reset(*rendering(*names))
+    names[250] = 'edited'
+    apply(tree, table.update(*rendering(*names)))
+    assert tree.calls == 1
+
+
+def test_row_change_kind_and_lengths_are_checked():
+    with pytest.raises(ValidationError):
+        RowChange('swap', 0)
+    with pytest.raises(ValidationError):
+        TableRows().update(['a'], [])
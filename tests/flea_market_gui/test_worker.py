@@ -0,0 +1,60 @@
+import queue
+import threading
+
+from flea_market_gui.worker import Done, Failed, Progress, Worker
+
+
+# The part of sg.Window used by the worker
+class Window:
+    def __init__(self):
+        self.events = queue.Queue()
+
+    def write_event_value(self, key, value):
+        self.events.put((key, value, threading.current_thread()))
+
+    def read(self):
+        return self.events.get(timeout=5)
+
+
+def test_worker_posts_the_result():
+    window, worker = Window(), Worker()
+    worker.submit(window, '-call-', lambda progress: 42)
+    key, value, thread = window.read()
+    assert (key, value) == ('-call-', Done(42))
+    assert thread is not threading.current_thread()
+    worker.shutdown()
+
+
+def test_worker_posts_progress_before_the_result():
+    window, worker = Window(), Worker()
+
+    def call(progress):
+        for done in range(3):
+            progress(done, 3)
+        return 'ok'
+
+    worker.submit(window, '-call-', call).result()
+    assert [window.read()[1] for _ in range(4)] == [Progress(0, 3), Progress(1, 3), Progress(2, 3), Done('ok')]
+    worker.shutdown()
+
+
+def test_worker_posts_the_error():
+    window, worker = Window(), Worker()
+    error = RuntimeError()
+
+    def call(progress):
+        raise error
+
+    worker.submit(window, '-call-', call)
+    assert window.read()[1] == Failed(error)
+    worker.shutdown()
+
+
+def test_worker_does_not_block_the_caller():
+    window, worker = Window(), Worker()
+    release = threading.Event()
+    future = worker.submit(window, '-call-', lambda progress: release.wait(5))
+    assert not future.done()
+    release.set()
+    assert window.read()[1] == Done(True)
+    worker.shutdown()
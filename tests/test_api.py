@@ -0,0 +1,173 @@
+from unittest.mock import patch, Mock
+
+import pytest
+from valid8 import ValidationError
+
+from flea_market_tui.api import ApiClient, NotPaginated, TimeoutHTTPAdapter, iter_json_array, parse_rows
+from flea_market_tui.domain import Item, Name, Description, Condition, Brand, Price, Category
+
+
+def test_api_client_uses_pooled_adapter():
+    api = ApiClient(pool_size=4)
+    adapter = api.session.get_adapter('http://localhost:8000/api/v1/')
+    assert isinstance(adapter, TimeoutHTTPAdapter)
+    assert adapter._pool_maxsize == 4
+
+
+def test_api_client_authorize_sets_header_once():
+    api = ApiClient()
+    assert 'Authorization' not in api.session.headers
+    api.authorize('e2cd07584740609b17b0b0f2ce6787452aa801e0')
+    assert api.session.headers['Authorization'] == 'Token e2cd07584740609b17b0b0f2ce6787452aa801e0'
+    api.authorize(None)
+    assert 'Authorization' not in api.session.headers
+
+
+@patch('requests.adapters.HTTPAdapter.send')
+def test_api_client_default_timeout(mocked_send):
+    mocked_send.side_effect = RuntimeError()
+    with pytest.raises(RuntimeError):
+        ApiClient(timeout=1.5).items()
+    assert mocked_send.call_args.kwargs['timeout'] == 1.5
+
+
+@patch('requests.adapters.HTTPAdapter.send')
+def test_api_client_explicit_timeout_wins(mocked_send):
+    mocked_send.side_effect = RuntimeError()
+    with pytest.raises(RuntimeError):
+        ApiClient(timeout=1.5).session.get('http://localhost:8000/api/v1/item/', timeout=7)
+    assert mocked_send.call_args.kwargs['timeout'] == 7
+
+
+@patch('requests.Session.post')
+def test_api_client_add_item(mocked_post):
+    item = Item(Name('Snes'), Description('Prodotto vintage'), Condition('2'), Brand('Nintendo'),
+                Price.create(33, 30), Category('Console'))
+    ApiClient().add_item(item)
+    mocked_post.assert_called_once_with(url='http://localhost:8000/api/v1/item/add/',
+                                        data={'name': 'Snes', 'description': 'Prodotto vintage', 'condition': '2',
+                                              'brand': 'Nintendo', 'price': 3330, 'category': 'Console'})
+
+
+@patch('requests.Session.delete')
+def test_api_client_delete_item_as_moderator(mocked_delete):
+    ApiClient().delete_item(6, 'item-moderator/')
+    mocked_delete.assert_called_once_with(url='http://localhost:8000/api/v1/item-moderator/edit/6')
+
+
+def test_iter_json_array_across_chunks():
+    body = '[{"id": 1, "name": "a, b]"}, {"id": 2}, 3, "x", [4]]'
+    chunks = [body[i:i + 3] for i in range(0, len(body), 3)]
+    assert list(iter_json_array(chunks)) == [{'id': 1, 'name': 'a, b]'}, {'id': 2}, 3, 'x', [4]]
+
+
+def test_iter_json_array_yields_before_the_end():
+    rows = iter_json_array(iter(['[{"id": 1},', ' {"id"']))
+    assert next(rows) == {'id': 1}
+    with pytest.raises(ValueError):
+        next(rows)
+
+
+def test_iter_json_array_requires_array():
+    with pytest.raises(ValueError):
+        list(iter_json_array(['{}']))
+    assert list(iter_json_array([' [', ' ]'])) == []
+
+
+@patch('requests.Session.get')
+def test_api_client_stream_items(mocked_get):
+    body = b'[{"id": 6, "name": "caff\\u0065", "description": "\xc3\xa8", "condition": 0, "brand": "nike", ' \
+           b'"price": 200, "category": "ciccio"}]'
+    mocked_get.return_value = Mock(status_code=200)
+    mocked_get.return_value.iter_content.return_value = [body[i:i + 5] for i in range(0, len(body), 5)]
+    items = list(ApiClient().stream_items())
+    assert [(item_id, str(item.description)) for item_id, item in items] == [(6, 'è')]
+    mocked_get.assert_called_once_with(url='http://localhost:8000/api/v1/item/', stream=True)
+    mocked_get.return_value.close.assert_called_once()
+
+
+@patch('requests.Session.get')
+def test_api_client_stream_items_connection_failed(mocked_get):
+    mocked_get.return_value = Mock(status_code=500)
+    with pytest.raises(RuntimeError):
+        list(ApiClient().stream_items())
+
+
+@patch('requests.Session.get')
+def test_api_client_items_page(mocked_get):
+    mocked_get.return_value = Mock(status_code=200)
+    mocked_get.return_value.json.return_value = {'count': 42, 'results': [
+        {'id': 6, 'name': 'davide', 'description': '.', 'condition': 0, 'brand': 'nike', 'price': 200,
+         'category': 'ciccio'}]}
+    count, rows = ApiClient().items_page(10, 5, 'price')
+    assert count == 42
+    assert [item_id for item_id, item in rows] == [6]
+    mocked_get.assert_called_once_with(url='http://localhost:8000/api/v1/item/',
+                                       params={'limit': 5, 'offset': 10, 'ordering': 'price'})
+
+
+@patch('requests.Session.get')
+def test_api_client_items_page_without_server_pagination(mocked_get):
+    mocked_get.return_value = Mock(status_code=200)
+    mocked_get.return_value.json.return_value = [
+        {'id': i, 'name': 'davide', 'description': '.', 'condition': 0, 'brand': 'nike', 'price': 200,
+         'category': 'ciccio'} for i in range(7)]
+    with pytest.raises(NotPaginated):
+        ApiClient().items_page(5, 5)
+
+
+@patch('requests.Session.get')
+def test_api_client_items_if_changed_not_modified(mocked_get):
+    mocked_get.return_value = Mock(status_code=304)
+    assert ApiClient().items_if_changed('"v1"') == ('"v1"', None)
+    mocked_get.assert_called_once_with(url='http://localhost:8000/api/v1/item/', headers={'If-None-Match': '"v1"'},
+                                       stream=True)
+    mocked_get.return_value.close.assert_called_once()
+
+
+@patch('requests.Session.get')
+def test_api_client_items_if_changed(mocked_get):
+    mocked_get.return_value = Mock(status_code=200, headers={'ETag': '"v2"'})
+    mocked_get.return_value.iter_content.return_value = [b'[]']
+    etag, rows = ApiClient().items_if_changed('"v1"')
+    assert etag == '"v2"'
+    assert list(rows) == []
+
+
+def test_parse_rows_keeps_order_and_falls_back():
+    row = {'id': 6, 'name': 'davide', 'description': '.', 'condition': 0, 'brand': 'nike', 'price': 250,
+           'category': 'ciccio'}
+    rows = [row, {**row, 'id': 7, 'price': '300'}, {**row, 'id': 8}]
+    assert [(item_id, item.price.value_in_cents) for item_id, item in parse_rows(rows)] == [(6, 250), (7, 300), (8, 250)]
+
+
+def test_parse_rows_converts_numbers_in_text_columns():
+    row = {'id': 6, 'name': 123, 'description': '.', 'condition': 0, 'brand': 'nike', 'price': 250,
+           'category': 'ciccio'}
+    (_, item), = parse_rows([row])
+    assert item.name == Name('123')
+    assert item.condition == Condition('0')
+    with pytest.raises(ValidationError):
+        list(parse_rows([{**row, 'name': 'bad$name'}]))
+    with pytest.raises(ValidationError):
+        list(parse_rows([row, {**row, 'name': 'bad$name'}]))
+
+
+@patch('requests.Session.get')
+def test_stream_items_validates_in_batches(mocked_get):
+    rows = ','.join(f'{{"id": {i}, "name": "n{i}", "description": "", "condition": 1, "brand": "b", "price": {i},'
+                    f' "category": "c"}}' for i in range(5))
+    mocked_get.return_value = Mock(status_code=200)
+    mocked_get.return_value.iter_content.return_value = [f'[{rows}]'.encode()]
+    assert [item_id for item_id, _ in ApiClient().stream_items(batch_size=2)] == [0, 1, 2, 3, 4]
+
+
+@patch('requests.Session.get')
+def test_api_client_items_if_changed_reports_progress(mocked_get):
+    mocked_get.return_value = Mock(status_code=200, headers={'ETag': '"v2"', 'Content-Length': '2'})
+    mocked_get.return_value.iter_content.return_value = [b'[', b']']
+    mocked_get.return_value.raw.tell.side_effect = [1, 2]
+    progress = Mock()
+    _, rows = ApiClient().items_if_changed(progress=progress)
+    assert list(rows) == []
+    assert [call.args for call in progress.call_args_list] == [(1, 2), (2, 2)]
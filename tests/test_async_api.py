@@ -0,0 +1,126 @@
+import asyncio
+import json
+import threading
+import time
+from itertools import count
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+from flea_market_tui.api import ApiClient
+from flea_market_tui.async_api import AsyncApiClient
+from flea_market_tui.domain import Item, Name, Description, Condition, Brand, Price, Category
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StandInHandler)
+        self.lock = threading.Lock()
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.ids = count(1)
+        self.failing = set()  # ids whose POST answers 500
+        self.failing_paths = set()  # paths whose PATCH or DELETE answers 500
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def __handle(self, body, status=200):
+        server = self.server
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        with server.lock:
+            server.requests.append((self.command, self.path, self.headers.get('Authorization')))
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        time.sleep(0.05)
+        with server.lock:
+            server.in_flight -= 1
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        with self.server.lock:
+            item_id = next(self.server.ids)
+        if item_id in self.server.failing:
+            self.__handle({'detail': 'error'}, 500)
+        else:
+            self.__handle({'id': item_id})
+
+    def do_PATCH(self):
+        self.__handle({}, 500 if self.path in self.server.failing_paths else 200)
+
+    def do_DELETE(self):
+        self.__handle({}, 500 if self.path in self.server.failing_paths else 200)
+
+
+@pytest.fixture
+def server():
+    server = StandInServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(server):
+    api = ApiClient(address=f'http://127.0.0.1:{server.server_address[1]}/api/v1/', pool_size=4)
+    api.authorize('e2cd07584740609b17b0b0f2ce6787452aa801e0')
+    return AsyncApiClient(api, concurrency=4)
+
+
+@pytest.fixture
+def item():
+    return Item(Name('Snes'), Description(''), Condition('2'), Brand('Nintendo'), Price.create(33), Category('Console'))
+
+
+def test_async_save_all(server, client, item):
+    ids = asyncio.run(client.save_all([item] * 12))
+    assert sorted(ids) == list(range(1, 13))
+    assert len(server.requests) == 12
+    assert {r[:2] for r in server.requests} == {('POST', '/api/v1/item/add/')}
+    assert {r[2] for r in server.requests} == {'Token e2cd07584740609b17b0b0f2ce6787452aa801e0'}
+
+
+def test_async_save_all_reports_failed_uploads(server, client, item):
+    server.failing = {2, 5}
+    results = asyncio.run(client.save_all([item] * 6))
+    assert sorted(result for result in results if isinstance(result, int)) == [1, 3, 4, 6]
+    failed = [result for result in results if isinstance(result, Exception)]
+    assert [str(result) for result in failed] == ['upload failed with status 500'] * 2
+    assert len(server.requests) == 6
+
+
+def test_async_concurrency_is_bounded(server, client, item):
+    asyncio.run(client.update_all([(i, item) for i in range(12)]))
+    assert 1 < server.max_in_flight <= 4
+    assert sorted(r[1] for r in server.requests) == sorted(f'/api/v1/item/edit/{i}/' for i in range(12))
+
+
+def test_async_delete_all(server, client):
+    responses = asyncio.run(client.delete_all([3, 4], 'item-moderator/'))
+    assert [res.status_code for res in responses] == [200, 200]
+    assert sorted(r[1] for r in server.requests) == ['/api/v1/item-moderator/edit/3', '/api/v1/item-moderator/edit/4']
+
+
+def test_async_update_all_and_delete_all_report_failed_requests(server, client, item):
+    server.failing_paths = {'/api/v1/item/edit/1/', '/api/v1/item/edit/2'}
+    results = asyncio.run(client.update_all([(0, item), (1, item)]))
+    assert results[0].status_code == 200
+    assert str(results[1]) == 'update failed with status 500'
+    results = asyncio.run(client.delete_all([2, 3]))
+    assert str(results[0]) == 'delete failed with status 500'
+    assert results[1].status_code == 200
+    assert len(server.requests) == 4
@@ -0,0 +1,62 @@
+import sqlite3
+
+from flea_market_tui.cache import CatalogCache, default_path
+from flea_market_tui.domain import Item, Name, Description, Condition, Brand, Price, Category
+
+url = 'http://localhost:8000/api/v1/item/'
+
+
+def item(name: str, cents: int) -> Item:
+    return Item(Name(name), Description('desc'), Condition('1'), Brand('nike'), Price.create(cents // 100, cents % 100),
+                Category('shoes'))
+
+
+def test_default_path_follows_the_environment(catalog_cache):
+    assert default_path() == catalog_cache
+    assert CatalogCache().path == catalog_cache
+
+
+def test_load_without_a_catalog(tmp_path):
+    assert CatalogCache(tmp_path / 'cache.sqlite3').load('udonto', url) == (None, None)
+
+
+def test_save_and_load_keep_rows_and_order(tmp_path):
+    cache = CatalogCache(tmp_path / 'cache.sqlite3')
+    rows = [(7, item('b', 250)), (3, item('a', 100))]
+    cache.save('udonto', url, '"v1"', rows)
+    assert cache.load('udonto', url) == ('"v1"', rows)
+    assert cache.load('udonto', 'http://localhost:8000/api/v1/item-moderator/') == (None, None)
+    assert cache.load('marco', url) == (None, None)
+
+
+def test_save_replaces_the_catalog(tmp_path):
+    cache = CatalogCache(tmp_path / 'cache.sqlite3')
+    cache.save('udonto', url, '"v1"', [(1, item('a', 100)), (2, item('b', 200))])
+    cache.save('udonto', url, None, [(3, item('c', 300))])
+    assert cache.load('udonto', url) == (None, [(3, item('c', 300))])
+
+
+def test_cache_of_another_version_is_dropped(tmp_path):
+    path = tmp_path / 'cache.sqlite3'
+    CatalogCache(path).save('udonto', url, '"v1"', [(1, item('a', 100))])
+    with sqlite3.connect(path) as connection:
+        connection.execute('PRAGMA user_version = 0')
+    assert CatalogCache(path).load('udonto', url) == (None, None)
+
+
+def test_unreadable_cache_is_empty(tmp_path):
+    path = tmp_path / 'cache.sqlite3'
+    path.write_bytes(b'not a database' * 100)
+    cache = CatalogCache(path)
+    cache.save('udonto', url, '"v1"', [(1, item('a', 100))])
+    assert cache.load('udonto', url) == (None, None)
+
+
+def test_recognizes_only_remembered_users_and_roles(tmp_path):
+    cache = CatalogCache(tmp_path / 'cache.sqlite3')
+    assert not cache.recognizes('udonto', 'user', 'fazio9898')
+    cache.remember('udonto', 'user', 'fazio9898')
+    assert cache.recognizes('udonto', 'user', 'fazio9898')
+    assert not cache.recognizes('udonto', 'user', 'fazio0000')
+    assert not cache.recognizes('udonto', 'moderator', 'fazio9898')
+    assert not cache.recognizes('marco', 'user', 'fazio9898')
@@ -0,0 +1,145 @@
+import pytest
+from valid8 import ValidationError
+
+from flea_market_tui.columnar import ColumnarFleaMarket, Dictionary
+
+
+@pytest.fixture
+def market(items):
+    market = ColumnarFleaMarket()
+    for i in items:
+        market.add_item(i)
+    return market
+
+
+def test_dictionary_encode_same_value_once():
+    dictionary = Dictionary()
+    assert dictionary.encode('Nike') == dictionary.encode('Nike')
+    assert dictionary.encode('Adidas') != dictionary.encode('Nike')
+    assert dictionary.decode(dictionary.encode('Adidas')) == 'Adidas'
+
+
+def test_columnar_add_items(items):
+    market = ColumnarFleaMarket()
+    index = 0
+    for i in items:
+        market.add_item(i)
+        index += 1
+        assert market.items() == index
+        assert market.item(index - 1) == i
+
+
+def test_columnar_item_out_of_range(market):
+    with pytest.raises(ValidationError):
+        market.item(market.items())
+    with pytest.raises(ValidationError):
+        market.item(-1)
+
+
+def test_columnar_remove_item(market, items):
+    market.remove_item(0)
+    market.remove_item(0)
+    market.remove_item(0)
+    assert market.item(0) == items[3]
+
+    with pytest.raises(ValidationError):
+        market.remove_item(market.items())
+
+    while market.items():
+        market.remove_item(0)
+    assert market.items() == 0
+
+
+def test_columnar_sort_by_price(market, items):
+    market.sort_by_price()
+    assert [market.item(i) for i in range(market.items())] == sorted(items, key=lambda x: x.price)
+
+
+def test_columnar_sort_by_condition(market, items):
+    market.sort_by_condition()
+    assert [market.item(i) for i in range(market.items())] == sorted(items, key=lambda x: x.condition)
+
+
+def test_columnar_sort_by_brand(market, items):
+    market.sort_by_brand()
+    assert [market.item(i) for i in range(market.items())] == sorted(items, key=lambda x: x.brand)
+
+
+def test_columnar_update_item(market, items):
+    market.update_item(1, items[0])
+    assert market.item(1) == items[0]
+    assert market.items() == len(items)
+
+
+def test_columnar_clear(market):
+    market.clear()
+    assert market.items() == 0
+
+
+def test_dictionary_drops_released_values():
+    dictionary = Dictionary()
+    nike = dictionary.encode('Nike')
+    dictionary.encode('Nike')
+    dictionary.release(nike)
+    assert len(dictionary) == 1
+    dictionary.release(nike)
+    assert len(dictionary) == 0
+    assert dictionary.encode('Adidas') == nike
+    assert dictionary.decode(nike) == 'Adidas'
+
+
+def test_columnar_add_item_with_id(items):
+    market = ColumnarFleaMarket()
+    market.add_item(items[0], 7)
+    market.add_item(items[1])
+    assert market.item_id(0) == 7
+    assert market.item_id(1) is None
+    with pytest.raises(ValidationError):
+        market.add_item(items[2], 7)
+    market.remove_item(0)
+    market.add_item(items[2], 7)
+    assert market.item_id(1) == 7
+
+
+def test_columnar_items_at(market, items):
+    assert market.items_at([3, 0]) == [items[3], items[0]]
+    assert market.items_at([]) == []
+    with pytest.raises(ValidationError):
+        market.items_at([0, market.items()])
+
+
+def test_columnar_row_keys_change_only_on_update(market, items):
+    keys = market.row_keys([0, 1, 2])
+    assert len(set(keys)) == 3
+    market.update_item(1, items[4])
+    market.sort_by_price()
+    market.sort_by_price()
+    after = market.row_keys(range(market.items()))
+    assert keys[0] in after and keys[2] in after and keys[1] not in after
+
+
+def test_columnar_sync(items):
+    market = ColumnarFleaMarket()
+    assert market.sync([(1, items[0]), (2, items[1]), (3, items[2])]) == (3, 0, 0)
+    market.add_item(items[3])
+    assert market.sync([(3, items[2]), (1, items[4]), (4, items[1])]) == (1, 1, 1)
+    assert [(market.item_id(i), market.item(i)) for i in range(market.items())] == \
+           [(1, items[4]), (3, items[2]), (None, items[3]), (4, items[1])]
+
+
+def test_columnar_sync_rejects_rows_without_id(items):
+    market = ColumnarFleaMarket()
+    market.sync([(1, items[0])])
+    with pytest.raises(ValidationError):
+        market.sync([(1, items[1]), (2, items[2]), (None, items[3])])
+    assert [(market.item_id(i), market.item(i)) for i in range(market.items())] == [(1, items[0])]
+
+
+def test_columnar_releases_unused_codes(market, items):
+    market.sync([])
+    market.update_item(0, items[1])
+    market.remove_item(3)
+    assert [market.item(i) for i in range(market.items())] == [items[1], items[1], items[2], items[4]]
+    market.clear()
+    market.add_item(items[2])
+    assert market.item(0) == items[2]
@@ -1,7 +1,11 @@
+import copy
+import pickle
+
 import pytest
 from valid8 import ValidationError
 
-from flea_market_tui.domain import FleaMarket, Name, Description, Condition, Brand, Price, Category, Email, Username, Password, Item
+from flea_market_tui.domain import FleaMarket, Name, Description, Condition, Brand, Price, Category, Email, Username, Password, Item, Facets
+from flea_market_tui.sqlite import SqliteFleaMarket
 
 
 def test_condition_value():
@@ -226,3 +230,330 @@ def test_Fleamarket_sort_by_brand(items):
     market.add_item(items[1])
     market.sort_by_brand()
     assert market.item(0) == items[0]
+
+
+def test_Fleamarket_sort_keeps_order_on_add(items):
+    market = FleaMarket()
+    for i in items[1:]:
+        market.add_item(i)
+    market.sort_by_price()
+    market.add_item(items[0])
+    assert [market.item(i) for i in range(market.items())] == sorted(items, key=lambda x: x.price)
+
+
+def test_Fleamarket_switch_sort_order(items):
+    market = FleaMarket()
+    for i in items:
+        market.add_item(i)
+    market.sort_by_brand()
+    assert [market.item(i) for i in range(market.items())] == sorted(items, key=lambda x: x.brand)
+    market.sort_by_condition()
+    assert [market.item(i) for i in range(market.items())] == sorted(items, key=lambda x: x.condition)
+    market.sort_by_price()
+    assert [market.item(i) for i in range(market.items())] == sorted(items, key=lambda x: x.price)
+
+
+def test_Fleamarket_remove_item_from_sorted_view(items):
+    market = FleaMarket()
+    for i in items:
+        market.add_item(i)
+    market.sort_by_price()
+    market.remove_item(0)
+    assert [market.item(i) for i in range(market.items())] == sorted(items, key=lambda x: x.price)[1:]
+
+
+def test_Fleamarket_update_item(items):
+    market = FleaMarket()
+    for i in items:
+        market.add_item(i)
+    market.update_item(1, items[0])
+    assert market.item(1) == items[0]
+    assert market.items() == len(items)
+
+    market.sort_by_price()
+    market.update_item(0, items[4])
+    assert market.item(market.items() - 1) == items[4]
+
+
+def test_Fleamarket_item_id(items):
+    market = FleaMarket()
+    for item_id, i in enumerate(items):
+        market.add_item(i, item_id + 10)
+    assert market.item_id(2) == 12
+    assert market.index_of(12) == 2
+
+    market.sort_by_price()
+    assert market.item(market.index_of(10)) == items[0]
+    assert market.item_id(market.index_of(14)) == 14
+
+
+def test_Fleamarket_item_id_is_unique(items):
+    market = FleaMarket()
+    market.add_item(items[0], 1)
+    with pytest.raises(ValidationError):
+        market.add_item(items[1], 1)
+
+
+def test_Fleamarket_index_of_follows_remove_and_update(items):
+    market = FleaMarket()
+    for item_id, i in enumerate(items):
+        market.add_item(i, item_id)
+    market.remove_item(0)
+    assert market.index_of(1) == 0
+    with pytest.raises(ValidationError):
+        market.index_of(0)
+
+    market.update_item(0, items[0])
+    assert market.item_id(0) == 1
+    assert market.item(market.index_of(1)) == items[0]
+
+
+def test_Fleamarket_remove_item_by_id(items):
+    market = FleaMarket()
+    market.add_item(items[0], 1)
+    market.add_item(items[0], 2)
+    market.remove_item_by_id(1)
+    assert market.items() == 1
+    assert market.item_id(0) == 2
+
+
+def test_Fleamarket_sync(items):
+    market = FleaMarket()
+    assert market.sync([(1, items[0]), (2, items[1]), (3, items[2])]) == (3, 0, 0)
+    market.sort_by_price()
+    assert market.sync([(1, items[0]), (2, items[3]), (4, items[4])]) == (1, 1, 1)
+    assert [market.item_id(i) for i in range(market.items())] == [1, 2, 4]
+    assert market.item(market.index_of(2)) == items[3]
+    assert market.sync([(1, items[0]), (2, items[3]), (4, items[4])]) == (0, 0, 0)
+
+
+def test_Fleamarket_sync_matches_add_item(items):
+    synced, added = FleaMarket(), FleaMarket()
+    synced.add_item(items[0], 9)
+    synced.sync([(1, items[1]), (2, items[2]), (1, items[3]), (3, items[4]), (4, items[0])])
+    for item_id, item in [(1, items[3]), (2, items[2]), (3, items[4]), (4, items[0])]:
+        added.add_item(item, item_id)
+    for market in (synced, added):
+        market.sort_by_price()
+    assert [synced.item(i) for i in range(synced.items())] == [added.item(i) for i in range(added.items())]
+    assert [synced.item_id(i) for i in range(synced.items())] == [added.item_id(i) for i in range(added.items())]
+    assert synced.search('nintendo') == added.search('nintendo')
+    assert synced.filter(Facets()) == added.filter(Facets())
+    assert synced.price_stats('brand') == added.price_stats('brand')
+
+
+def test_Fleamarket_sync_rejects_rows_without_id(items):
+    market = FleaMarket()
+    market.sync([(1, items[0])])
+    with pytest.raises(ValidationError):
+        market.sync([(2, items[1]), (None, items[2]), (None, items[3])])
+    assert market.items() == 1 and market.item_id(0) == 1
+    assert market.sync([(2, items[1])]) == (1, 0, 1)
+
+
+def test_item_from_trusted_row(items):
+    item = Item.from_trusted_row('Snes', 'Prodotto vintage', '2', 'Nintendo', 333300, 'Console')
+    assert item == items[2]
+    assert hash(item) == hash(items[2])
+    assert str(item.price) == '3333.00'
+    assert item.price.euro == 3333
+
+
+def test_value_objects_of_are_interned():
+    assert Brand.of('Nike') is Brand.of('Nike')
+    assert Category.of('Scarpe') is Category.of('Scarpe')
+    assert Condition.of('1') is Condition.of('1')
+    assert Brand.of('Nike') == Brand('Nike')
+    assert Brand.of('Nike') is not Brand.of('Adidas')
+
+
+def test_value_objects_of_still_validate():
+    with pytest.raises(ValidationError):
+        Brand.of('<script>')
+    with pytest.raises(ValidationError):
+        Condition.of('3')
+    with pytest.raises(ValidationError):
+        Category.of('')
+
+
+def test_trusted_items_share_interned_values():
+    first = Item.from_trusted_row('Snes', '', '2', 'Nintendo', 100, 'Console')
+    second = Item.from_trusted_row('Gameboy', '', '2', 'Nintendo', 200, 'Console')
+    assert first.brand is second.brand
+    assert first.category is second.category
+    assert first.condition is second.condition
+
+
+def test_value_objects_have_no_instance_dict(items):
+    for value in [items[0], items[0].name, items[0].description, items[0].condition, items[0].brand,
+                  items[0].price, items[0].category]:
+        assert not hasattr(value, '__dict__')
+
+
+def test_item_hash_is_cached(items):
+    assert hash(items[0]) == hash(Item(Name('Airforce'), Description(""), Condition('2'), Brand('Nike'),
+                                       Price.create(111), Category('Scarpe')))
+    assert items[0]._hash == hash(items[0])
+    assert len({items[0], items[0], items[1]}) == 2
+
+
+def test_item_memory_footprint():
+    import tracemalloc
+    from dataclasses import dataclass as plain_dataclass
+
+    @plain_dataclass(frozen=True, order=True)
+    class Value:  # the layout every value object had before, with a per-instance __dict__
+        value: object
+
+    @plain_dataclass(frozen=True, order=True)
+    class DictItem:
+        name: Value
+        description: Value
+        condition: Value
+        brand: Value
+        price: Value
+        category: Value
+
+    def bytes_per_item(build):
+        tracemalloc.start()
+        try:
+            start = tracemalloc.get_traced_memory()[0]
+            built = [build(i) for i in range(2000)]  # not hashed: the cached hashes are not part of the layout
+            return (tracemalloc.get_traced_memory()[0] - start) / len(built)
+        finally:
+            tracemalloc.stop()
+
+    condition, brand, category = Value('2'), Value('Nike'), Value('Scarpe')  # shared, as the interned ones are
+    before = bytes_per_item(lambda i: DictItem(Value(f'Item {i}'), Value(f'Description {i}'), condition, brand,
+                                               Value(i), category))
+    after = bytes_per_item(lambda i: Item.from_trusted_row(f'Item {i}', f'Description {i}', '2', 'Nike', i, 'Scarpe'))
+    assert after < before * 0.85
+
+
+@pytest.mark.parametrize('duplicate', [copy.copy, copy.deepcopy, lambda value: pickle.loads(pickle.dumps(value))])
+def test_value_objects_can_be_copied_and_pickled(items, duplicate):
+    for value in [items[0], items[0].name, items[0].description, items[0].condition, items[0].brand,
+                  items[0].price, items[0].category]:
+        hash(value)
+        duplicate_value = duplicate(value)
+        assert duplicate_value == value
+        assert hash(duplicate_value) == hash(value)
+
+
+def test_fleamarket_search_follows_view_and_mutations(items):
+    fleamarket = FleaMarket()
+    for item in items:
+        fleamarket.add_item(item)
+    assert fleamarket.search('s') == [2, 3, 4]
+    assert fleamarket.search('sto OR air') == [0, 4]
+    fleamarket.sort_by_price()
+    assert [fleamarket.item(index).name.value for index in fleamarket.search('s')] == ['Snes', 'Scopa', 'thinkpad']
+    fleamarket.remove_item(fleamarket.search('scopa')[0])
+    assert fleamarket.search('s') == [1, 3]
+    fleamarket.update_item(3, items[0])
+    assert fleamarket.search('stolen') == []
+    fleamarket.clear()
+    assert fleamarket.search('s') == []
+
+
+def test_fleamarket_filter_by_facets(items):
+    fleamarket = FleaMarket()
+    for item in items:
+        fleamarket.add_item(item)
+    indexes, counts = fleamarket.filter(Facets(conditions=frozenset({Condition('2')}), max_price=Price.create(5000)))
+    assert indexes == [0, 2]
+    assert counts['condition'] == {Condition('2'): 2}
+    _, counts = fleamarket.filter(Facets(conditions=frozenset({Condition('2')})))
+    assert counts['condition'] == {Condition('0'): 1, Condition('1'): 1, Condition('2'): 3}
+    _, counts = fleamarket.filter(Facets(conditions=frozenset({Condition('2')}), max_price=Price.create(5000)))
+    assert counts['brand'] == {Brand('Nike'): 1, Brand('Nintendo'): 1}
+
+    fleamarket.sort_by_price()
+    indexes, _ = fleamarket.filter(Facets(brands=frozenset({Brand('Lenovo'), Brand('Nike')}), text='stolen'))
+    assert indexes == [4]
+    indexes, counts = fleamarket.filter(Facets())
+    assert indexes == [0, 1, 2, 3, 4] and sum(counts['category'].values()) == 5
+
+
+def test_facets_price_range_and_str():
+    with pytest.raises(ValidationError):
+        Facets(min_price=Price.create(10), max_price=Price.create(5))
+    facets = Facets(categories=frozenset({Category('Scarpe')}), min_price=Price.create(10), text='nike')
+    assert str(facets) == 'category: Scarpe, price: 10.00-, text: nike'
+
+
+def test_fleamarket_price_queries_keep_the_view(items):
+    fleamarket = FleaMarket()
+    for item in items:
+        fleamarket.add_item(item)
+    fleamarket.sort_by_brand()
+    view = [fleamarket.item(index) for index in range(fleamarket.items())]
+
+    assert fleamarket.cheapest(2) == [items[0], items[2]]
+    assert fleamarket.most_expensive(2) == [items[4], items[3]]
+    assert fleamarket.cheapest(10) == sorted(items, key=lambda x: x.price)
+    assert fleamarket.cheapest(0) == []
+    assert fleamarket.priced_between(Price.create(111), Price.create(6666)) == [items[0], items[2], items[1]]
+    assert fleamarket.priced_between(Price.create(112), Price.create(3000)) == []
+    assert [fleamarket.item(index) for index in range(len(view))] == view
+
+    fleamarket.add_item(Item(Name('Ps5'), Description(""), Condition('0'), Brand('Sony'), Price.create(500),
+                             Category('Console')))
+    assert [i.name.value for i in fleamarket.cheapest(1, Category('Console'))] == ['Ps5']
+    assert [i.name.value for i in fleamarket.most_expensive(5, Category('Console'))] == ['Snes', 'Ps5']
+    assert fleamarket.cheapest(3, Category('Nothing')) == []
+
+
+def test_fleamarket_price_queries_break_ties_alike():
+    fleamarket, sqlite = FleaMarket(), SqliteFleaMarket()
+    for name in ('First', 'Second', 'Third'):
+        item = Item(Name(name), Description(""), Condition('0'), Brand('Sony'), Price.create(500), Category('Console'))
+        fleamarket.add_item(item)
+        sqlite.add_item(item)
+    for market in (fleamarket, sqlite):
+        for category in (None, Category('Console')):
+            assert [i.name.value for i in market.most_expensive(2, category)] == ['Third', 'Second']
+            assert [i.name.value for i in market.cheapest(2, category)] == ['First', 'Second']
+
+
+def test_fleamarket_price_stats_follow_mutations(items):
+    fleamarket = FleaMarket()
+    for item in items:
+        fleamarket.add_item(item)
+    assert fleamarket.price_stats('brand')[Brand('Nike')].count == 1
+    fleamarket.update_item(1, items[0])
+    assert fleamarket.price_stats('brand')[Brand('Nike')].mean == 11100
+    assert Brand('SquareSoft') not in fleamarket.price_stats('brand')
+    assert fleamarket.price_stats('category')[Category('Scarpe')].median == 11100
+    with pytest.raises(ValidationError):
+        fleamarket.price_stats('name')
+
+
+def test_fleamarket_items_at(items):
+    fleamarket = FleaMarket()
+    for item in items:
+        fleamarket.add_item(item)
+    fleamarket.sort_by_price()
+    assert fleamarket.items_at(range(1, 3)) == [fleamarket.item(1), fleamarket.item(2)]
+    assert fleamarket.items_at([4, 0]) == [items[4], items[0]]
+    assert fleamarket.items_at([]) == []
+    with pytest.raises(ValidationError):
+        fleamarket.items_at(range(3, 6))
+    with pytest.raises(ValidationError):
+        fleamarket.items_at([-1])
+
+
+def test_fleamarket_row_keys_change_with_the_item_only(items):
+    fleamarket = FleaMarket()
+    for item in items:
+        fleamarket.add_item(item, len(items) - fleamarket.items())
+    keys = fleamarket.row_keys(range(5))
+    assert len(set(keys)) == 5
+    fleamarket.update_item(2, items[0])
+    assert [a == b for a, b in zip(keys, fleamarket.row_keys(range(5)))] == [True, True, False, True, True]
+    fleamarket.sort_by_price()
+    assert sorted(fleamarket.row_keys(range(5))) == sorted(keys[:2] + [max(keys) + 1] + keys[3:])
+    fleamarket.sync([(5, items[0])])
+    assert fleamarket.row_keys([0]) == [keys[0]]
+    with pytest.raises(ValidationError):
+        fleamarket.row_keys([1])
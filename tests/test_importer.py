@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+from valid8 import ValidationError
+
+from flea_market_tui.domain import Item, Name, Description, Condition, Brand, Price, Category
+from flea_market_tui.importer import read_rows, build_item, import_items, RowError
+
+
+@pytest.fixture
+def csv_file(tmp_path):
+    path = tmp_path / 'items.csv'
+    path.write_text('Name,Description,Condition,Brand,Price,Category\n'
+                    'Snes,Prodotto vintage,2,Nintendo,33.30,Console\n'
+                    'Bad$Name,,5,Nintendo,abc,Console\n'
+                    'Airforce,,0,Nike,111,Scarpe\n', encoding='utf-8')
+    return path
+
+
+@pytest.fixture
+def jsonl_file(tmp_path):
+    path = tmp_path / 'items.jsonl'
+    path.write_text('{"name": "Snes", "description": "", "condition": 2, "brand": "Nintendo", "price": "33", '
+                    '"category": "Console"}\n'
+                    '\n'
+                    '[1, 2]\n'
+                    '{"name": "Airforce", "condition": 0, "brand": "Nike", "price": "111", "category": "Scarpe"}\n',
+                    encoding='utf-8')
+    return path
+
+
+class FakeClient:
+    def __init__(self):
+        self.batches = []
+
+    async def save_all(self, items):
+        self.batches.append(list(items))
+        start = sum(len(batch) for batch in self.batches[:-1])
+        return [start + i + 1 for i in range(len(items))]
+
+
+class FailingClient(FakeClient):
+    async def save_all(self, items):
+        ids = await super().save_all(items)
+        return [RuntimeError('upload failed with status 500') if item_id == 1 else item_id for item_id in ids]
+
+
+def test_read_rows_csv(csv_file):
+    rows = list(read_rows(csv_file))
+    assert len(rows) == 3
+    assert rows[0]['name'] == 'Snes'
+
+
+def test_read_rows_jsonl(jsonl_file):
+    rows = list(read_rows(jsonl_file))
+    assert len(rows) == 3
+    assert rows[1] is None
+
+
+def test_read_rows_unsupported_file(tmp_path):
+    with pytest.raises(ValidationError):
+        list(read_rows(tmp_path / 'items.xml'))
+
+
+def test_build_item():
+    item, errors = build_item(1, {'name': 'Snes', 'description': '', 'condition': 2, 'brand': 'Nintendo',
+                                  'price': '33.30', 'category': 'Console'})
+    assert errors == []
+    assert item == Item(Name('Snes'), Description(''), Condition('2'), Brand('Nintendo'), Price.create(33, 30),
+                        Category('Console'))
+
+
+def test_build_item_collects_every_error():
+    item, errors = build_item(7, {'name': 'Bad$Name', 'condition': 5, 'brand': 'Nintendo', 'price': 'abc',
+                                  'category': 'Console'})
+    assert item is None
+    assert [(e.row, e.field) for e in errors] == [(7, 'name'), (7, 'description'), (7, 'condition'), (7, 'price')]
+
+
+def test_import_items_csv(csv_file):
+    client = FakeClient()
+    report = asyncio.run(import_items(csv_file, client, batch_size=1))
+    assert [item_id for item_id, item in report.imported] == [1, 2]
+    assert [str(item.name) for item_id, item in report.imported] == ['Snes', 'Airforce']
+    assert len(client.batches) == 2
+    assert {e.row for e in report.errors} == {2}
+
+
+def test_import_items_jsonl(jsonl_file):
+    client = FakeClient()
+    report = asyncio.run(import_items(jsonl_file, client))
+    assert len(report.imported) == 1
+    assert len(client.batches) == 1
+    assert report.errors[0] == RowError(2, 'row', 'not a JSON object')
+    assert [(e.row, e.field) for e in report.errors[1:]] == [(3, 'description')]
+
+
+def test_import_items_reports_failed_uploads(csv_file):
+    report = asyncio.run(import_items(csv_file, FailingClient()))
+    assert [(item_id, str(item.name)) for item_id, item in report.imported] == [(2, 'Airforce')]
+    assert report.errors[-1] == RowError(1, 'upload', 'upload failed with status 500')
+    assert {e.row for e in report.errors[:-1]} == {2}
+
+
+def test_import_items_rejects_only_the_rows_that_are_not_utf8(tmp_path):
+    path = tmp_path / 'items.csv'
+    path.write_bytes(b'Name,Description,Condition,Brand,Price,Category\n'
+                     b'Snes,\xff\xfe,2,Nintendo,33.30,Console\n'
+                     b'Airforce,,0,Nike,111,Scarpe\n')
+    report = asyncio.run(import_items(path, FakeClient()))
+    assert [str(item.name) for _, item in report.imported] == ['Airforce']
+    assert report.errors == [RowError(1, 'description', 'not valid UTF-8')]
@@ -0,0 +1,80 @@
+from flea_market_tui.indexes import FacetIndex, IndexedItems, SortIndex
+
+
+def test_sort_index_keeps_keys_sorted():
+    index = SortIndex(lambda x: x)
+    for slot, value in enumerate([5, 1, 3, 1]):
+        index.add(slot, value)
+    assert [index.slot(i) for i in range(len(index))] == [1, 3, 2, 0]
+
+
+def test_sort_index_position():
+    index = SortIndex(lambda x: x)
+    for slot, value in enumerate([5, 1, 3]):
+        index.add(slot, value)
+    assert index.position(0, 5) == 2
+    assert index.position(1, 1) == 0
+
+
+def test_sort_index_discard():
+    index = SortIndex(lambda x: x)
+    for slot, value in enumerate([5, 1, 3]):
+        index.add(slot, value)
+    index.discard(2, 3)
+    assert [index.slot(i) for i in range(len(index))] == [1, 0]
+
+
+def test_sort_index_clear():
+    index = SortIndex(lambda x: x)
+    index.add(0, 1)
+    index.clear()
+    assert len(index) == 0
+
+
+def test_sort_index_between():
+    index = SortIndex(lambda x: x)
+    for slot, value in enumerate([5, 1, 3, 3, 7]):
+        index.add(slot, value)
+    assert index.slots(*index.between(3, 5)) == [2, 3, 0]
+    assert index.slots(*index.between(2, 2)) == []
+    assert index.slots(*index.between(0, float('inf'))) == [1, 2, 3, 0, 4]
+
+
+def test_sort_index_add_all_and_discard_all():
+    index = SortIndex(lambda x: x)
+    index.add(0, 5)
+    index.add_all([(1, 1), (2, 3), (3, 1)])
+    assert [index.slot(i) for i in range(len(index))] == [1, 3, 2, 0]
+    index.discard_all([(2, 3), (0, 5)])
+    assert [index.slot(i) for i in range(len(index))] == [1, 3]
+
+
+def test_facet_index_slots_and_counts():
+    index = FacetIndex(lambda x: x[0])
+    for slot, value in enumerate(['a1', 'b1', 'a2', 'c1']):
+        index.add(slot, value)
+    assert index.slots(['a', 'c']) == {0, 2, 3}
+    assert index.slots(['z']) == set()
+    assert index.counts({0, 1, 2}) == {'a': 2, 'b': 1}
+    index.discard(1, 'b1')
+    assert index.counts({0, 1, 2, 3}) == {'a': 2, 'c': 1}
+    index.clear()
+    assert index.slots(['a']) == set()
+
+
+def test_indexed_items_keep_items_versions_and_indexes_together():
+    items, versions, index = {}, {}, SortIndex(lambda x: x)
+    indexed = IndexedItems(items, versions, [index])
+    indexed.insert(0, 5)
+    indexed.insert_all([(1, 1), (2, 3)])
+    assert items == {0: 5, 1: 1, 2: 3}
+    assert versions == {0: 0, 1: 1, 2: 2}
+    assert index.slots(0, len(index)) == [1, 2, 0]
+    indexed.discard(1)
+    indexed.discard_all([0])
+    indexed.insert(0, 4)
+    assert items == {2: 3, 0: 4}
+    assert versions == {2: 2, 0: 3}
+    assert index.slots(0, len(index)) == [2, 0]
+    indexed.clear()
+    assert items == {} and versions == {} and len(index) == 0
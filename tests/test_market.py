@@ -0,0 +1,24 @@
+import pytest
+from valid8 import ValidationError
+
+from flea_market_tui.columnar import ColumnarFleaMarket
+from flea_market_tui.domain import FleaMarket
+from flea_market_tui.market import ItemRows, Market, check_indexes
+from flea_market_tui.paged import PagedFleaMarket
+from flea_market_tui.snapshot import Snapshot
+from flea_market_tui.sqlite import SqliteFleaMarket
+
+
+def test_engines_implement_the_market():
+    for engine in (FleaMarket, SqliteFleaMarket, ColumnarFleaMarket, PagedFleaMarket):
+        assert Market in engine.__mro__
+    assert ItemRows in Snapshot.__mro__
+
+
+def test_check_indexes():
+    check_indexes([], 0)
+    check_indexes([4, 0, 2], 5)
+    with pytest.raises(ValidationError):
+        check_indexes([0, 5], 5)
+    with pytest.raises(ValidationError):
+        check_indexes([-1], 5)
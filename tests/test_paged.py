@@ -0,0 +1,94 @@
+import pytest
+from valid8 import ValidationError
+
+from flea_market_tui.domain import Name, Description, Condition, Brand, Price, Category, Item
+from flea_market_tui.paged import PagedFleaMarket
+
+
+@pytest.fixture
+def rows():
+    return [(i, Item(Name(f'Item {i}'), Description(''), Condition(str(i % 3)), Brand('Nike'), Price.create(100 - i),
+                     Category('Scarpe'))) for i in range(25)]
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+@pytest.fixture
+def market(rows, calls):
+    def fetch_page(offset, limit, ordering):
+        calls.append((offset, limit, ordering))
+        ordered = sorted(rows, key=lambda r: r[1].price) if ordering == 'price' else rows
+        return len(ordered), ordered[offset:offset + limit]
+    return PagedFleaMarket(fetch_page, page_size=10, cached_pages=2)
+
+
+def test_paged_items_loads_first_page_only(market, calls):
+    assert market.items() == 25
+    assert calls == [(0, 10, None)]
+
+
+def test_paged_item_faults_in_its_page(market, rows, calls):
+    assert market.item(23) == rows[23][1]
+    assert market.item_id(23) == 23
+    assert market.item(21) == rows[21][1]
+    assert calls == [(20, 10, None)]
+
+
+def test_paged_item_out_of_range(market):
+    with pytest.raises(ValidationError):
+        market.item(25)
+    with pytest.raises(ValidationError):
+        market.item(-1)
+
+
+def test_paged_lru_eviction(market, calls):
+    market.item(0)
+    market.item(10)
+    market.item(0)
+    market.item(20)
+    market.item(0)
+    market.item(10)
+    assert calls == [(0, 10, None), (10, 10, None), (20, 10, None), (10, 10, None)]
+
+
+def test_paged_sort_asks_the_server(market, rows, calls):
+    market.item(0)
+    market.sort_by_price()
+    assert market.item(0) == rows[24][1]
+    assert calls[-1] == (0, 10, 'price')
+
+
+def test_paged_index_of_loaded_pages(market):
+    market.item(12)
+    assert market.index_of(12) == 12
+    with pytest.raises(ValidationError):
+        market.index_of(0)
+
+
+def test_paged_mutations_drop_cached_pages(market, rows, calls):
+    market.item(0)
+    market.update_item(1, rows[5][1])
+    assert market.item(1) == rows[5][1]
+    assert market.item_id(1) == 1
+    market.remove_item(0)
+    market.item(0)
+    assert calls == [(0, 10, None), (0, 10, None)]
+
+
+def test_paged_page_size_must_be_positive(market):
+    with pytest.raises(ValidationError):
+        PagedFleaMarket(lambda offset, limit, ordering: (0, []), page_size=0)
+
+
+def test_paged_items_at(market, rows, calls):
+    assert market.items_at(range(8, 12)) == [row[1] for row in rows[8:12]]
+    assert calls == [(0, 10, None), (10, 10, None)]
+
+
+def test_paged_row_keys_tell_equal_items_apart(rows):
+    same = [(1, rows[0][1]), (2, rows[0][1])]
+    market = PagedFleaMarket(lambda offset, limit, ordering: (2, same[offset:offset + limit]))
+    assert market.row_keys([0, 1]) == same
@@ -0,0 +1,30 @@
+import pytest
+from valid8 import ValidationError
+
+from flea_market_tui.rows import RowCache
+
+
+def test_row_cache_formats_missing_rows_only():
+    formatted = []
+    cache = RowCache(lambda value: formatted.append(value) or value.upper())
+    assert cache.rows([1, 2], lambda i: ['a', 'b'][i]) == ['A', 'B']
+    assert cache.rows([2, 3, 1], lambda i: ['b', 'c', 'a'][i]) == ['B', 'C', 'A']
+    assert formatted == ['a', 'b', 'c']
+
+
+def test_row_cache_evicts_least_recently_used():
+    cache = RowCache(str, size=2)
+    cache.rows([1, 2], lambda i: i)
+    cache.rows([1], lambda i: 'x')
+    cache.rows([3], lambda i: 3)
+    assert len(cache) == 2
+    assert cache.rows([1, 2], lambda i: 'new') == ['0', 'new']
+
+
+def test_row_cache_clear_and_size():
+    cache = RowCache(str)
+    cache.rows([1], lambda i: i)
+    cache.clear()
+    assert len(cache) == 0
+    with pytest.raises(ValidationError):
+        RowCache(str, size=0)
@@ -0,0 +1,61 @@
+from flea_market_tui.domain import Item, Name, Description, Condition, Brand, Price, Category
+from flea_market_tui.search import SearchIndex, words
+
+
+def item(name, description=''):
+    return Item(Name(name), Description(description), Condition('0'), Brand('Nike'), Price.create(1), Category('Shoes'))
+
+
+def index_of(*items):
+    index = SearchIndex()
+    for slot, value in enumerate(items):
+        index.add(slot, value)
+    return index
+
+
+def test_words_are_lowercase():
+    assert words('Red Nike, size 42!') == ['red', 'nike', 'size', '42']
+
+
+def test_search_prefix_and_and():
+    index = index_of(item('Red Nike', 'Running shoes'), item('Blue Nike'), item('Red Adidas'))
+    assert index.search('nik') == {0, 1}
+    assert index.search('red nike') == {0}
+    assert index.search('RUN') == {0}
+    assert index.search('green') == set()
+    assert index.search('') == set()
+
+
+def test_search_or():
+    index = index_of(item('Red Nike'), item('Blue Nike'), item('Red Adidas'))
+    assert index.search('blue OR adidas') == {1, 2}
+    assert index.search('red nike OR blue') == {0, 1}
+
+
+def test_search_operators_ignore_case():
+    index = index_of(item('Red Nike'), item('Blue Nike'), item('Red Adidas'))
+    assert index.search('red AND nike') == {0}
+    assert index.search('red and nike') == {0}
+    assert index.search('red or nike') == {0, 1, 2}
+    assert index.search('blue Or adidas') == {1, 2}
+    assert index.search('OR') == set()
+
+
+def test_search_discard_and_clear():
+    red, blue = item('Red Nike'), item('Blue Nike')
+    index = index_of(red, blue)
+    index.discard(0, red)
+    assert index.search('red') == set()
+    assert index.search('nike') == {1}
+    index.clear()
+    assert index.search('nike') == set()
+
+
+def test_search_add_all_and_discard_all():
+    red, blue = item('Red Nike'), item('Blue Nike')
+    index = SearchIndex()
+    index.add_all([(0, red), (1, blue)])
+    assert index.search('nike') == {0, 1}
+    index.discard_all([(0, red)])
+    assert index.search('red') == set()
+    assert index.search('ni') == {1}
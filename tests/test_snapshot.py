@@ -0,0 +1,75 @@
+import pytest
+from valid8 import ValidationError
+
+from flea_market_tui.domain import Name, Description, Condition, Brand, Price, Category, Item, FleaMarket
+from flea_market_tui.snapshot import Snapshot, header, write_snapshot
+
+
+@pytest.fixture
+def rows():
+    return [
+        (10, Item(Name('Airforce'), Description(""), Condition('2'), Brand('Nike'), Price.create(111), Category('Scarpe'))),
+        (None, Item(Name('Snes'), Description("Prodotto vintage è"), Condition('1'), Brand('Nintendo'), Price.create(3333, 5), Category('Console'))),
+        (12, Item(Name('Jordan'), Description("stolen from the Defcon"), Condition('0'), Brand('Nike'), Price.create(12), Category('Scarpe'))),
+    ]
+
+
+@pytest.fixture
+def path(tmp_path, rows):
+    path = tmp_path / 'catalog.snapshot'
+    assert write_snapshot(path, rows) == len(rows)
+    return path
+
+
+def test_snapshot_reads_every_item(path, rows):
+    with Snapshot(path) as snapshot:
+        assert snapshot.items() == len(rows)
+        assert [snapshot.item(index) for index in range(len(rows))] == [item for _, item in rows]
+        assert [snapshot.item_id(index) for index in range(len(rows))] == [10, None, 12]
+        assert snapshot.items_at([2, 0]) == [rows[2][1], rows[0][1]]
+        assert list(snapshot.rows()) == rows
+        assert snapshot.row_keys([2, 1]) == [rows[2], rows[1]]
+
+
+def test_snapshot_out_of_range(path):
+    with Snapshot(path) as snapshot:
+        with pytest.raises(ValidationError):
+            snapshot.item(3)
+        with pytest.raises(ValidationError):
+            snapshot.item_id(-1)
+        with pytest.raises(ValidationError):
+            snapshot.items_at([0, 3])
+
+
+def test_empty_snapshot(tmp_path):
+    path = tmp_path / 'empty.snapshot'
+    write_snapshot(path, [])
+    with Snapshot(path) as snapshot:
+        assert snapshot.items() == 0
+        assert list(snapshot.rows()) == []
+
+
+def test_snapshot_fills_a_market(path, rows):
+    market = FleaMarket()
+    with Snapshot(path) as snapshot:
+        market.sync((item_id, item) for item_id, item in snapshot.rows() if item_id is not None)
+    assert market.items() == 2 and market.item_id(1) == 12
+
+
+def test_snapshot_is_replaced_atomically(path, rows):
+    with Snapshot(path) as old:
+        write_snapshot(path, rows[:1])
+        assert old.items() == 3 and old.item(2) == rows[2][1]
+        with Snapshot(path) as new:
+            assert new.items() == 1
+    assert not path.with_name(path.name + '.tmp').exists()
+
+
+def test_snapshot_rejects_other_files(path, tmp_path):
+    data = path.read_bytes()
+    broken = tmp_path / 'broken.snapshot'
+    for content in (b'', b'NOTASNAP' + data[8:], data[:8] + (2).to_bytes(8, 'little') + data[16:], data[:-1],
+                    data[:header.size]):
+        broken.write_bytes(content)
+        with pytest.raises(ValidationError):
+            Snapshot(broken)
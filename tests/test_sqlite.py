@@ -0,0 +1,154 @@
+import random
+
+import pytest
+from valid8 import ValidationError
+
+from flea_market_tui.domain import Price, Category, Item, FleaMarket
+from flea_market_tui.sqlite import SqliteFleaMarket
+
+
+@pytest.fixture
+def market(items):
+    market = SqliteFleaMarket()
+    for item_id, item in enumerate(items):
+        market.add_item(item, item_id + 10)
+    return market
+
+
+def test_sqlite_add_items(items):
+    market = SqliteFleaMarket()
+    for index, item in enumerate(items):
+        market.add_item(item)
+        assert market.items() == index + 1
+        assert market.item(index) == item
+    assert market.item_id(0) is None
+
+
+def test_sqlite_item_out_of_range(market):
+    with pytest.raises(ValidationError):
+        market.item(market.items())
+    with pytest.raises(ValidationError):
+        market.item(-1)
+    with pytest.raises(ValidationError):
+        market.items_at([0, market.items()])
+
+
+def test_sqlite_duplicate_id(market, items):
+    with pytest.raises(ValidationError):
+        market.add_item(items[0], 10)
+    assert market.items() == len(items)
+
+
+def test_sqlite_sorts_like_flea_market(market, items):
+    reference = FleaMarket()
+    for item in items:
+        reference.add_item(item)
+    for sort in ('sort_by_price', 'sort_by_condition', 'sort_by_brand'):
+        getattr(market, sort)()
+        getattr(reference, sort)()
+        assert market.items_at(range(len(items))) == reference.items_at(range(len(items)))
+
+
+def test_sqlite_index_of_follows_the_view(market, items):
+    assert market.index_of(14) == 4
+    market.sort_by_price()
+    assert market.index_of(14) == 0
+    assert market.item_id(market.index_of(13)) == 13
+    with pytest.raises(ValidationError):
+        market.index_of(99)
+
+
+def test_sqlite_remove_and_update(market, items):
+    market.sort_by_price()
+    market.remove_item(0)
+    assert market.items() == 4 and market.item(0) == items[0]
+    market.remove_item_by_id(13)
+    assert market.items() == 3
+    keys = market.row_keys([0, 1, 2])
+    market.update_item(0, items[3])
+    assert market.item(2) == items[3]
+    assert market.row_keys([0, 1])[0] == keys[1]
+    assert market.row_keys([2])[0] not in keys
+
+
+def test_sqlite_priced_between(market, items):
+    assert market.priced_between(Price.create(100), Price.create(5000)) == [items[0], items[2]]
+
+
+def test_sqlite_sync(market, items):
+    changed = Item(items[1].name, items[1].description, items[1].condition, items[1].brand, Price.create(1),
+                   items[1].category)
+    assert market.sync([(10, items[0]), (11, changed), (20, items[4])]) == (1, 1, 3)
+    assert market.items() == 3
+    assert [market.item_id(index) for index in range(3)] == [10, 11, 20]
+    assert market.item(1) == changed
+
+
+def test_sqlite_failed_sync_is_rolled_back(market, items):
+    def rows():
+        yield 20, items[0]
+        raise RuntimeError()
+
+    with pytest.raises(RuntimeError):
+        market.sync(rows())
+    assert market.items() == len(items)
+    with pytest.raises(ValidationError):
+        market.index_of(20)
+
+
+def test_sqlite_sync_rejects_rows_without_id(market, items):
+    with pytest.raises(ValidationError):
+        market.sync([(20, items[0]), (None, items[1])])
+    assert market.items() == len(items)
+
+
+def test_sqlite_survives_reopening(tmp_path, items):
+    path = str(tmp_path / 'market.sqlite3')
+    market = SqliteFleaMarket(path)
+    market.add_item(items[0], 1)
+    keys = market.row_keys([0])
+    market.close()
+
+    market = SqliteFleaMarket(path)
+    assert market.items() == 1 and market.item(0) == items[0] and market.item_id(0) == 1
+    market.add_item(items[1])
+    assert market.row_keys([1])[0] not in keys
+
+
+def test_sqlite_clear(market):
+    market.clear()
+    assert market.items() == 0
+
+
+def test_sqlite_random_operations_match_flea_market(items):
+    rng = random.Random(4)
+    market, reference = SqliteFleaMarket(), FleaMarket()
+    for step in range(300):
+        operation = rng.randrange(4) if reference.items() else 0
+        if operation == 0:
+            item = rng.choice(items)
+            market.add_item(item, step)
+            reference.add_item(item, step)
+        elif operation == 1:
+            index = rng.randrange(reference.items())
+            market.remove_item(index)
+            reference.remove_item(index)
+        elif operation == 2:
+            index, item = rng.randrange(reference.items()), rng.choice(items)
+            market.update_item(index, item)
+            reference.update_item(index, item)
+        else:
+            sort = rng.choice(('sort_by_price', 'sort_by_condition', 'sort_by_brand'))
+            getattr(market, sort)()
+            getattr(reference, sort)()
+        indexes = range(reference.items())
+        assert market.items_at(indexes) == reference.items_at(indexes)
+        assert [market.item_id(index) for index in indexes] == [reference.item_id(index) for index in indexes]
+
+
+def test_sqlite_cheapest_and_most_expensive(market, items):
+    assert market.cheapest(2) == [items[4], items[0]]
+    assert market.most_expensive(2) == [items[3], items[1]]
+    assert market.cheapest(5, Category('Scarpe')) == [items[4], items[0]]
+    assert market.most_expensive(1, Category('Scarpe')) == [items[0]]
+    assert market.cheapest(0) == []
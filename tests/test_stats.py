@@ -0,0 +1,51 @@
+import pytest
+from valid8 import ValidationError
+
+from flea_market_tui.domain import Item
+from flea_market_tui.stats import PriceAggregates, PriceStats, euro
+
+
+def item(price, category='Shoes'):
+    return Item.from_trusted_row('Item', '', '0', 'Nike', price, category)
+
+
+def test_euro():
+    assert euro(1234) == '12.34'
+    assert euro(1234.5) == '12.35'
+
+
+def test_price_aggregates_stats():
+    aggregates = PriceAggregates(lambda x: x.category.value)
+    for slot, value in enumerate([item(300), item(100), item(200), item(1000), item(50, 'Hats')]):
+        aggregates.add(slot, value)
+    stats = aggregates.stats(buckets=3)
+    assert list(stats) == ['Hats', 'Shoes']
+    assert stats['Shoes'] == PriceStats(4, 100, 1000, 400.0, 250.0, [(100, 400, 3), (400, 700, 0), (700, 1000, 1)])
+    assert stats['Hats'] == PriceStats(1, 50, 50, 50.0, 50, [(50, 50, 1)])
+
+
+def test_price_aggregates_follow_discard_and_clear():
+    aggregates = PriceAggregates(lambda x: x.category.value)
+    aggregates.add(0, item(100))
+    aggregates.add(1, item(300))
+    aggregates.discard(0, item(100))
+    assert aggregates.stats(buckets=1) == {'Shoes': PriceStats(1, 300, 300, 300.0, 300, [(300, 300, 1)])}
+    aggregates.discard(1, item(300))
+    assert aggregates.stats() == {}
+    aggregates.add(2, item(100))
+    aggregates.clear()
+    assert aggregates.stats() == {}
+
+
+def test_price_aggregates_add_all_and_discard_all():
+    aggregates = PriceAggregates(lambda x: x.category.value)
+    aggregates.add(0, item(300))
+    aggregates.add_all([(1, item(100)), (2, item(300)), (3, item(50, 'Hats'))])
+    assert aggregates.stats(buckets=1)['Shoes'] == PriceStats(3, 100, 300, 700 / 3, 300, [(100, 300, 3)])
+    aggregates.discard_all([(0, item(300)), (3, item(50, 'Hats'))])
+    assert aggregates.stats(buckets=1) == {'Shoes': PriceStats(2, 100, 300, 200.0, 200.0, [(100, 300, 2)])}
+
+
+def test_price_aggregates_buckets_must_be_positive():
+    with pytest.raises(ValidationError):
+        PriceAggregates(lambda x: x).stats(buckets=0)
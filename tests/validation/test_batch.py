@@ -0,0 +1,49 @@
+import flea_market_tui.domain  # noqa: F401 registers the item rules
+from validation.batch import validate_rows
+
+
+def row(**values):
+    res = {'id': 1, 'name': 'Airforce', 'description': 'Shoes', 'condition': 2, 'brand': 'Nike', 'price': 11100,
+           'category': 'Scarpe'}
+    res.update(values)
+    return res
+
+
+def test_validate_rows_accepts_clean_rows():
+    report = validate_rows([row(), row(id=2, condition='0', description='')])
+    assert report.errors == {}
+    assert report.clean() == [0, 1]
+
+
+def test_validate_rows_reports_by_row_and_field():
+    rows = [row(), row(name=''), row(brand='N' * 21), row(condition=3), row(category='Scarpe!'), row(price=-1),
+            row(price='100'), row(id=None), 'not a row']
+    report = validate_rows(rows)
+    assert report.errors[1, 'name'] == 'too short'
+    assert report.errors[2, 'brand'] == 'too long'
+    assert report.errors[3, 'condition'] == 'not allowed'
+    assert report.errors[4, 'category'] == 'does not match'
+    assert report.errors[5, 'price'] == 'out of range'
+    assert report.errors[6, 'price'] == 'not an integer'
+    assert report.errors[7, 'id'] == 'missing'
+    assert report.errors[8, 'name'] == 'missing'
+    assert report.clean() == [0]
+    assert report.rejected() == set(range(1, 9))
+    assert str(report).startswith('row 1, name: too short')
+
+
+def test_validate_rows_only_condition_may_be_an_integer():
+    report = validate_rows([row(condition=0), row(name=123), row(brand=7)])
+    assert report.errors == {(1, 'name'): 'not a string', (2, 'brand'): 'not a string'}
+
+
+def test_validate_rows_one_error_per_field():
+    report = validate_rows([row(name='!' * 31, description=None)])
+    assert report.errors == {(0, 'name'): 'too long', (0, 'description'): 'missing'}
+
+
+def test_validate_rows_counts_rule_calls():
+    from validation.registry import registry
+    registry.reset_stats()
+    validate_rows([row()] * 10)
+    assert registry['Name.value'].calls == 10
@@ -0,0 +1,63 @@
+import pytest
+from valid8 import ValidationError
+
+from validation.registry import Registry, Rule
+
+
+def test_rule_regex_and_length():
+    rule = Rule('Test.value', r'[a-z]+', min_len=2, max_len=4)
+    rule('abc')
+    for value in ['a', 'abcde', 'AB', 'ab1']:
+        with pytest.raises(ValidationError):
+            rule(value)
+
+
+def test_rule_allowed_set():
+    rule = Rule('Test.value', allowed={'0', '1'})
+    rule('1')
+    with pytest.raises(ValidationError):
+        rule('2')
+
+
+def test_rule_is_valid():
+    rule = Rule('Test.value', r'\d*', max_len=3)
+    assert rule.is_valid('')
+    assert not rule.is_valid('1234')
+    assert not rule.is_valid('a')
+
+
+def test_rule_counts_calls_and_time():
+    rule = Rule('Test.value', r'\d+')
+    rule('1')
+    with pytest.raises(ValidationError):
+        rule('a')
+    assert rule.calls == 2
+    assert rule.seconds > 0
+
+
+def test_registry_names_are_unique():
+    registry = Registry()
+    registry.rule('Test.value', r'\d+')
+    with pytest.raises(ValidationError):
+        registry.rule('Test.value', r'\w+')
+
+
+def test_registry_stats():
+    registry = Registry()
+    cold = registry.rule('Cold.value', r'\d+')
+    hot = registry.rule('Hot.value', r'\d+')
+    for _ in range(100):
+        hot('123')
+    cold('1')
+    assert registry['Hot.value'] is hot
+    assert list(registry.stats()) == ['Hot.value', 'Cold.value']
+    assert registry.stats()['Hot.value'][0] == 100
+    registry.reset_stats()
+    assert registry.stats()['Hot.value'] == (0, 0.0)
+
+
+def test_rule_column_errors():
+    rule = Rule('Test.value', r'[a-z]+', min_len=2, max_len=4)
+    assert rule.column_errors(['abc', 'a', 'abcde', 'AB', 'ab']) == {1: 'too short', 2: 'too long', 3: 'does not match'}
+    assert rule.calls == 5
+    assert Rule('Test.value', allowed={'0'}).column_errors(['0', '1']) == {1: 'not allowed'}
@@ -0,0 +1,62 @@
+from dataclasses import dataclass, field
+from typing import AbstractSet, Any, Dict, List, Mapping, Sequence, Set, Tuple
+
+from validation.registry import Registry, registry
+
+# Text columns of an item row as returned by `item/`, checked with the rules of the matching value objects
+item_rules = {'name': 'Name.value', 'description': 'Description.value', 'condition': 'Condition.value',
+              'brand': 'Brand.value', 'category': 'Category.value'}
+# Text columns that the server may also send as integers, e.g. condition 0
+item_numeric_text = frozenset({'condition'})
+# Integer columns of an item row, with their inclusive bounds
+item_ranges = {'id': (0, 2 ** 63 - 1), 'price': (0, 100000000000 - 1)}
+
+
+@dataclass(frozen=True)
+class BatchReport:
+    rows: int
+    errors: Dict[Tuple[int, str], str] = field(default_factory=dict)
+
+    def rejected(self) -> Set[int]:
+        return {row for row, _ in self.errors}
+
+    def clean(self) -> List[int]:
+        rejected = self.rejected()
+        return [row for row in range(self.rows) if row not in rejected]
+
+    def __str__(self):
+        return '\n'.join(f'row {row}, {key}: {message}' for (row, key), message in sorted(self.errors.items()))
+
+
+def _column(rows: Sequence[Any], key: str) -> List[Any]:
+    return [row.get(key) if isinstance(row, dict) else None for row in rows]
+
+
+# Validate a batch of raw rows column by column instead of value by value: every rule runs once over its whole column.
+# Nothing is raised, the report holds one message per rejected (row, column).
+def validate_rows(rows: Sequence[Any], rules: Mapping[str, str] = item_rules,
+                  ranges: Mapping[str, Tuple[int, int]] = item_ranges,
+                  numeric_text: AbstractSet[str] = item_numeric_text,
+                  rule_registry: Registry = registry) -> BatchReport:
+    report = BatchReport(len(rows))
+    for key, name in rules.items():
+        values = _column(rows, key)
+        wrong = {}
+        for i in [i for i, v in enumerate(values) if not isinstance(v, str)]:
+            if key in numeric_text and isinstance(values[i], int) and not isinstance(values[i], bool):
+                values[i] = str(values[i])
+            else:
+                wrong[i] = 'missing' if values[i] is None else 'not a string'
+                values[i] = ''
+        errors = rule_registry[name].column_errors(values)
+        errors.update(wrong)
+        report.errors.update(((i, key), message) for i, message in errors.items())
+    for key, (low, high) in ranges.items():
+        for i, v in enumerate(_column(rows, key)):
+            if v is None:
+                report.errors[i, key] = 'missing'
+            elif not isinstance(v, int) or isinstance(v, bool):
+                report.errors[i, key] = 'not an integer'
+            elif not low <= v <= high:
+                report.errors[i, key] = 'out of range'
+    return report
@@ -0,0 +1,89 @@
+import re
+from array import array
+from time import perf_counter
+from typing import AbstractSet, Dict, Optional, Sequence, Tuple
+
+from valid8 import validate
+
+from validation.regex import pattern
+
+
+# A field rule compiled once: the common case is a few comparisons and one fullmatch,
+# and valid8 is only called to build the detailed ValidationError when the value is rejected
+class Rule:
+    def __init__(self, name: str, regex: Optional[str] = None, min_len: Optional[int] = None,
+                 max_len: Optional[int] = None, allowed: Optional[AbstractSet[str]] = None):
+        self.name = name
+        self.regex = regex
+        self.min_len = min_len
+        self.max_len = max_len
+        self.allowed = frozenset(allowed) if allowed is not None else None
+        self.calls = 0
+        self.seconds = 0.0
+        self.__fullmatch = re.compile(regex).fullmatch if regex is not None else None
+        self.__custom = pattern(regex) if regex is not None else None
+
+    def is_valid(self, value: str) -> bool:
+        return (self.min_len is None or len(value) >= self.min_len) \
+            and (self.max_len is None or len(value) <= self.max_len) \
+            and (self.allowed is None or value in self.allowed) \
+            and (self.__fullmatch is None or self.__fullmatch(value) is not None)
+
+    def __call__(self, value: str) -> None:
+        start = perf_counter()
+        try:
+            if not self.is_valid(value):
+                validate(self.name, value, min_len=self.min_len, max_len=self.max_len, is_in=self.allowed,
+                         custom=self.__custom)
+        finally:
+            self.calls += 1
+            self.seconds += perf_counter() - start
+
+    # Check a whole column at once: lengths through one array, then a single fullmatch pass over the values.
+    # Returns the position and the reason of every rejected value.
+    def column_errors(self, values: Sequence[str]) -> Dict[int, str]:
+        start = perf_counter()
+        errors: Dict[int, str] = {}
+        lengths = array('q', map(len, values))
+        if self.min_len is not None:
+            errors.update((i, 'too short') for i, n in enumerate(lengths) if n < self.min_len)
+        if self.max_len is not None:
+            errors.update((i, 'too long') for i, n in enumerate(lengths) if n > self.max_len)
+        if self.allowed is not None:
+            for i, v in enumerate(values):
+                if v not in self.allowed:
+                    errors.setdefault(i, 'not allowed')
+        if self.__fullmatch is not None:
+            for i, m in enumerate(map(self.__fullmatch, values)):
+                if m is None:
+                    errors.setdefault(i, 'does not match')
+        self.calls += len(values)
+        self.seconds += perf_counter() - start
+        return errors
+
+
+class Registry:
+    def __init__(self):
+        self.__rules: Dict[str, Rule] = {}
+
+    def rule(self, name: str, regex: Optional[str] = None, min_len: Optional[int] = None,
+             max_len: Optional[int] = None, allowed: Optional[AbstractSet[str]] = None) -> Rule:
+        validate('name', name, custom=lambda v: v not in self.__rules)
+        self.__rules[name] = Rule(name, regex, min_len, max_len, allowed)
+        return self.__rules[name]
+
+    def __getitem__(self, name: str) -> Rule:
+        return self.__rules[name]
+
+    # Calls and seconds spent per rule, hottest first
+    def stats(self) -> Dict[str, Tuple[int, float]]:
+        rules = sorted(self.__rules.values(), key=lambda r: r.seconds, reverse=True)
+        return {r.name: (r.calls, r.seconds) for r in rules}
+
+    def reset_stats(self) -> None:
+        for r in self.__rules.values():
+            r.calls = 0
+            r.seconds = 0.0
+
+
+registry = Registry()